@@ -0,0 +1,17 @@
+# api.py — Dashboard API as a standalone ASGI app, for running several workers
+#
+#   uvicorn api:app --workers 4 --port 8080
+#
+# Each worker imports utilities without starting the Discord bot, keeps its
+# own in-memory copy of the flight store and follows writes from the bot and
+# the other workers through flights.db (see store.ChangeFeed). The bot starts
+# these workers itself when API_WORKERS > 0. Endpoints that post to Discord
+# answer 503 here; the bot picks up stored changes and updates the embeds.
+
+import os
+
+os.environ.setdefault("AIC_ROLE", "api")
+
+from utilities import create_api  # noqa: E402
+
+app = create_api()
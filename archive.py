@@ -0,0 +1,86 @@
+# archive.py — Cold, compressed archive tier for ended flights
+#
+# Ended flights are moved out of the live store in batches. Each archival run
+# writes one new gzip-compressed JSONL segment (never rewritten afterwards)
+# and records it in manifest.json with its entry count and date range, so a
+# paginated read can skip whole segments without decompressing them.
+#
+#   archive/
+#     manifest.json
+#     seg-000001.jsonl.gz
+#     seg-000002.jsonl.gz
+
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+
+from iopool import atomic_write
+from models import parse_ddmmyyyy
+
+
+class FlightArchive:
+    """Append-only segment archive. Segments are listed oldest first in the manifest."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.segments = []
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.segments = json.load(f).get("segments", [])
+
+    @property
+    def total(self) -> int:
+        return sum(seg["count"] for seg in self.segments)
+
+    def append(self, entries: list) -> dict:
+        """Write one segment of flight dicts (oldest departure first) and register it."""
+        if not entries:
+            return None
+        with self._lock:
+            seq  = (self.segments[-1]["seq"] + 1) if self.segments else 1
+            name = f"seg-{seq:06d}.jsonl.gz"
+            path = os.path.join(self.directory, name)
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+            days = sorted(d for d in (parse_ddmmyyyy(e.get("dep_date")) for e in entries) if d)
+            segment = {
+                "seq": seq,
+                "file": name,
+                "count": len(entries),
+                "first_dep": days[0].isoformat() if days else None,
+                "last_dep": days[-1].isoformat() if days else None,
+                "archived_at": datetime.utcnow().isoformat() + "Z",
+            }
+            self.segments.append(segment)
+            atomic_write(self.manifest_path, json.dumps({"segments": self.segments}, indent=2))
+            return segment
+
+    def _read_segment(self, segment: dict) -> list:
+        with gzip.open(os.path.join(self.directory, segment["file"]), "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def page(self, page: int = 1, per_page: int = 50) -> dict:
+        """Newest-archived first. Only the segments overlapping the page are decompressed."""
+        page, per_page = max(1, page), max(1, min(per_page, 500))
+        skip, items = (page - 1) * per_page, []
+        for segment in reversed(self.segments):
+            if skip >= segment["count"]:
+                skip -= segment["count"]
+                continue
+            rows = self._read_segment(segment)[::-1]
+            items.extend(rows[skip:skip + per_page - len(items)])
+            skip = 0
+            if len(items) >= per_page:
+                break
+        return {"items": items, "page": page, "per_page": per_page, "total": self.total}
+
+    def stats(self) -> dict:
+        return {"segments": len(self.segments), "flights": self.total}
@@ -0,0 +1,221 @@
+# bench.py — Standalone performance checks for the storage and logging layers
+#
+# Usage:
+#   python bench.py looplag [flights] [saves]
+#   python bench.py memory [flights ...]
+#   python bench.py codec [flights] [rounds]
+#   python bench.py logtail [megabytes ...]
+#
+# Uses only the standard library and the bot's storage modules; it never
+# imports utilities.py, so no Discord token or network is needed.
+
+import asyncio
+import json
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import codec
+import logformat
+from iopool import LoopLagMonitor, io_executor
+from models import FlightRecord
+from store import FlightStore, SaveScheduler
+
+
+def make_flight(code: str, day: int = 1) -> dict:
+    """Synthetic flight entry shaped like the ones the bot creates."""
+    return {
+        "code": code,
+        "flight_number": f"AC {random.randint(100, 9999)}",
+        "dep_city": "Toronto", "arr_city": "Montreal",
+        "dep_code": "YYZ", "arr_code": "YUL",
+        "dep_airport": "Toronto Pearson", "arr_airport": "Montreal Trudeau",
+        "dep_time": f"{random.randint(0, 23):02d}:00", "arr_time": "19:30",
+        "dep_date": f"{day % 28 + 1:02d}012026",
+        "duration": "1h 30m", "terminal": "1", "aircraft": "B789",
+        "host_user_id": "767865431712333874",
+        "gate": {"dep": "N/A", "arr": "N/A"},
+        "meal_service": "Meal Service",
+        "status": random.choice(["On–Time", "Delayed", "Ended", "N/A"]),
+        "alerts": "N/A",
+        "server": {"link": "N/A"}, "event": {"link": "N/A"},
+        "public_message_id": None, "admin_message_id": "1473794471832453180",
+        "created_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+
+def make_user_data(n: int) -> dict:
+    codes = set()
+    while len(codes) < n:
+        codes.add("".join(random.choices(string.ascii_uppercase + string.digits, k=6)))
+    return {code: make_flight(code, i) for i, code in enumerate(codes)}
+
+
+# ── looplag ───────────────────────────────────────────────────────────────────
+async def _lag_run(save, edits: int, codes: list) -> dict:
+    monitor = LoopLagMonitor(interval=0.005, window=100000)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    for i in range(edits):
+        await save(codes[i % len(codes)])
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    return monitor.snapshot()
+
+
+def bench_looplag(n_flights: int = 5000, edits: int = 50):
+    tmp  = tempfile.mkdtemp(prefix="aic-bench-")
+    data = make_user_data(n_flights)
+    codes = list(data)
+
+    # Before: the original save_user_data — .bak copy + indent=4 dump on the loop thread.
+    legacy_path = os.path.join(tmp, "user_data.json")
+
+    async def legacy_save(code):
+        data[code]["alerts"] = str(random.random())
+        if os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as original:
+                with open(legacy_path + ".bak", "w", encoding="utf-8") as bak:
+                    bak.write(original.read())
+        with open(legacy_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+
+    # After: per-row store, writes coalesced and run on the I/O executor.
+    store = FlightStore(os.path.join(tmp, "flights.db"))
+    store.save_all(data)
+
+    async def main_after():
+        scheduler = SaveScheduler(store, data, window=0.05, executor=io_executor)
+
+        async def store_save(code):
+            data[code]["alerts"] = str(random.random())
+            scheduler.mark(code)
+
+        result = await _lag_run(store_save, edits, codes)
+        await scheduler.flush()
+        return result, scheduler.stats
+
+    before = asyncio.run(_lag_run(legacy_save, edits, codes))
+    after, stats = asyncio.run(main_after())
+    store.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"Event-loop lag with {n_flights} flights, {edits} edits:")
+    print(f"  before (sync full-file save): {before}")
+    print(f"  after  (off-loop row saves):  {after}")
+    print(f"  save scheduler: {stats}")
+
+
+# ── memory ────────────────────────────────────────────────────────────────────
+def _measure(build) -> tuple:
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, obj
+
+
+def bench_memory(*sizes: int):
+    sizes = sizes or (10_000, 100_000)
+    print("Working-set memory, nested dicts vs FlightRecord (__slots__):")
+    for n in sizes:
+        # Rows exactly as FlightStore.load() sees them: one JSON document per flight.
+        rows = [json.dumps(e) for e in make_user_data(n).values()]
+        dict_bytes, dicts = _measure(lambda: {e["code"]: e for e in map(json.loads, rows)})
+        del dicts
+        rec_bytes, _ = _measure(lambda: {e["code"]: FlightRecord.from_dict(e["code"], e) for e in map(json.loads, rows)})
+        print(f"  {n:>7} flights: dict {dict_bytes / 1e6:8.1f} MB | "
+              f"FlightRecord {rec_bytes / 1e6:8.1f} MB | {rec_bytes / dict_bytes:5.0%} of dict")
+
+
+# ── codec ─────────────────────────────────────────────────────────────────────
+def _best_ms(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def bench_codec(n_flights: int = 5000, rounds: int = 5):
+    data    = make_user_data(n_flights)
+    legacy  = json.dumps(data, indent=4, ensure_ascii=False)
+    compact = codec.dumps(data)
+    rows    = list(data.values())
+
+    print(f"JSON codec with {n_flights} flights (backend: {codec.BACKEND}, best of {rounds}):")
+    print(f"  size    indent=4 {len(legacy) / 1e6:7.2f} MB | compact {len(compact) / 1e6:7.2f} MB")
+    print(f"  dump    indent=4 {_best_ms(lambda: json.dumps(data, indent=4, ensure_ascii=False), rounds):7.1f} ms | "
+          f"codec {_best_ms(lambda: codec.dumps(data), rounds):7.1f} ms")
+    print(f"  load    json     {_best_ms(lambda: json.loads(legacy), rounds):7.1f} ms | "
+          f"codec {_best_ms(lambda: codec.loads(compact), rounds):7.1f} ms")
+    # Starlette's JSONResponse.render vs the codec-backed response class used by /api/*.
+    starlette_render = lambda: json.dumps(rows, ensure_ascii=False, allow_nan=False, indent=None,
+                                          separators=(",", ":")).encode("utf-8")
+    print(f"  /api    default  {_best_ms(starlette_render, rounds):7.1f} ms | "
+          f"codec {_best_ms(lambda: codec.dumpb(rows), rounds):7.1f} ms")
+
+
+# ── logtail ───────────────────────────────────────────────────────────────────
+def _write_log(path: str, megabytes: int):
+    """JSONL log of roughly `megabytes` MB, one error-with-traceback record every 20 lines."""
+    tb = "Traceback (most recent call last):\n  File \"utilities.py\", line 1, in x\nValueError: boom"
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while f.tell() < megabytes << 20:
+            if i % 20 == 0:
+                rec = logformat.make_record(f"Action {i} (FAILED)", user="bench", source="bot",
+                                            error_code="ABC1234", traceback=tb)
+            else:
+                rec = logformat.make_record(f"Pressed component: detail for code AB{i % 9999:04d}", user="bench")
+            f.write(logformat.encode(rec) + "\n")
+            i += 1
+
+
+def _full_read(path: str, limit: int) -> list:
+    # The previous /api/logs shape: parse every line, reverse, slice.
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        entries = [e for e in map(logformat.entry_for_line, f) if e]
+    entries.reverse()
+    return entries[:limit]
+
+
+def bench_logtail(*sizes: int, limit: int = 300):
+    sizes = sizes or (10, 100)
+    tmp = tempfile.mkdtemp(prefix="aic-bench-")
+    print(f"/api/logs?limit={limit} read time by log size:")
+    try:
+        for mb in sizes:
+            path = os.path.join(tmp, f"log-{mb}.jsonl")
+            _write_log(path, mb)
+            full = _best_ms(lambda: _full_read(path, limit), 3)
+            tail = _best_ms(lambda: logformat.tail_entries(path, limit), 3)
+            assert _full_read(path, limit) == logformat.tail_entries(path, limit)
+            print(f"  {mb:>5} MB: full read {full:9.1f} ms | reverse tail {tail:6.1f} ms")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    cmd  = sys.argv[1] if len(sys.argv) > 1 else ""
+    args = [int(a) for a in sys.argv[2:]]
+    if cmd == "looplag":
+        bench_looplag(*args)
+    elif cmd == "memory":
+        bench_memory(*args)
+    elif cmd == "codec":
+        bench_codec(*args)
+    elif cmd == "logtail":
+        bench_logtail(*args)
+    else:
+        print("usage: python bench.py looplag [flights] [saves] | memory [flights ...] | "
+              "codec [flights] [rounds] | logtail [megabytes ...]")
+        sys.exit(2)
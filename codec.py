@@ -0,0 +1,60 @@
+# codec.py — JSON encode/decode used by the flight store and the dashboard API
+#
+# Uses orjson when it is installed (several times faster, returns bytes) and
+# falls back to the stdlib json module otherwise. Everything written to disk
+# is compact (no indentation, no spaces); use pretty() or
+# `python store.py export <db> <json>` when a human needs to read it.
+
+import json
+
+try:
+    import orjson
+    FAST_JSON = True
+except ImportError:
+    orjson = None
+    FAST_JSON = False
+
+BACKEND = "orjson" if FAST_JSON else "json"
+
+
+def _default(obj):
+    # Enums (Aircraft) and records that know their own storage form.
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "value"):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumpb(obj) -> bytes:
+    """Compact UTF-8 encoded JSON."""
+    if FAST_JSON:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def dumps(obj) -> str:
+    """Compact JSON text (what the store writes)."""
+    if FAST_JSON:
+        return dumpb(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
+
+
+def pretty(obj) -> str:
+    """Indented, key-sorted JSON for exports and debugging."""
+    if FAST_JSON:
+        opts = orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(obj, default=_default, option=opts).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=True, default=_default)
+
+
+def loads(raw):
+    """Decode str or bytes."""
+    if FAST_JSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def load_file(path: str):
+    with open(path, "rb") as f:
+        return loads(f.read())
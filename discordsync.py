@@ -0,0 +1,103 @@
+# discordsync.py — Debounced background sync of flight embeds and day boards
+#
+# Every flight edit used to call update_embeds_for_code() and
+# post_or_update_day_schedule() inline, so three quick edits to flights on
+# the same day meant three full day-board rebuilds and edits, all on the
+# caller's path. Edits now only mark the flight code and its dep_date dirty.
+# One task waits `window` seconds after the first mark (collecting whatever
+# else arrives meanwhile), then syncs each dirty flight once and each dirty
+# day once. A key marked again while already dirty costs nothing.
+#
+# Latency is measured per key from its first mark to the end of its sync,
+# i.e. how long a change takes to show up in Discord.
+
+import asyncio
+import time
+from collections import deque
+
+
+class SyncQueue:
+    """Dirty sets of flight codes and dates, flushed in debounced batches by one task."""
+
+    def __init__(self, sync_flight, sync_day, window: float = 0.75, on_error=None):
+        self.sync_flight = sync_flight   # async (code) -> None
+        self.sync_day    = sync_day      # async (date_raw) -> None
+        self.window      = window
+        self.on_error    = on_error      # (message) -> None
+        self._flights = {}               # code -> monotonic time first marked
+        self._days    = {}               # date_raw -> monotonic time first marked
+        self._wakeup  = None
+        self._task    = None
+        self._latency = deque(maxlen=500)
+        self.stats = {"marked": 0, "collapsed": 0, "batches": 0, "flights_synced": 0,
+                      "days_synced": 0, "errors": 0, "max_depth": 0}
+
+    # ── Producer side ────────────────────────────────────────────────────────
+    def mark(self, code: str = None, date_raw: str = None):
+        now = time.monotonic()
+        for pending, key in ((self._flights, code), (self._days, date_raw)):
+            if not key or key == "N/A":
+                continue
+            self.stats["marked"] += 1
+            if key in pending:
+                self.stats["collapsed"] += 1
+            else:
+                pending[key] = now
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.depth)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def depth(self) -> int:
+        return len(self._flights) + len(self._days)
+
+    # ── Worker ───────────────────────────────────────────────────────────────
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            if self.depth:
+                self._wakeup.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.window)
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Sync everything dirty right now. Flights first, so day boards see their latest state."""
+        flights, self._flights = self._flights, {}
+        days, self._days = self._days, {}
+        if not flights and not days:
+            return
+        self.stats["batches"] += 1
+        for kind, pending, sync in (("flight", flights, self.sync_flight), ("day", days, self.sync_day)):
+            for key, marked_at in pending.items():
+                try:
+                    await sync(key)
+                    self.stats[f"{kind}s_synced"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    if self.on_error:
+                        self.on_error(f"❌ Discord sync failed for {kind} {key}: {e}")
+                self._latency.append(time.monotonic() - marked_at)
+
+    def snapshot(self) -> dict:
+        latency = sorted(self._latency)
+        if latency:
+            timing = {
+                "latency_avg_ms": round(sum(latency) / len(latency) * 1000, 1),
+                "latency_p95_ms": round(latency[min(len(latency) - 1, int(len(latency) * 0.95))] * 1000, 1),
+                "latency_max_ms": round(latency[-1] * 1000, 1),
+            }
+        else:
+            timing = {"latency_avg_ms": 0.0, "latency_p95_ms": 0.0, "latency_max_ms": 0.0}
+        return dict(self.stats, queued_flights=len(self._flights), queued_days=len(self._days),
+                    window_s=self.window, **timing)
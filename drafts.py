@@ -0,0 +1,73 @@
+# drafts.py — In-memory store for in-progress flight creation drafts
+#
+# FlightDetailsModal1/2/3 collect a flight over three steps. The partial data
+# belongs to one user for a few minutes, so it lives here instead of in
+# user_data: never written to disk, dropped after DRAFT_TTL seconds of
+# inactivity, and least-recently-used drafts are evicted past DRAFT_MAX.
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class DraftStore:
+    """Per-user drafts with a sliding TTL and LRU eviction."""
+
+    def __init__(self, ttl: float = 900.0, max_entries: int = 1000):
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self._items      = OrderedDict()   # user_id -> (expires_at, data), oldest first
+        self._counters   = {"created": 0, "completed": 0, "expired": 0, "evicted": 0}
+
+    def _purge(self, now: float):
+        # Touching a draft moves it to the end, so expiries are ordered front to back.
+        while self._items:
+            uid, (expires_at, _) = next(iter(self._items.items()))
+            if expires_at > now:
+                break
+            del self._items[uid]
+            self._counters["expired"] += 1
+
+    def get(self, user_id) -> Optional[dict]:
+        """Return the live draft for a user (refreshing its TTL), or None."""
+        now = time.monotonic()
+        self._purge(now)
+        item = self._items.get(user_id)
+        if item is None:
+            return None
+        self._items[user_id] = (now + self.ttl, item[1])
+        self._items.move_to_end(user_id)
+        return item[1]
+
+    def put(self, user_id, data: dict) -> dict:
+        """Start (or restart) a user's draft."""
+        now = time.monotonic()
+        self._purge(now)
+        if user_id not in self._items:
+            self._counters["created"] += 1
+        self._items[user_id] = (now + self.ttl, data)
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+            self._counters["evicted"] += 1
+        return data
+
+    def update(self, user_id, fields: dict) -> Optional[dict]:
+        """Merge fields into an existing draft. Returns None if it has expired."""
+        draft = self.get(user_id)
+        if draft is not None:
+            draft.update(fields)
+        return draft
+
+    def pop(self, user_id) -> Optional[dict]:
+        """Remove and return a finished draft."""
+        self._purge(time.monotonic())
+        item = self._items.pop(user_id, None)
+        if item is None:
+            return None
+        self._counters["completed"] += 1
+        return item[1]
+
+    def stats(self) -> dict:
+        self._purge(time.monotonic())
+        return dict(self._counters, live=len(self._items), ttl=self.ttl, max=self.max_entries)
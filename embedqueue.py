@@ -0,0 +1,130 @@
+# embedqueue.py — Background delivery of log embeds to the Discord log channel
+#
+# log_action used to await channel.send() once per action, so every logged
+# button press cost the user a Discord round-trip and one request against the
+# channel's rate-limit bucket. Embeds are now put on a bounded queue (never
+# awaited, dropped and counted when full) and a single task sends them in
+# messages of up to 10 embeds (Discord's per-message limit, also capped by
+# the 6000-character total). A 429 pauses delivery for its retry-after and
+# the same batch is retried; other failures are retried with backoff and
+# then given up on. Every embed is already in utilities.log, so a dropped
+# embed loses only the channel copy.
+
+import asyncio
+import time
+from collections import deque
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_CHARS_PER_MESSAGE  = 6000
+
+
+def retry_after(exc):
+    """Seconds to wait for a rate-limit error (discord.RateLimited or an HTTP 429), else None."""
+    delay = getattr(exc, "retry_after", None)
+    if delay is None:
+        if getattr(exc, "status", None) != 429:
+            return None
+        headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+        delay = headers.get("Retry-After", 1.0)
+    try:
+        return max(0.0, float(delay))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class EmbedQueue:
+    """Bounded embed queue drained by one task that sends batched messages via `send(embeds)`."""
+
+    def __init__(self, send, max_queue: int = 1000, batch_size: int = MAX_EMBEDS_PER_MESSAGE,
+                 linger: float = 1.0, max_retries: int = 3, size=None, on_error=None):
+        self.send        = send          # async (list of embeds) -> None
+        self.max_queue   = max_queue
+        self.batch_size  = min(batch_size, MAX_EMBEDS_PER_MESSAGE)
+        self.linger      = linger        # seconds to wait for a batch to fill once one embed is queued
+        self.max_retries = max_retries
+        self.size        = size or (lambda embed: 0)   # embed -> character count
+        self.on_error    = on_error      # (message) -> None, for failures worth logging
+        self._pending = deque()
+        self._wakeup  = None
+        self._task    = None
+        self.paused_until = 0.0
+        self.stats = {"enqueued": 0, "sent": 0, "messages": 0, "dropped": 0, "failed": 0,
+                      "rate_limited": 0, "retry_after_s": 0.0, "max_depth": 0, "max_batch": 0}
+
+    # ── Producer side (never blocks, never awaits) ───────────────────────────
+    def put(self, embed) -> bool:
+        if len(self._pending) >= self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+        self._pending.append(embed)
+        self.stats["enqueued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self._pending))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    # ── Delivery task ────────────────────────────────────────────────────────
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            if self._pending:
+                self._wakeup.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _take_batch(self) -> list:
+        batch, chars = [], 0
+        while self._pending and len(batch) < self.batch_size:
+            size = self.size(self._pending[0])
+            if batch and chars + size > MAX_CHARS_PER_MESSAGE:
+                break
+            batch.append(self._pending.popleft())
+            chars += size
+        return batch
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if len(self._pending) < self.batch_size and self.linger:
+                await asyncio.sleep(self.linger)
+            batch = self._take_batch()
+            if batch:
+                await self._deliver(batch)
+
+    async def _deliver(self, batch: list):
+        failures = 0
+        while True:
+            try:
+                await self.send(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                delay = retry_after(exc)
+                if delay is not None:
+                    self.stats["rate_limited"] += 1
+                    self.stats["retry_after_s"] = round(self.stats["retry_after_s"] + delay, 3)
+                    self.paused_until = time.monotonic() + delay
+                    await asyncio.sleep(delay)
+                    continue
+                failures += 1
+                if failures > self.max_retries:
+                    self.stats["failed"] += len(batch)
+                    if self.on_error:
+                        self.on_error(f"❌ Could not send {len(batch)} log embed(s): {exc}")
+                    return
+                await asyncio.sleep(2 ** (failures - 1))
+                continue
+            self.stats["sent"] += len(batch)
+            self.stats["messages"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            return
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, queued=len(self._pending),
+                    paused_s=round(max(0.0, self.paused_until - time.monotonic()), 3))
@@ -0,0 +1,234 @@
+# errorindex.py — Error reference code → log record index
+#
+# handle_exception_and_report hands users a 7-character reference code. Every
+# record that carries an error_code is also written here (logs/errors.db,
+# SQLite WAL, shared by the bot and API worker processes), keyed by the code,
+# so /api/errors/{ref} is one primary-key lookup however large the log grows.
+# The first record for a code wins: that is the one with the user and action.
+#
+# Tracebacks are also fingerprinted (exception type plus the stack as
+# file:function pairs, without line numbers or paths) and aggregated per
+# fingerprint: count, first/last seen, last reference code and the first few
+# full tracebacks. Once a fingerprint has been logged that many times in this
+# process, write_log stores only its tb_summary and fingerprint, so a flaky
+# Discord connection no longer fills the log with the same traceback.
+#
+# Codes already in an existing log can be indexed with
+#   python errorindex.py rebuild logs/errors.db utilities.log [logs]
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import codec
+import logformat
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS errors (
+    ref  TEXT PRIMARY KEY,
+    ts   TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fp         TEXT PRIMARY KEY,
+    exc_type   TEXT NOT NULL,
+    summary    TEXT NOT NULL,
+    location   TEXT NOT NULL,
+    count      INTEGER NOT NULL,
+    first_seen TEXT,
+    last_seen  TEXT,
+    last_ref   TEXT
+);
+CREATE TABLE IF NOT EXISTS fingerprint_samples (
+    fp        TEXT NOT NULL,
+    ref       TEXT,
+    ts        TEXT,
+    traceback TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fingerprint_samples_fp ON fingerprint_samples (fp);
+"""
+
+_FRAME = re.compile(r'File "([^"]+)", line \d+, in (\S+)')
+
+
+def fingerprint(tb: str) -> tuple:
+    """(fingerprint, exception type, innermost frame) for a formatted traceback."""
+    frames = [f"{os.path.basename(path)}:{func}" for path, func in _FRAME.findall(tb)]
+    exc_type = logformat.tb_summary(tb).split(":", 1)[0].strip() or "Exception"
+    digest = hashlib.sha1("\n".join([exc_type, *frames]).encode("utf-8")).hexdigest()[:12]
+    return digest, exc_type, frames[-1] if frames else ""
+
+
+class ErrorIndex:
+    """Reference code → the structured record (traceback, user, action, time) it was logged with."""
+
+    def __init__(self, path: str, keep_tracebacks: int = 5):
+        self.path  = path
+        self.keep_tracebacks = keep_tracebacks   # full tracebacks stored (and logged) per fingerprint
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        self._seen = dict(self._conn.execute("SELECT fp, count FROM fingerprints"))
+        self.tracebacks_elided = 0
+
+    # ── Fingerprints ─────────────────────────────────────────────────────────
+    def note(self, tb: str) -> tuple:
+        """
+        Called on the logging path (cheap, no I/O). Returns (fingerprint, keep):
+        keep is False once this fingerprint's full traceback has been seen
+        keep_tracebacks times, and the log record should carry only its summary.
+        """
+        fp = fingerprint(tb)[0]
+        count = self._seen.get(fp, 0) + 1
+        self._seen[fp] = count
+        keep = count <= self.keep_tracebacks
+        if not keep:
+            self.tracebacks_elided += 1
+        return fp, keep
+
+    def record_occurrence(self, tb: str, ref: str = None, ts: str = None):
+        """Count one occurrence of a traceback; store it in full while the fingerprint has fewer than keep_tracebacks."""
+        fp, exc_type, location = fingerprint(tb)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    """INSERT INTO fingerprints (fp, exc_type, summary, location, count, first_seen, last_seen, last_ref)
+                       VALUES (?, ?, ?, ?, 1, ?, ?, ?)
+                       ON CONFLICT(fp) DO UPDATE SET
+                           count = count + 1, summary = excluded.summary, last_seen = excluded.last_seen,
+                           last_ref = COALESCE(excluded.last_ref, last_ref)""",
+                    (fp, exc_type, logformat.tb_summary(tb), location, ts, ts, ref),
+                )
+                self._conn.execute(
+                    """INSERT INTO fingerprint_samples (fp, ref, ts, traceback)
+                       SELECT ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM fingerprint_samples WHERE fp = ?) < ?""",
+                    (fp, ref, ts, tb, fp, self.keep_tracebacks),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _aggregates(self, where: str, params: tuple) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT f.fp, f.exc_type, f.summary, f.location, f.count, f.first_seen, f.last_seen, f.last_ref,
+                           (SELECT COUNT(*) FROM fingerprint_samples s WHERE s.fp = f.fp)
+                    FROM fingerprints f {where}""", params
+            ).fetchall()
+        keys = ("fingerprint", "exc_type", "summary", "location", "count", "first_seen", "last_seen",
+                "last_ref", "tracebacks_stored")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def summary(self, limit: int = 100) -> list:
+        """Aggregates, most recently seen first."""
+        return self._aggregates("ORDER BY f.last_seen DESC LIMIT ?", (limit,))
+
+    def aggregate(self, fp: str):
+        """One fingerprint's aggregate with its stored tracebacks, or None."""
+        found = self._aggregates("WHERE f.fp = ?", (fp,))
+        return dict(found[0], tracebacks=self.samples(fp)) if found else None
+
+    def samples(self, fp: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ref, ts, traceback FROM fingerprint_samples WHERE fp = ? ORDER BY rowid", (fp,)
+            ).fetchall()
+        return [{"ref": ref, "ts": ts, "traceback": tb} for ref, ts, tb in rows]
+
+    @staticmethod
+    def _row(record: dict) -> tuple:
+        stored = {k: v for k, v in record.items() if k != "embed"}
+        return record["error_code"], record.get("ts"), codec.dumps(stored)
+
+    # ── Reference codes ──────────────────────────────────────────────────────
+    def add(self, record: dict) -> bool:
+        """Index one record by its error_code. False if the code was already indexed."""
+        if not record.get("error_code"):
+            return False
+        with self._lock:
+            cur = self._conn.execute("INSERT OR IGNORE INTO errors (ref, ts, data) VALUES (?, ?, ?)",
+                                     self._row(record))
+        return cur.rowcount == 1
+
+    def index(self, record: dict, tb: str = None):
+        """Everything write_log indexes for one record: its reference code and, given the full traceback, its fingerprint."""
+        self.add(record)
+        if tb:
+            self.record_occurrence(tb, ref=record.get("error_code"), ts=record.get("ts"))
+
+    def add_many(self, records) -> int:
+        rows = [self._row(r) for r in records if r.get("error_code")]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO errors (ref, ts, data) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def get(self, ref: str):
+        """Dashboard-shaped entry for a reference code (plus "ref"), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM errors WHERE ref = ?", (ref.strip().upper(),)).fetchone()
+        if not row:
+            return None
+        entry = dict(logformat.to_entry(codec.loads(row[0])), ref=ref.strip().upper())
+        if not entry["traceback"] and entry.get("fingerprint"):
+            # Logged as a repeat: show the first stored traceback of the same fingerprint.
+            samples = self.samples(entry["fingerprint"])[:1]
+            if samples:
+                entry["traceback"] = samples[0]["traceback"]
+                entry["traceback_from"] = samples[0]["ref"]
+        return entry
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM errors").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"refs": self.count(), "fingerprints": len(self._seen),
+                "tracebacks_elided": self.tracebacks_elided}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _decode(line: str):
+    try:
+        record = codec.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _records(log_path: str, segments_dir: str = None):
+    """Every record in the rotated segments (oldest first) and then the active log."""
+    if segments_dir:
+        from logsegments import LogSegments
+        segments = LogSegments(segments_dir)
+        for segment in segments.segments:
+            yield from filter(None, map(_decode, segments.read_lines(segment)))
+    if os.path.exists(log_path):
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            if logformat.is_jsonl(log_path):
+                yield from filter(None, map(_decode, f))
+            else:                                   # not converted yet
+                yield from logformat.parse_legacy(f.read())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "rebuild":
+        print("usage: python errorindex.py rebuild <errors.db> <utilities.log> [segments dir]")
+        sys.exit(2)
+    index = ErrorIndex(sys.argv[2])
+    added = index.add_many(_records(sys.argv[3], sys.argv[4] if len(sys.argv) == 5 else None))
+    print(f"✅ Indexed {added} new error references ({index.count()} total)")
+    index.close()
@@ -0,0 +1,140 @@
+# indexes.py — Secondary indexes and live counters over the flight working set
+#
+# Maps dep_date / status / host_user_id / dep_code / arr_code values to the
+# set of flight codes that carry them, so day boards and filtered API queries
+# touch only the matching flights instead of scanning user_data. The index is
+# kept in step by calling reindex() whenever a flight is created or saved and
+# remove() when it is deleted.
+#
+# StatusCounters keeps the per-status histogram behind /api/stats. It is moved
+# in the same synchronous step as the index, and verify() recounts from
+# scratch to catch any drift.
+
+from collections import Counter, defaultdict
+from datetime import datetime
+
+INDEXED_FIELDS = ("dep_date", "status", "host_user_id", "dep_code", "arr_code")
+STATUS_POS     = INDEXED_FIELDS.index("status")
+
+
+class FlightIndex:
+    """value → {codes} maps for INDEXED_FIELDS."""
+
+    def __init__(self):
+        self._maps = {f: defaultdict(set) for f in INDEXED_FIELDS}
+        self._keys = {}   # code -> tuple of the values it is currently filed under
+
+    def _unfile(self, code: str, keys: tuple):
+        for field, value in zip(INDEXED_FIELDS, keys):
+            bucket = self._maps[field].get(value)
+            if bucket is not None:
+                bucket.discard(code)
+                if not bucket:
+                    del self._maps[field][value]
+
+    def reindex(self, code: str, record) -> tuple:
+        """(Re)file a flight under its current values. Returns the previous values (or None)."""
+        keys = tuple(_norm(getattr(record, f, None)) for f in INDEXED_FIELDS)
+        old = self._keys.get(code)
+        if old == keys:
+            return old
+        if old is not None:
+            self._unfile(code, old)
+        for field, value in zip(INDEXED_FIELDS, keys):
+            self._maps[field][value].add(code)
+        self._keys[code] = keys
+        return old
+
+    def remove(self, code: str) -> tuple:
+        old = self._keys.pop(code, None)
+        if old is not None:
+            self._unfile(code, old)
+        return old
+
+    def rebuild(self, flights: dict):
+        self.__init__()
+        for code, record in flights.items():
+            self.reindex(code, record)
+
+    def lookup(self, field: str, value) -> set:
+        return self._maps[field].get(_norm(value), set())
+
+    def airport(self, iata: str) -> set:
+        """Flights departing from or arriving at an airport code."""
+        iata = (iata or "").upper()
+        return self.lookup("dep_code", iata) | self.lookup("arr_code", iata)
+
+    def query(self, airport: str = None, **filters) -> set:
+        """Codes matching every given filter (field=value); smallest bucket first."""
+        sets = [self.lookup(f, v) for f, v in filters.items() if v is not None]
+        if airport:
+            sets.append(self.airport(airport))
+        if not sets:
+            return set(self._keys)
+        sets.sort(key=len)
+        result = set(sets[0])
+        for s in sets[1:]:
+            result &= s
+            if not result:
+                break
+        return result
+
+    def counts(self, field: str) -> dict:
+        return {value: len(codes) for value, codes in self._maps[field].items()}
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def _norm(value):
+    return str(value) if value is not None else None
+
+
+class StatusCounters:
+    """Flight count per status, updated incrementally so reads are O(1)."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total  = 0
+        self.checks = {"runs": 0, "drift_detected": 0, "last_drift": None, "last_run": None}
+
+    def move(self, old_status, new_status):
+        """Account for a flight going old → new (None = did not exist / no longer exists)."""
+        if old_status == new_status:
+            return
+        if old_status is None:
+            self.total += 1
+        else:
+            self.counts[old_status] -= 1
+            if self.counts[old_status] <= 0:
+                del self.counts[old_status]
+        if new_status is None:
+            self.total -= 1
+        else:
+            self.counts[new_status] += 1
+
+    @staticmethod
+    def _count(flights: dict) -> Counter:
+        return Counter(_norm(getattr(r, "status", None)) for r in flights.values())
+
+    def rebuild(self, flights: dict):
+        self.counts = self._count(flights)
+        self.total  = len(flights)
+
+    def verify(self, flights: dict) -> dict:
+        """Recount from scratch; on mismatch adopt the recount and return {status: [live, actual]}."""
+        actual = self._count(flights)
+        drift = {
+            s: [self.counts.get(s, 0), actual.get(s, 0)]
+            for s in set(self.counts) | set(actual)
+            if self.counts.get(s, 0) != actual.get(s, 0)
+        }
+        if self.total != len(flights):
+            drift["_total"] = [self.total, len(flights)]
+        self.checks["runs"] += 1
+        self.checks["last_run"] = datetime.utcnow().isoformat() + "Z"
+        if drift:
+            self.checks["drift_detected"] += 1
+            self.checks["last_drift"] = drift
+            self.counts, self.total = actual, len(flights)
+        return drift
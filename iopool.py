@@ -0,0 +1,69 @@
+# iopool.py — Off-loop file I/O and event-loop lag measurement
+#
+# discord.py heartbeats and the dashboard API share one asyncio loop, so any
+# blocking open()/write()/fsync() inside a coroutine stalls both. Storage and
+# log file I/O goes through io_executor instead. It has a single worker so
+# writes keep the order they were submitted in.
+
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aic-io")
+
+
+async def run_io(fn, *args):
+    """Run a blocking callable on the I/O executor and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(io_executor, fn, *args)
+
+
+def atomic_write(path: str, text: str):
+    """Replace `path` with `text` via temp file + fsync + rename (never truncate in place)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up — a direct measure of loop stalls."""
+
+    def __init__(self, interval: float = 0.25, window: int = 240):
+        self.interval = interval
+        self.samples  = deque(maxlen=window)
+        self.max_lag  = 0.0
+        self._task    = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - t0 - self.interval
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def snapshot(self) -> dict:
+        """Lag stats in milliseconds over the sample window."""
+        if not self.samples:
+            return {"samples": 0, "avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            "samples": len(ordered),
+            "avg_ms":  round(sum(ordered) / len(ordered) * 1000, 2),
+            "p99_ms":  round(p99 * 1000, 2),
+            "max_ms":  round(self.max_lag * 1000, 2),
+        }
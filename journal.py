@@ -0,0 +1,202 @@
+# journal.py — Append-only mutation journal for user_data (STORE_BACKEND=journal)
+#
+# Alternative to the SQLite store with the same interface. The snapshot is a
+# plain user_data.json; every change after it is one JSON line in
+# <snapshot>.journal:
+#   {"op":"put","k":code,"v":{...}}            create / replace a key
+#   {"op":"set","k":code,"p":["gate","dep"],"v":"A1"}
+#   {"op":"unset","k":code,"p":["announce_message_id"]}
+#   {"op":"del","k":code}
+# save() diffs the entry against the last persisted copy, so a gate change
+# writes one small "set" line no matter how many flights exist. Lines are
+# fsynced in batches, and a background thread folds the journal into a fresh
+# snapshot once it passes JOURNAL_COMPACT_BYTES. Replay is idempotent, so a
+# crash between snapshot replace and journal truncate is harmless; a line torn
+# by a crash mid-write is cut off the journal on replay.
+
+import copy
+import os
+import threading
+
+import codec
+from iopool import atomic_write
+from store import IMPORT_MARKER, is_flight
+
+META_KEY = "_meta"
+
+
+def _diff(key: str, path: list, old, new, out: list):
+    """Append the set/unset records that turn `old` into `new`."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for k in old:
+            if k not in new:
+                out.append({"op": "unset", "k": key, "p": path + [k]})
+        for k, v in new.items():
+            if k not in old:
+                out.append({"op": "set", "k": key, "p": path + [k], "v": v})
+            elif old[k] != v:
+                _diff(key, path + [k], old[k], v, out)
+    elif old != new:
+        out.append({"op": "set", "k": key, "p": path, "v": new})
+
+
+def _apply(state: dict, rec: dict):
+    op, key = rec["op"], rec["k"]
+    if op == "put":
+        state[key] = rec["v"]
+    elif op == "del":
+        state.pop(key, None)
+    elif op == "set":
+        node = state.setdefault(key, {})
+        *parents, leaf = rec["p"]
+        for p in parents:
+            node = node.setdefault(p, {})
+        node[leaf] = rec["v"]
+    elif op == "unset":
+        node = state.get(key)
+        *parents, leaf = rec["p"]
+        for p in parents:
+            node = node.get(p) if isinstance(node, dict) else None
+        if isinstance(node, dict):
+            node.pop(leaf, None)
+
+
+class JournalStore:
+    """Snapshot + append-only journal with batched fsync and background compaction."""
+
+    def __init__(self, snapshot_path: str, fsync_every: int = 32,
+                 fsync_interval: float = 1.0, compact_bytes: int = 1 << 20):
+        self.path           = snapshot_path
+        self.journal_path   = snapshot_path + ".journal"
+        self.fsync_every    = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_bytes  = compact_bytes
+        self.stats          = {"records": 0, "fsyncs": 0, "compactions": 0, "replayed": 0}
+        self._lock     = threading.RLock()
+        self._unsynced = 0
+        self._state    = self._replay()
+        self._file     = open(self.journal_path, "a", encoding="utf-8")
+        self._stop     = threading.Event()
+        self._worker   = threading.Thread(target=self._background, name="journal-compactor", daemon=True)
+        self._worker.start()
+
+    # ── Replay ───────────────────────────────────────────────────────────────
+    def _replay(self) -> dict:
+        state = {}
+        if os.path.exists(self.path):
+            state = codec.load_file(self.path)
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb+") as f:
+                good = 0    # offset just past the last complete record
+                for line in f:
+                    try:
+                        rec = codec.loads(line)
+                    except ValueError:
+                        break  # torn tail from a crash mid-write
+                    _apply(state, rec)
+                    self.stats["replayed"] += 1
+                    good += len(line)
+                    if not line.endswith(b"\n"):
+                        f.write(b"\n")   # complete record, newline lost: terminate it
+                        good += 1
+                # Cut the torn tail off, or the next append would be glued onto it
+                # and lost (with everything after it) on the following replay.
+                f.truncate(good)
+        return state
+
+    def load(self) -> dict:
+        with self._lock:
+            return {k: copy.deepcopy(v) for k, v in self._state.items() if k != META_KEY}
+
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            return copy.deepcopy(self._state.get(META_KEY, {}).get(key, default))
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(1 for k, v in self._state.items() if is_flight(k, v))
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+    def _append(self, records: list):
+        for rec in records:
+            self._file.write(codec.dumps(rec) + "\n")
+            _apply(self._state, copy.deepcopy(rec))
+        self.stats["records"] += len(records)
+        self._unsynced += len(records)
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self.stats["fsyncs"] += 1
+
+    def save(self, key: str, value):
+        with self._lock:
+            old = self._state.get(key)
+            if old is None or not (isinstance(old, dict) and isinstance(value, dict)):
+                records = [] if old == value else [{"op": "put", "k": key, "v": value}]
+            else:
+                records = []
+                _diff(key, [], old, value, records)
+            if records:
+                self._append(records)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._state:
+                self._append([{"op": "del", "k": key}])
+
+    upsert_flight = save
+    delete_flight = delete
+
+    def set_meta(self, key: str, value):
+        with self._lock:
+            self._append([{"op": "set", "k": META_KEY, "p": [key], "v": value}])
+
+    def delete_meta(self, key: str):
+        with self._lock:
+            self._append([{"op": "unset", "k": META_KEY, "p": [key]}])
+
+    def save_all(self, data: dict):
+        with self._lock:
+            for key, value in data.items():
+                self.save(key, value)
+            self._sync()
+
+    def import_json(self, json_path: str) -> int:
+        """Fold a legacy user_data.json into the journal. Returns the flight count."""
+        data = codec.load_file(json_path)
+        self.save_all(data)
+        self.set_meta(IMPORT_MARKER, {"path": os.path.abspath(json_path)})
+        return sum(1 for k, v in data.items() if is_flight(k, v))
+
+    # ── Compaction ───────────────────────────────────────────────────────────
+    def compact(self):
+        """Write the current state as a new snapshot and truncate the journal."""
+        with self._lock:
+            self._sync()
+            atomic_write(self.path, codec.dumps(self._state))
+            self._file.close()
+            self._file = open(self.journal_path, "w", encoding="utf-8")
+            self.stats["compactions"] += 1
+
+    def _background(self):
+        while not self._stop.wait(self.fsync_interval):
+            try:
+                with self._lock:
+                    if self._unsynced:
+                        self._sync()
+                    too_big = self._file.tell() >= self.compact_bytes
+                if too_big:
+                    self.compact()
+            except Exception as e:
+                print(f"❌ Journal background error: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._worker.join(timeout=5)
+        with self._lock:
+            self._sync()
+            self._file.close()
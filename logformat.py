@@ -0,0 +1,638 @@
+# logformat.py — One-line JSONL records for utilities.log
+#
+# Every log event is written as exactly one JSON object per line:
+#
+#   {"ts": "2026-02-18T23:39:43.510Z", "time": "23:39:43", "level": "error",
+#    "source": "bot", "user": "deivid", "user_id": "7678...", "action": "...",
+#    "error_code": "V9PNY80", "traceback": "Traceback (most recent ...)\n...",
+#    "embed": {...}}
+#
+# Optional fields are omitted when empty; newlines inside tracebacks and
+# embed text are JSON-escaped, so reading the log is one json.loads per line.
+#
+# Older logs mixed JSON lines, indent=2 embed dumps, emoji status text and raw
+# tracebacks. parse_legacy() understands that format, and
+#   python logformat.py convert utilities.log
+# rewrites such a file in place as JSONL (the original is kept as .legacy).
+# Whether a file still needs that is decided by explicit markers (see
+# is_jsonl), never by whether every line parses: a line torn by a crash is cut
+# off by repair_tail() instead.
+#
+# /api/logs filters and pages with LogQuery and read_page(): the scan runs
+# newest first over the active file and then the rotated segments, stops as
+# soon as the page is full, and hands back an opaque cursor for the next one.
+
+import base64
+import io
+import os
+import re
+import sys
+from collections import deque
+from datetime import datetime
+
+import codec
+
+LEVELS = ("info", "ok", "warn", "error")
+
+
+def classify(text: str) -> str:
+    """Level for a free-text status line, from the emoji/keywords the bot uses."""
+    if "❌" in text or "Error" in text or "FAILED" in text:
+        return "error"
+    if "✅" in text:
+        return "ok"
+    if "⚠" in text:
+        return "warn"
+    return "info"
+
+
+def make_record(action: str, user: str = "system", level: str = None, source: str = "system",
+                **fields) -> dict:
+    """A log record; extra fields (user_id, error_code, traceback, embed, ...) are kept when truthy."""
+    now = datetime.utcnow()
+    record = {
+        "ts": now.isoformat(timespec="milliseconds") + "Z",
+        "time": now.strftime("%H:%M:%S"),
+        "level": level or classify(action),
+        "source": source,
+        "user": user,
+        "action": action,
+    }
+    record.update({k: v for k, v in fields.items() if v})
+    return record
+
+
+def encode(record) -> str:
+    return codec.dumps(record) if isinstance(record, dict) else codec.dumps(make_record(str(record)))
+
+
+def line_ts(line: str):
+    """The "ts" of an encoded record line, or None for legacy/converted lines."""
+    return codec.loads(line).get("ts")
+
+
+def render(record) -> str:
+    """Human-readable console form of a record."""
+    if not isinstance(record, dict):
+        return str(record)
+    head = f"[{record.get('time', '—')}] {record.get('level', 'info').upper():5} {record.get('user', 'system')}: {record.get('action', '')}"
+    if record.get("error_code"):
+        head += f" [{record['error_code']}]"
+    if record.get("traceback"):
+        head += "\n" + record["traceback"].rstrip()
+    return head
+
+
+def tb_summary(tb: str) -> str:
+    """The exception line of a traceback ("ValueError: boom")."""
+    for line in reversed(tb.splitlines()):
+        line = line.strip()
+        if line and not line.startswith(("File ", "Traceback", "During")):
+            return line
+    return ""
+
+
+def to_entry(record: dict) -> dict:
+    """Dashboard shape of a stored record (embed payload dropped, tb_summary added)."""
+    entry = {
+        "time": record.get("time", "—"),
+        "user": record.get("user", "system"),
+        "action": record.get("action", ""),
+        "level": record.get("level", "info"),
+        "traceback": record.get("traceback"),
+        "source": record.get("source", "system"),
+    }
+    # tb_summary is stored instead of the traceback for repeats of a known fingerprint.
+    for key in ("ts", "user_id", "error_code", "flight", "fingerprint", "tb_summary"):
+        if record.get(key):
+            entry[key] = record[key]
+    if entry["traceback"]:
+        entry["tb_summary"] = tb_summary(entry["traceback"])
+    return entry
+
+
+def decode_record(line):
+    """The stored record on one JSONL line (str or bytes), or None if it is not a record."""
+    if isinstance(line, bytes):
+        line = line.decode("utf-8", errors="replace")
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        record = codec.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or "action" not in record:
+        return None
+    return record
+
+
+def parse_line(line):
+    """Decode one JSONL line (str or bytes) to a dashboard entry, or None if it is not a record."""
+    record = decode_record(line)
+    return to_entry(record) if record is not None else None
+
+
+def entry_for_line(line):
+    """parse_line(), but stray non-record text becomes a plain system entry. None for blank lines."""
+    entry = parse_line(line)
+    if entry is None:
+        text = (line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line).strip()
+        if text:
+            entry = {"time": "—", "user": "system", "action": text[:400],
+                     "level": classify(text), "traceback": None, "source": "system"}
+    return entry
+
+
+# ── Reading newest first ──────────────────────────────────────────────────────
+def iter_reversed(f, end: int = None, block_size: int = 1 << 16):
+    """
+    Yield (offset, line) for the non-blank lines of a binary file object, last
+    to first, reading backwards in blocks from `end` (default: end of file).
+    `offset` is where the line starts, so it can resume a later read as `end`.
+    """
+    pos = f.seek(0, os.SEEK_END) if end is None else end
+    carry = b""
+    while pos > 0:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        lines = (f.read(step) + carry).split(b"\n")
+        carry = lines.pop(0)     # possibly cut mid-line; completed by the next block
+        offset = pos + len(carry) + 1
+        starts = []
+        for line in lines:
+            starts.append(offset)
+            offset += len(line) + 1
+        for start, line in zip(reversed(starts), reversed(lines)):
+            if line.strip():
+                yield start, line
+    if carry.strip():
+        yield 0, carry
+
+
+def iter_lines_reversed(path: str, block_size: int = 1 << 16):
+    """Yield the file's non-blank lines (bytes) last to first."""
+    with open(path, "rb") as f:
+        for _, line in iter_reversed(f, block_size=block_size):
+            yield line
+
+
+def tail_entries(path: str, limit: int) -> list:
+    """The newest `limit` entries of a log file, newest first. Cost scales with `limit`, not file size."""
+    entries = []
+    if limit <= 0 or not os.path.exists(path):
+        return entries
+    for line in iter_lines_reversed(path):
+        entry = entry_for_line(line)
+        if entry:
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+    return entries
+
+
+# ── Filtering and paging (/api/logs) ──────────────────────────────────────────
+SOURCES = ("dashboard", "bot", "system")
+
+
+def _choices(raw, allowed, name):
+    if not raw:
+        return None
+    values = {v.strip().lower() for v in raw.split(",") if v.strip()}
+    bad = values - set(allowed)
+    if bad:
+        raise ValueError(f"Invalid {name}: {', '.join(sorted(bad))}")
+    return values or None
+
+
+def _bound(raw, name):
+    """Normalise a since/until value to the "YYYY-MM-DDTHH:MM:SS.mmm" prefix records use."""
+    if not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.strip().rstrip("Z")).isoformat(timespec="milliseconds")
+    except ValueError:
+        raise ValueError(f"Invalid {name}: expected an ISO date/time such as 2026-02-18T23:00")
+
+
+class LogQuery:
+    """
+    Server-side filter for /api/logs. Every criterion is optional and all the
+    given ones must match: level and source take comma-separated lists, user
+    matches the name or ID, flight matches a flight code in the action text,
+    since (inclusive) / until (exclusive) compare UTC timestamps and q is a
+    case-insensitive substring of the action, user or error code.
+    Raises ValueError on malformed values.
+    """
+
+    def __init__(self, level=None, user=None, source=None, flight=None, since=None, until=None, q=None):
+        self.levels  = _choices(level, LEVELS, "level")
+        self.sources = _choices(source, SOURCES, "source")
+        self.user    = (user or "").strip().lower() or None
+        self.flight  = (flight or "").strip().upper() or None
+        self._flight = re.compile(rf"\b{re.escape(self.flight)}\b", re.I) if self.flight else None
+        self.since   = _bound(since, "since")
+        self.until   = _bound(until, "until")
+        self.text    = (q or "").strip().lower() or None
+        self.active  = any(v is not None for v in (self.levels, self.sources, self.user, self.flight,
+                                                   self.since, self.until, self.text))
+
+    def too_old(self, entry: dict) -> bool:
+        """True once a newest-first scan has passed `since`: nothing further can match."""
+        return bool(self.since and entry.get("ts") and entry["ts"] < self.since)
+
+    def matches(self, entry: dict) -> bool:
+        if self.levels and entry.get("level") not in self.levels:
+            return False
+        if self.sources and (entry.get("source") or "system") not in self.sources:
+            return False
+        if self.user and self.user not in (str(entry.get("user", "")).lower(), str(entry.get("user_id", "")).lower()):
+            return False
+        if self.since or self.until:
+            ts = entry.get("ts")
+            if not ts or (self.since and ts < self.since) or (self.until and ts >= self.until):
+                return False
+        if self.flight and not (str(entry.get("flight", "")).upper() == self.flight
+                                or self._flight.search(entry.get("action", ""))):
+            return False
+        if self.text and not any(self.text in str(entry.get(k) or "").lower() for k in ("action", "user", "error_code")):
+            return False
+        return True
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(codec.dumpb(position)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        position = codec.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def read_page(path: str, segments, query: LogQuery, limit: int, cursor: str = None,
+              max_scan: int = 0) -> tuple:
+    """
+    One page of matching entries, newest first, from the active log and then
+    the rotated segments (a LogSegments). Returns (entries, next_cursor);
+    next_cursor is None when nothing older is left to read.
+
+    The scan stops as soon as the page is full, once it passes query.since,
+    or after max_scan lines (the cursor then resumes where it stopped). A
+    cursor pins a byte offset in the active file (identified by its inode and
+    the newest segment at the time, so a rotation in between is followed into
+    the new segment) or in a segment; cursors from the in-memory ring carry a
+    timestamp instead and are resolved by skipping forward to it.
+    """
+    pos = decode_cursor(cursor) if cursor else {}
+    newest = segments.newest_first()
+    top_seq = newest[0]["seq"] if newest else 0
+    sources = []    # ("active" | "seg", segment, end offset or None)
+
+    def segment_sources(below_or_at: int, first_end=None):
+        for segment in newest:
+            if segment["seq"] <= below_or_at:
+                end = first_end if segment["seq"] == below_or_at else None
+                sources.append(("seg", segment, end))
+
+    if "seq" in pos:                                     # inside a segment
+        segment_sources(pos["seq"], pos.get("off"))
+    elif "ino" in pos:                                   # inside the active file
+        try:
+            same_file = os.stat(path).st_ino == pos["ino"] and top_seq == pos.get("after", 0)
+        except OSError:
+            same_file = False
+        if same_file:
+            sources.append(("active", None, pos.get("off")))
+            segment_sources(top_seq)
+        else:                                            # rotated since: it is now segment after+1
+            segment_sources(pos.get("after", 0) + 1, pos.get("off"))
+    else:
+        if os.path.exists(path):
+            sources.append(("active", None, None))
+        segment_sources(top_seq)
+
+    skip_newer, skip_same = pos.get("ts"), pos.get("skip", 0)
+    entries, scanned = [], 0
+    for kind, segment, end in sources:
+        if kind == "seg" and query.since and (segment.get("last_ts") or "9") < query.since:
+            return entries, None
+        if kind == "seg" and query.until and not skip_newer and (segment.get("first_ts") or "") >= query.until:
+            continue                                     # entirely newer than the range
+        if kind == "active":
+            try:
+                f = open(path, "rb")
+            except OSError:
+                continue
+            here = {"ino": os.fstat(f.fileno()).st_ino, "after": top_seq}
+        else:
+            f = io.BytesIO(segments.read_bytes(segment))
+            here = {"seq": segment["seq"]}
+        with f:
+            for offset, line in iter_reversed(f, end):
+                scanned += 1
+                if max_scan and scanned > max_scan and not skip_newer:
+                    return entries, encode_cursor(dict(here, off=offset + len(line)))
+                entry = entry_for_line(line)
+                if not entry:
+                    continue
+                if skip_newer:
+                    ts = entry.get("ts") or ""
+                    if ts > skip_newer:
+                        continue
+                    if ts == skip_newer and skip_same:
+                        skip_same -= 1
+                        continue
+                    skip_newer = None
+                if query.too_old(entry):
+                    return entries, None
+                if query.matches(entry):
+                    entries.append(entry)
+                    if len(entries) >= limit:
+                        return entries, encode_cursor(dict(here, off=offset))
+    return entries, None
+
+
+class RecentEntries:
+    """
+    Ring buffer of the newest parsed entries, so the dashboard's Logs tab is
+    served without touching the file. page() returns None when the ring
+    cannot answer (the page is not full and older entries exist on disk).
+    """
+
+    def __init__(self, size: int = 2000):
+        self._ring    = deque(maxlen=size)   # oldest first
+        self.complete = False                # True while the ring holds the entire log
+        self.stats    = {"hits": 0, "misses": 0}
+
+    def push(self, entry: dict):
+        if len(self._ring) == self._ring.maxlen:
+            self.complete = False
+        self._ring.append(entry)
+
+    def seed(self, newest_first: list):
+        """Prime from disk after a restart (entries newest first, as the readers return them)."""
+        self._ring.extendleft(newest_first[:self._ring.maxlen - len(self._ring)])
+        self.complete = len(newest_first) < self._ring.maxlen
+
+    def page(self, query: "LogQuery", limit: int):
+        """
+        First page of a (possibly filtered) read, as (entries, next_cursor), or
+        None when the ring alone cannot answer it and read_page() has to go to disk.
+        """
+        entries, last_ts, same_ts = [], None, 0
+        for entry in reversed(self._ring):
+            ts = entry.get("ts")
+            same_ts = same_ts + 1 if ts == last_ts else 1
+            last_ts = ts
+            if query.too_old(entry):
+                break
+            if query.matches(entry):
+                entries.append(entry)
+                if len(entries) >= limit:
+                    if not ts:          # no timestamp to resume from
+                        self.stats["misses"] += 1
+                        return None
+                    self.stats["hits"] += 1
+                    return entries, encode_cursor({"ts": ts, "skip": same_ts})
+        else:
+            if not self.complete:
+                self.stats["misses"] += 1
+                return None
+        self.stats["hits"] += 1
+        return entries, None
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, size=len(self._ring), capacity=self._ring.maxlen, complete=self.complete)
+
+
+# ── Legacy format ─────────────────────────────────────────────────────────────
+def _extract_json_at(s: str, start: int):
+    depth, in_str, esc = 0, False, False
+    for i in range(start, len(s)):
+        c = s[i]
+        if esc:
+            esc = False
+            continue
+        if c == '\\' and in_str:
+            esc = True
+            continue
+        if c == '"':
+            in_str = not in_str
+        if not in_str:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if depth == 0:
+                    return s[start:i + 1], i + 1
+    return None, start
+
+
+def parse_legacy(content: str) -> list:
+    """Entries (oldest first) from the pre-JSONL mixed log format."""
+    content = content.replace('\r\n', '\n')
+    entries = []
+
+    # Pass 1: split into embed/JSON objects and the raw text chunks between them.
+    segments = []
+    pos = 0
+    while pos < len(content):
+        m = re.search(r'\{', content[pos:])
+        if not m:
+            tail = content[pos:].strip()
+            if tail:
+                segments.append(('raw', tail))
+            break
+        raw_before = content[pos: pos + m.start()].strip()
+        if raw_before:
+            segments.append(('raw', raw_before))
+        obj_start = pos + m.start()
+        obj_str, end = _extract_json_at(content, obj_start)
+        if obj_str:
+            try:
+                segments.append(('json', codec.loads(obj_str)))
+            except ValueError:
+                segments.append(('raw', obj_str))
+            pos = end
+        else:
+            pos = obj_start + 1
+
+    # Pass 2: turn segments into entries, attaching ref codes and tracebacks
+    # to the error entry they follow.
+    for kind, data in segments:
+        if kind == 'json':
+            if isinstance(data, dict) and 'action' in data and 'user' in data:
+                entries.append({
+                    "time": data.get('time', '—'),
+                    "user": data.get('user', 'system'),
+                    "action": data['action'],
+                    "level": data.get('level', 'info'),
+                    "traceback": None,
+                    "source": "dashboard",
+                })
+            elif isinstance(data, dict) and data.get('embeds'):
+                embed = data['embeds'][0]
+                fields = {f['name']: f['value'] for f in embed.get('fields', [])}
+                user_raw = fields.get('Username', 'system')
+                uid_match = re.search(r'<@(\d+)>', user_raw)
+                action = re.sub(r'^```\w*\n?|```$', '', fields.get('Action Performed', '').strip()).strip()
+                error_code = fields.get('Error Code', None)
+                if error_code:
+                    error_code = error_code.strip('`')
+                entries.append({
+                    "time": "—",
+                    "user": uid_match.group(1) if uid_match else user_raw,
+                    "action": action,
+                    "level": 'error' if error_code or 'FAILED' in action else 'info',
+                    "error_code": error_code,
+                    "traceback": None,
+                    "source": "bot",
+                    "embed": data,
+                })
+            continue
+
+        for block in (b.strip() for b in re.split(r'\n\s*\n', data.strip())):
+            if not block:
+                continue
+            lines = block.split('\n')
+            if re.match(r'❌\s*\[', lines[0]):
+                # "❌ [ABCDEFG]" ref code line
+                ref_match = re.search(r'\[([A-Z0-9]{5,10})\]', lines[0])
+                if entries and ref_match:
+                    entries[-1]['error_code'] = entries[-1].get('error_code') or ref_match.group(1)
+                continue
+            if any('Traceback' in l or 'File "' in l or 'Error:' in l for l in lines):
+                tb_text = '\n'.join(l for l in lines if l.strip() != "Traceback:")
+                if entries and entries[-1]['level'] == 'error':
+                    if not entries[-1].get('traceback'):
+                        entries[-1]['traceback'] = tb_text
+                else:
+                    entries.append({
+                        "time": "—",
+                        "user": "system",
+                        "action": tb_summary(tb_text) or "Unhandled exception",
+                        "level": "error",
+                        "traceback": tb_text,
+                        "source": "bot",
+                    })
+                continue
+            joined = ' '.join(l.strip() for l in lines if l.strip())
+            if joined:
+                entries.append({
+                    "time": "—",
+                    "user": "system",
+                    "action": joined[:400],
+                    "level": classify(joined),
+                    "traceback": None,
+                    "source": "system",
+                })
+    return entries
+
+
+def is_jsonl(path: str) -> bool:
+    """
+    False only for a legacy log that still needs convert_legacy(). Decided by
+    markers: the first record carries "ts" (every record encode() writes
+    does), or a .legacy backup exists (converted records have no "ts"). A
+    legacy log can start with a single-line dashboard record, which parses
+    as a record but has no "ts".
+    """
+    if not os.path.exists(path) or os.path.exists(path + ".legacy"):
+        return True
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                record = decode_record(line)
+                return record is not None and "ts" in record
+    return True
+
+
+def repair_tail(path: str) -> int:
+    """
+    Cut a torn last line (a crash mid-write) off a JSONL log, so the next
+    append starts on a line of its own. A complete record that only lost its
+    newline is terminated instead. Returns the number of bytes cut.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        start = f.seek(0, os.SEEK_END)
+        tail = b""
+        while start > 0:
+            step = min(start, 1 << 16)
+            start -= step
+            f.seek(start)
+            tail = f.read(step) + tail
+            cut = tail.rfind(b"\n")
+            if cut >= 0:
+                start += cut + 1
+                tail = tail[cut + 1:]
+                break
+        if not tail:
+            return 0
+        if decode_record(tail) is not None:
+            f.seek(0, os.SEEK_END)
+            f.write(b"\n")
+            return 0
+        f.truncate(start)
+        return len(tail)
+
+
+def _legacy_runs(f):
+    """("record", line) for lines that already are JSONL records, ("legacy", text) for the runs between them."""
+    run = []
+    for line in f:
+        if decode_record(line) is not None:
+            if run:
+                yield "legacy", "".join(run)
+                run = []
+            yield "record", line
+        else:
+            run.append(line)
+    if run:
+        yield "legacy", "".join(run)
+
+
+def convert_legacy(path: str) -> tuple:
+    """
+    Rewrite a legacy log as JSONL in place. Lines that already are records
+    are copied unchanged (keeping ts, error_code, traceback, ...); only the
+    text between them goes through parse_legacy(). The original is kept as
+    <path>.legacy, or .legacy.N if an earlier backup exists: that one is
+    never replaced. Returns (record count, backup path).
+    """
+    count = 0
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(path, "r", encoding="utf-8", errors="replace") as src, open(tmp, "w", encoding="utf-8") as out:
+        for kind, data in _legacy_runs(src):
+            if kind == "record":
+                out.write(data.rstrip("\r\n") + "\n")
+                count += 1
+                continue
+            for entry in parse_legacy(data):
+                out.write(codec.dumps({k: v for k, v in entry.items() if v is not None}) + "\n")
+                count += 1
+    backup, n = path + ".legacy", 0
+    while os.path.exists(backup):
+        n += 1
+        backup = f"{path}.legacy.{n}"
+    os.replace(path, backup)
+    os.replace(tmp, path)
+    return count, backup
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "convert":
+        print("usage: python logformat.py convert <utilities.log>")
+        sys.exit(2)
+    if is_jsonl(sys.argv[2]):
+        print(f"✅ {sys.argv[2]} is already JSONL")
+    else:
+        n, backup = convert_legacy(sys.argv[2])
+        print(f"✅ Converted {n} records; original kept as {backup}")
@@ -0,0 +1,94 @@
+# logpolicy.py — Per-action sampling / suppression of log records
+#
+# Button presses ("Pressed component: ...", "Pressed ConfirmView ...") are
+# most of the log volume and most of the log-channel traffic. A policy maps
+# action-text prefixes to what happens to matching records:
+#
+#   always     written to utilities.log and sent to the log channel (default)
+#   file       written to utilities.log only, no log-channel embed
+#   sample:N   1 in every N matching records is kept (as `always`), the rest dropped
+#   suppress   dropped entirely
+#
+# Configured as one string, rules separated by ";", longest prefix wins:
+#
+#   LOG_POLICY="Pressed component:=sample:10;Pressed ConfirmView=file"
+#
+# Errors are never sampled or suppressed; callers pass them straight through.
+
+ALWAYS   = (True, True)    # (to_file, to_channel)
+FILE     = (True, False)
+DROP     = (False, False)
+MODES    = ("always", "file", "sample", "suppress")
+
+
+class _Rule:
+    __slots__ = ("prefix", "mode", "every", "seen", "lines_saved", "embeds_saved")
+
+    def __init__(self, prefix: str, mode: str, every: int = 1):
+        self.prefix = prefix
+        self.mode   = mode
+        self.every  = every
+        self.seen   = 0
+        self.lines_saved  = 0
+        self.embeds_saved = 0
+
+
+class LogPolicy:
+    """Decides, per action text, whether a record goes to the file and/or the log channel."""
+
+    def __init__(self, rules=()):
+        # Longest prefix first, so "Pressed component: close" can override "Pressed component:".
+        self.rules = sorted((_Rule(*r) for r in rules), key=lambda r: len(r.prefix), reverse=True)
+        self._prefixes = tuple(r.prefix for r in self.rules)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LogPolicy":
+        """Build from "prefix=mode;prefix=sample:N;..."; raises ValueError on a bad rule."""
+        rules = []
+        for part in (spec or "").split(";"):
+            if not part.strip():
+                continue
+            prefix, sep, mode = part.rpartition("=")
+            mode = mode.strip().lower()
+            every = 1
+            if mode.startswith("sample:"):
+                mode, _, n = mode.partition(":")
+                try:
+                    every = int(n)
+                except ValueError:
+                    every = 0
+                if every < 1:
+                    raise ValueError(f"Invalid log policy rule {part!r}: sample needs a positive N")
+            if not sep or not prefix or mode not in MODES:
+                raise ValueError(f"Invalid log policy rule {part!r}: expected prefix=always|file|sample:N|suppress")
+            rules.append((prefix, mode, every))
+        return cls(rules)
+
+    def decide(self, action: str, channel: bool = True) -> tuple:
+        """(to_file, to_channel) for one record. `channel` is False for records that never have an embed."""
+        if not self._prefixes or not action.startswith(self._prefixes):
+            return ALWAYS
+        rule = next(r for r in self.rules if action.startswith(r.prefix))
+        rule.seen += 1
+        if rule.mode == "always":
+            return ALWAYS
+        if rule.mode == "sample" and rule.seen % rule.every == 1 % rule.every:
+            return ALWAYS
+        if rule.mode == "file":
+            rule.embeds_saved += channel
+            return FILE
+        rule.lines_saved  += 1
+        rule.embeds_saved += channel
+        return DROP
+
+    def stats(self) -> dict:
+        rules = {
+            r.prefix: {"mode": r.mode if r.mode != "sample" else f"sample:{r.every}", "seen": r.seen,
+                       "lines_saved": r.lines_saved, "embeds_saved": r.embeds_saved}
+            for r in self.rules
+        }
+        return {
+            "lines_saved": sum(r.lines_saved for r in self.rules),
+            "embeds_saved": sum(r.embeds_saved for r in self.rules),
+            "rules": rules,
+        }
@@ -0,0 +1,138 @@
+# logsegments.py — Rotated, gzip-compressed segments of utilities.log
+#
+# When the active log passes LOG_ROTATE_BYTES or LOG_ROTATE_SECONDS the log
+# writer hands it to LogSegments.add(): the file is renamed out of the way
+# (so writers reopen a fresh one immediately), compressed into a numbered
+# segment and recorded in manifest.json with its entry count and time range.
+# Retention drops the oldest segments past a count and/or an age.
+#
+#   logs/
+#     manifest.json
+#     log-000001.jsonl.gz
+#     log-000002.jsonl.gz
+#
+# Readers walk segments newest first and stop as soon as they have enough,
+# so a request for the latest entries never decompresses old history.
+
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from iopool import atomic_write
+
+
+class LogSegments:
+    """Manifest-indexed rotated log segments, oldest first."""
+
+    def __init__(self, directory: str, retain: int = 30, retain_days: float = 0, line_ts=None):
+        self.directory     = directory
+        self.line_ts       = line_ts        # line -> ISO timestamp or None
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.retain        = retain         # max segments kept (0 = unlimited)
+        self.retain_days   = retain_days    # drop segments whose newest entry is older (0 = off)
+        self._lock    = threading.Lock()
+        self._mtime   = None
+        self.segments = []
+        os.makedirs(directory, exist_ok=True)
+        self.refresh()
+
+    def refresh(self):
+        """Re-read the manifest if another process rotated since we last looked."""
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            self.segments = json.load(f).get("segments", [])
+        self._mtime = mtime
+
+    def _save(self):
+        atomic_write(self.manifest_path, json.dumps({"segments": self.segments}, indent=2))
+        self._mtime = os.path.getmtime(self.manifest_path)
+
+    def timestamp(self, line: bytes):
+        try:
+            return self.line_ts(line) if self.line_ts else None
+        except Exception:
+            return None
+
+    def add(self, active_path: str) -> dict:
+        """Move the active log into a new compressed segment. Returns its manifest entry."""
+        with self._lock:
+            self.refresh()
+            seq  = (self.segments[-1]["seq"] + 1) if self.segments else 1
+            name = f"log-{seq:06d}.jsonl.gz"
+            path = os.path.join(self.directory, name)
+            staged = f"{active_path}.rotating"
+            os.replace(active_path, staged)
+            raw_bytes = os.path.getsize(staged)
+            # Count and time-range the lines while compressing: other processes
+            # append to the same file, so no single writer knows the totals.
+            # The bytes are copied unchanged, so /api/logs cursors into the
+            # active file stay valid inside the segment.
+            count, first_ts, last = 0, None, None
+            with open(staged, "rb") as src, gzip.open(path, "wb") as dst:
+                for line in src:
+                    dst.write(line)
+                    if not line.strip():
+                        continue
+                    if count == 0:
+                        first_ts = self.timestamp(line)
+                    count += 1
+                    last = line
+            last_ts = self.timestamp(last) if last else None
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+            os.remove(staged)
+            segment = {
+                "seq": seq,
+                "file": name,
+                "count": count,
+                "first_ts": first_ts,
+                "last_ts": last_ts,
+                "bytes": raw_bytes,
+                "compressed_bytes": os.path.getsize(path),
+                "rotated_at": datetime.utcnow().isoformat() + "Z",
+            }
+            self.segments.append(segment)
+            self._apply_retention()
+            self._save()
+            return segment
+
+    def _apply_retention(self):
+        drop = []
+        if self.retain and len(self.segments) > self.retain:
+            drop = self.segments[:len(self.segments) - self.retain]
+        if self.retain_days:
+            cutoff = (datetime.utcnow() - timedelta(days=self.retain_days)).isoformat()
+            drop += [s for s in self.segments if s not in drop and (s.get("last_ts") or "") < cutoff]
+        for segment in drop:
+            try:
+                os.remove(os.path.join(self.directory, segment["file"]))
+            except OSError:
+                pass
+            self.segments.remove(segment)
+
+    def read_lines(self, segment: dict) -> list:
+        with gzip.open(os.path.join(self.directory, segment["file"]), "rt", encoding="utf-8", errors="replace") as f:
+            return f.readlines()
+
+    def read_bytes(self, segment: dict) -> bytes:
+        with gzip.open(os.path.join(self.directory, segment["file"]), "rb") as f:
+            return f.read()
+
+    def newest_first(self) -> list:
+        self.refresh()
+        return list(reversed(self.segments))
+
+    def stats(self) -> dict:
+        return {
+            "segments": len(self.segments),
+            "entries": sum(s["count"] for s in self.segments),
+            "bytes": sum(s.get("bytes", 0) for s in self.segments),
+            "compressed_bytes": sum(s.get("compressed_bytes", 0) for s in self.segments),
+        }
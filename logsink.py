@@ -0,0 +1,179 @@
+# logsink.py — Buffered, queue-backed writer for utilities.log
+#
+# safe_console_print used to open, append to and close the log file once per
+# line, and log_action emits several lines per action. Lines are now put on
+# a bounded queue and a background thread appends them in batches (up to
+# batch_lines, or whatever arrived within flush_interval) through a file
+# handle that stays open. When the queue is full the line is dropped and
+# counted rather than blocking the event loop; close() drains everything
+# still queued. Items may be records rather than strings: `encode` turns
+# them into file lines (and `render` into console text) on the writer thread,
+# so serialization cost stays off the event loop too.
+#
+# With `segments` set, this writer also rotates the file once it passes
+# max_bytes or max_age seconds (see logsegments.py). Writers in other
+# processes notice the rename and reopen the fresh file.
+
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class LogSink:
+    """Bounded queue + one writer thread appending batches to `path`."""
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_lines: int = 256,
+                 flush_interval: float = 0.5, echo: bool = True, encode=str, render=None,
+                 segments=None, max_bytes: int = 0, max_age: float = 0):
+        self.path           = path
+        self.encode         = encode
+        self.render         = render or encode
+        self.segments       = segments   # LogSegments, or None if this process never rotates
+        self.max_bytes      = max_bytes
+        self.max_age        = max_age
+        self.batch_lines    = batch_lines
+        self.flush_interval = flush_interval
+        self.echo           = echo     # also print to stdout, as safe_console_print always did
+        self._queue   = queue.Queue(maxsize=max_queue)
+        self._file    = None
+        self._closed  = False
+        self._opened_at = 0.0
+        self._counters = {"enqueued": 0, "written": 0, "batches": 0, "dropped": 0,
+                          "max_batch": 0, "max_depth": 0, "errors": 0, "rotations": 0}
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # ── Producer side (any thread, never blocks) ─────────────────────────────
+    def write(self, item):
+        if self._closed:
+            self._write_batch([item])   # after shutdown: write inline
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._counters["dropped"] += 1
+            return
+        self._counters["enqueued"] += 1
+        depth = self._queue.qsize()
+        if depth > self._counters["max_depth"]:
+            self._counters["max_depth"] = depth
+
+    # ── Writer thread ────────────────────────────────────────────────────────
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get()
+            except Exception:
+                continue
+            if first is _STOP:
+                break
+            batch, deadline = [first], time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_lines:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write_batch(batch)
+        # Drain whatever was queued behind the stop marker.
+        rest = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        if rest:
+            self._write_batch(rest)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # ── Active file / rotation ───────────────────────────────────────────────
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+        if self._file.tell() and self.segments is not None and self.segments.line_ts:
+            # Resuming an existing file: its age counts from its first entry.
+            with open(self.path, "rb") as f:
+                first_ts = self.segments.timestamp(f.readline())
+            try:
+                self._opened_at = datetime.fromisoformat(first_ts.rstrip("Z")).timestamp()
+            except (AttributeError, ValueError):
+                pass
+
+    def _handle_is_stale(self) -> bool:
+        """True if the path was rotated away (by us or another process) since we opened it."""
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except OSError:
+            return True
+
+    def _rotate_if_due(self):
+        if self.segments is None:
+            return
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.max_age and time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old):
+            return
+        self._file.close()
+        self._file = None
+        try:
+            self.segments.add(self.path)
+            self._counters["rotations"] += 1
+        except Exception:
+            self._counters["errors"] += 1
+
+    def _write_batch(self, batch: list):
+        try:
+            lines = [self.encode(item) for item in batch]
+        except Exception:
+            self._counters["errors"] += 1
+            lines = [str(item) for item in batch]
+        text = "".join(line + "\n" for line in lines)
+        if self.echo:
+            try:
+                console = text if self.render is self.encode else "".join(self.render(i) + "\n" for i in batch)
+                sys.stdout.write(console)
+                sys.stdout.flush()
+            except Exception:
+                pass
+        try:
+            if self._file is not None and self._handle_is_stale():
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                self._open()
+            self._file.write(text)
+            self._file.flush()
+        except Exception:
+            self._counters["errors"] += 1
+            self._file = None
+            return
+        self._rotate_if_due()
+        self._counters["written"] += len(batch)
+        self._counters["batches"] += 1
+        if len(batch) > self._counters["max_batch"]:
+            self._counters["max_batch"] = len(batch)
+
+    # ── Lifecycle / metrics ──────────────────────────────────────────────────
+    def close(self, timeout: float = 5.0):
+        """Stop the writer after everything queued so far is on disk."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return dict(self._counters, queued=self._queue.qsize())
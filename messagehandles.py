@@ -0,0 +1,53 @@
+# messagehandles.py — Edit bot messages by channel + message ID, without a GET
+#
+# Every embed update used to fetch_message() the target first (a full REST
+# GET, retried up to three times with sleeps) and then edit it. The IDs are
+# already stored on the flight / in _day_msgs, so MessageHandles keeps a
+# PartialMessage per (channel, message) and edits through it: one PATCH per
+# update. A handle is only the two IDs, so it cannot go stale: NotFound on the
+# PATCH means the message is gone, and the handle is dropped without a fetch.
+
+from collections import OrderedDict
+
+import discord
+
+
+class MessageHandles:
+    """Bounded cache of PartialMessage handles keyed by (channel ID, message ID)."""
+
+    def __init__(self, size: int = 4096):
+        self.size     = size
+        self._handles = OrderedDict()
+        self.stats    = {"edits": 0, "not_found": 0}
+
+    def get(self, channel, message_id):
+        key = (channel.id, int(message_id))
+        handle = self._handles.get(key)
+        if handle is None:
+            handle = channel.get_partial_message(int(message_id))
+            self._handles[key] = handle
+            if len(self._handles) > self.size:
+                self._handles.popitem(last=False)
+        else:
+            self._handles.move_to_end(key)
+        return handle
+
+    def forget(self, channel, message_id):
+        self._handles.pop((channel.id, int(message_id)), None)
+
+    async def edit(self, channel, message_id, **fields):
+        """
+        Edit the message. Returns the edited message, or None if it no longer
+        exists (the caller usually posts a new one). Other HTTP errors propagate.
+        """
+        try:
+            message = await self.get(channel, message_id).edit(**fields)
+        except discord.NotFound:
+            self.stats["not_found"] += 1
+            self.forget(channel, message_id)
+            return None
+        self.stats["edits"] += 1
+        return message
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, cached=len(self._handles))
@@ -0,0 +1,167 @@
+# models.py — Typed flight record for the in-memory working set
+#
+# Flights are stored on disk in the original nested-dict layout (see store.py),
+# but in memory each one is a FlightRecord: fixed __slots__ instead of a
+# per-entry dict plus nested gate/server/event dicts, and the schedule fields
+# are parsed once at load time instead of on every embed render.
+# Convert with FlightRecord.from_dict() / .to_dict() at the storage boundary.
+
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+
+
+class Aircraft(str, Enum):
+    B77W = "B77W"
+    B77L = "B77L"
+    A333 = "A333"
+    B788 = "B788"
+    B789 = "B789"
+    A321 = "A321"
+    B737 = "B737"
+    A223 = "A223"
+    A320 = "A320"
+    A319 = "A319"
+    CR9  = "CR9"
+    E75  = "E75"
+    DH4J = "DH4J"
+
+    @property
+    def full_name(self) -> str:
+        return AIRCRAFT_FULL_NAMES[self]
+
+    @classmethod
+    def parse(cls, code: str) -> Optional["Aircraft"]:
+        try:
+            return cls((code or "").upper())
+        except ValueError:
+            return None
+
+
+AIRCRAFT_FULL_NAMES = {
+    Aircraft.B77W: "Boeing 777-300ER", Aircraft.B77L: "Boeing 777-200LR", Aircraft.A333: "Airbus A330-300",
+    Aircraft.B788: "Boeing 787-8",     Aircraft.B789: "Boeing 787-9",     Aircraft.A321: "Airbus A321-200",
+    Aircraft.B737: "Boeing 737 MAX-8", Aircraft.A223: "Airbus A220-300",  Aircraft.A320: "Airbus A320-200",
+    Aircraft.A319: "Airbus A319-100",  Aircraft.CR9:  "CRJ-900",          Aircraft.E75:  "Embraer 175",
+    Aircraft.DH4J: "De Havilland Dash 8-400",
+}
+
+
+def parse_ddmmyyyy(raw: str) -> Optional[date]:
+    try:
+        return datetime.strptime(raw, "%d%m%Y").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_hhmm(raw: str) -> Optional[int]:
+    """Minutes after midnight for an "HH:MM" string, or None."""
+    try:
+        h, m = raw.split(":", 1)
+        return int(h) * 60 + int(m)
+    except (AttributeError, ValueError):
+        return None
+
+
+# Plain string fields, stored flat in both layouts (missing → "N/A").
+_TEXT_FIELDS = (
+    "flight_number", "dep_city", "arr_city", "dep_code", "arr_code",
+    "dep_airport", "arr_airport", "dep_time", "arr_time", "dep_date",
+    "duration", "terminal", "aircraft", "meal_service", "status", "alerts",
+)
+# Optional fields stored flat (missing → None).
+_OPTIONAL_FIELDS = (
+    "host_user_id", "public_message_id", "admin_message_id",
+    "announce_message_id", "created_at",
+)
+_NESTED_KEYS = {"gate", "server", "event"}
+_KNOWN_KEYS  = {"code", "version", *_TEXT_FIELDS, *_OPTIONAL_FIELDS, *_NESTED_KEYS}
+_STATE_SLOTS = (*_TEXT_FIELDS, *_OPTIONAL_FIELDS, "gate_dep", "gate_arr", "server_link", "event_link")
+
+
+class FlightRecord:
+    """One flight. Attribute access replaces entry.get(..., "N/A") chains."""
+
+    __slots__ = (
+        "code", *_TEXT_FIELDS, *_OPTIONAL_FIELDS,
+        "gate_dep", "gate_arr", "server_link", "event_link",
+        "extra", "version",
+        # Pre-parsed schedule — refreshed by reparse() when the raw fields change.
+        "dep_day", "dep_minutes", "arr_minutes", "aircraft_type",
+    )
+
+    def __init__(self, code: str, **fields):
+        self.code = code
+        for name in _TEXT_FIELDS:
+            setattr(self, name, fields.get(name, "N/A"))
+        for name in _OPTIONAL_FIELDS:
+            setattr(self, name, fields.get(name))
+        self.gate_dep    = fields.get("gate_dep", "N/A")
+        self.gate_arr    = fields.get("gate_arr", "N/A")
+        self.server_link = fields.get("server_link", "N/A")
+        self.event_link  = fields.get("event_link", "N/A")
+        self.extra       = fields.get("extra") or None
+        self.version     = fields.get("version", 0)   # bumped by every committed transaction
+        self.reparse()
+
+    def reparse(self):
+        self.dep_day       = parse_ddmmyyyy(self.dep_date)
+        self.dep_minutes   = parse_hhmm(self.dep_time)
+        self.arr_minutes   = parse_hhmm(self.arr_time)
+        self.aircraft_type = Aircraft.parse(self.aircraft)
+
+    def snapshot(self) -> tuple:
+        """Cheap copy of the stored fields, for change detection and rollback."""
+        extra = dict(self.extra) if self.extra else None
+        return tuple(getattr(self, name) for name in _STATE_SLOTS) + (extra,)
+
+    def restore(self, snap: tuple):
+        for name, value in zip(_STATE_SLOTS, snap):
+            setattr(self, name, value)
+        self.extra = snap[-1]
+        self.reparse()
+
+    @property
+    def host(self):
+        return self.host_user_id or (self.extra or {}).get("host", "Unknown")
+
+    @property
+    def aircraft_display(self) -> str:
+        return self.aircraft_type.full_name if self.aircraft_type else self.aircraft
+
+    @classmethod
+    def from_dict(cls, code: str, entry: dict) -> "FlightRecord":
+        """Build a record from the on-disk nested-dict layout."""
+        fields = {name: entry[name] for name in _TEXT_FIELDS + _OPTIONAL_FIELDS if name in entry}
+        gate = entry.get("gate") or {}
+        fields["gate_dep"]    = gate.get("dep", "N/A")
+        fields["gate_arr"]    = gate.get("arr", "N/A")
+        fields["server_link"] = (entry.get("server") or {}).get("link", "N/A")
+        fields["event_link"]  = (entry.get("event") or {}).get("link", "N/A")
+        fields["version"]     = entry.get("version", 0)
+        extra = {k: v for k, v in entry.items() if k not in _KNOWN_KEYS}
+        if extra:
+            fields["extra"] = extra
+        return cls(entry.get("code", code), **fields)
+
+    def to_dict(self) -> dict:
+        """Back to the on-disk nested-dict layout (round-trips from_dict)."""
+        d = {"code": self.code}
+        for name in _TEXT_FIELDS:
+            d[name] = getattr(self, name)
+        d["host_user_id"]      = self.host_user_id
+        d["gate"]              = {"dep": self.gate_dep, "arr": self.gate_arr}
+        d["server"]            = {"link": self.server_link}
+        d["event"]             = {"link": self.event_link}
+        d["public_message_id"] = self.public_message_id
+        d["admin_message_id"]  = self.admin_message_id
+        if self.announce_message_id is not None:
+            d["announce_message_id"] = self.announce_message_id
+        d["created_at"] = self.created_at
+        d["version"]    = self.version
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+    def __repr__(self):
+        return f"<FlightRecord {self.code} {self.flight_number} {self.dep_code}→{self.arr_code} {self.status}>"
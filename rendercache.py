@@ -0,0 +1,102 @@
+# rendercache.py — Cached embed/view renders and no-op edit suppression
+#
+# The flight, detail and day-board embeds are rebuilt from dozens of emoji
+# templates on every call, and update_embeds_for_code used to edit the
+# public and admin messages even when nothing visible had changed (the
+# dashboard "refresh" button, a save that touched only message IDs, ...).
+#
+# RenderCache keeps the last renders keyed by what they depend on: a flight's
+# code plus a digest of its stored fields, or a day's date plus the keys of
+# its flights, so any change to a flight (a committed edit, or another
+# process's version adopted over a local one) misses the cache. The digest is
+# taken over content rather than the version number because a version alone
+# does not identify one state while processes race to commit it.
+#
+# Each render carries a digest of its payload; SentPayloads remembers the
+# digest last sent to every message, so an edit whose payload is identical is
+# skipped and counted instead of sent.
+
+import hashlib
+from collections import OrderedDict
+
+import codec
+
+
+def record_digest(data: dict) -> bytes:
+    """Short hash of a flight's stored form (FlightRecord.to_dict()), for cache keys."""
+    return hashlib.blake2b(codec.dumpb(data), digest_size=12).digest()
+
+
+def payload_digest(embed, view=None) -> str:
+    """Stable hash of what Discord would receive for an embed (and view)."""
+    payload = [embed.to_dict(), view.to_components() if view is not None else None]
+    return hashlib.blake2b(codec.dumpb(payload), digest_size=16).hexdigest()
+
+
+class Rendered:
+    __slots__ = ("embed", "view", "digest")
+
+    def __init__(self, embed, view=None):
+        self.embed  = embed
+        self.view   = view
+        self.digest = payload_digest(embed, view)
+
+    def edit_kwargs(self) -> dict:
+        return {"embed": self.embed} if self.view is None else {"embed": self.embed, "view": self.view}
+
+
+class RenderCache:
+    """LRU of Rendered objects. build() is only called on a miss."""
+
+    def __init__(self, size: int = 512):
+        self.size    = size
+        self._items  = OrderedDict()
+        self.stats   = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, build) -> Rendered:
+        rendered = self._items.get(key)
+        if rendered is not None:
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return rendered
+        self.stats["misses"] += 1
+        rendered = build()
+        self._items[key] = rendered
+        if len(self._items) > self.size:
+            self._items.popitem(last=False)
+            self.stats["evictions"] += 1
+        return rendered
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, size=len(self._items), capacity=self.size)
+
+
+class SentPayloads:
+    """Digest of the payload last sent to each message ID (bounded, least recently edited dropped first)."""
+
+    def __init__(self, size: int = 4096):
+        self.size    = size
+        self._sent   = OrderedDict()
+        self.stats   = {"edits": 0, "skipped": 0}
+
+    def unchanged(self, message_id, digest: str) -> bool:
+        """True (and counted as skipped) if the message already shows this payload."""
+        if self._sent.get(str(message_id)) == digest:
+            self.stats["skipped"] += 1
+            return True
+        return False
+
+    def sent(self, message_id, digest: str, edit: bool = True):
+        key = str(message_id)
+        self._sent[key] = digest
+        self._sent.move_to_end(key)
+        if len(self._sent) > self.size:
+            self._sent.popitem(last=False)
+        if edit:
+            self.stats["edits"] += 1
+
+    def forget(self, message_id):
+        self._sent.pop(str(message_id), None)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, tracked=len(self._sent))
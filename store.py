@@ -0,0 +1,522 @@
+# store.py — SQLite flight store for the AIC PTFS Operations Bot
+#
+# Every flight is one row in flights(code, data, created_at), so a gate or
+# status change rewrites a single row instead of the whole data file.
+# Anything in user_data that is not a flight (the day-board message IDs under
+# "_day_msgs", in-progress modal sessions) is kept as JSON in the meta table,
+# as are the counters the bot publishes for /api/metrics on API workers.
+#
+# Several processes may share one flights.db (the bot plus `uvicorn api:app
+# --workers N`): triggers append every flight / day-board write to the
+# changes table, and ChangeFeed lets each process pick up the others' writes.
+#
+# Rows are stored as compact JSON (see codec.py). One-shot import of an
+# existing user_data.json, and a readable dump of the store:
+#   python store.py import user_data.json flights.db
+#   python store.py export flights.db user_data.export.json
+
+import asyncio
+import copy
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import codec
+
+DAY_MSGS_KEY    = "_day_msgs"
+IMPORT_MARKER   = "_imported_from"
+SESSION_PREFIX  = "session:"
+BOT_METRICS_KEY = "metrics:bot"    # meta row the bot publishes its /api/metrics counters to
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flights (
+    code        TEXT PRIMARY KEY,
+    data        TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    version     INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    key     TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TRIGGER IF NOT EXISTS flights_ins AFTER INSERT ON flights
+    BEGIN INSERT INTO changes (key) VALUES (NEW.code); END;
+CREATE TRIGGER IF NOT EXISTS flights_upd AFTER UPDATE ON flights
+    BEGIN INSERT INTO changes (key) VALUES (NEW.code); END;
+CREATE TRIGGER IF NOT EXISTS flights_del AFTER DELETE ON flights
+    BEGIN INSERT INTO changes (key, deleted) VALUES (OLD.code, 1); END;
+CREATE TRIGGER IF NOT EXISTS day_msgs_ins AFTER INSERT ON meta WHEN NEW.key = '_day_msgs'
+    BEGIN INSERT INTO changes (key) VALUES (NEW.key); END;
+CREATE TRIGGER IF NOT EXISTS day_msgs_upd AFTER UPDATE ON meta WHEN NEW.key = '_day_msgs'
+    BEGIN INSERT INTO changes (key) VALUES (NEW.key); END;
+"""
+
+
+def is_flight(code: str, entry) -> bool:
+    """True for real flight entries (not sessions, pending drafts or meta keys)."""
+    return (
+        isinstance(entry, dict)
+        and "flight_number" in entry
+        and not code.endswith("_pending")
+        and len(code) == 6
+    )
+
+
+class WriteConflict(Exception):
+    """A flight edit was based on a version another process has already replaced."""
+
+    def __init__(self, code: str):
+        super().__init__(f"Flight {code} was changed elsewhere; reload and retry")
+        self.code = code
+
+
+class FlightStore:
+    """Per-row persistence for user_data on top of flights.db (WAL mode)."""
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")   # other processes may hold the write lock
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self.conflicts = 0       # stale upserts refused because the row already had a newer version
+        self.refused   = set()   # their codes, until ChangeFeed re-reads them
+
+    def _migrate(self):
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(flights)")]
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE flights ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            rows = self._conn.execute("SELECT code, data FROM flights").fetchall()
+            self._conn.executemany(
+                "UPDATE flights SET version = ? WHERE code = ?",
+                [(codec.loads(raw).get("version", 0), code) for code, raw in rows],
+            )
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+    def load(self) -> dict:
+        """Rebuild the user_data dict: flights first, then meta-backed keys."""
+        data = {}
+        with self._lock:
+            rows = self._conn.execute("SELECT code, data FROM flights ORDER BY rowid").fetchall()
+            meta = self._conn.execute("SELECT key, value FROM meta").fetchall()
+        for code, raw in rows:
+            data[code] = codec.loads(raw)
+        for key, raw in meta:
+            if key == DAY_MSGS_KEY:
+                data[DAY_MSGS_KEY] = codec.loads(raw)
+            elif key.startswith(SESSION_PREFIX):
+                data[key[len(SESSION_PREFIX):]] = codec.loads(raw)
+        return data
+
+    def get_meta(self, key: str, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return codec.loads(row[0]) if row else default
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM flights").fetchone()[0]
+
+    def get(self, key: str):
+        """Current stored value of one user_data key, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM flights WHERE code = ?", (key,)).fetchone()
+            if row is None:
+                meta = key if key == DAY_MSGS_KEY else SESSION_PREFIX + key
+                row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (meta,)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    # ── Change feed ──────────────────────────────────────────────────────────
+    def data_version(self) -> int:
+        """Changes whenever another connection commits (cheap, no table read)."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_change(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq: int, limit: int = 1000) -> tuple:
+        """([(seq, key, deleted), ...], oldest seq still kept) for writes after `seq`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, key, deleted FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+            oldest = self._conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        return rows, oldest
+
+    def prune_changes(self, keep: int = 10000) -> int:
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (keep,)
+            )
+            return cur.rowcount
+
+    # ── Writes ───────────────────────────────────────────────────────────────
+    def upsert_flight(self, code: str, entry: dict) -> bool:
+        """Insert or update a flight. An update only lands if it carries a newer version
+        than the stored row, so a process working from a stale copy cannot clobber it."""
+        created_at = entry.get("created_at") or datetime.utcnow().isoformat() + "Z"
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO flights (code, data, created_at, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(code) DO UPDATE SET data = excluded.data, version = excluded.version "
+                "WHERE excluded.version > flights.version",
+                (code, codec.dumps(entry), created_at, entry.get("version", 0)),
+            )
+            if cur.rowcount == 0:
+                self.conflicts += 1
+                self.refused.add(code)
+            return cur.rowcount > 0
+
+    def compare_and_set_flight(self, code: str, entry: dict, expected_version: int) -> bool:
+        """Write a flight only if the stored row is still at `expected_version`. False on conflict
+        (the row was updated or deleted by another process since that version was read)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE flights SET data = ?, version = ? WHERE code = ? AND version = ?",
+                (codec.dumps(entry), entry.get("version", 0), code, expected_version),
+            )
+            if cur.rowcount == 0:
+                self.conflicts += 1
+            return cur.rowcount > 0
+
+    def delete_flight(self, code: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM flights WHERE code = ?", (code,))
+
+    def delete_flight_if(self, code: str, version: int) -> bool:
+        """Delete a flight only if the stored row is still at `version`. False if it was changed meanwhile."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM flights WHERE code = ? AND version = ?", (code, version))
+            return cur.rowcount > 0
+
+    def set_meta(self, key: str, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, codec.dumps(value)),
+            )
+
+    def delete_meta(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+
+    def save(self, key: str, value):
+        """Persist a single user_data key to the table it belongs in."""
+        if key == DAY_MSGS_KEY:
+            self.set_meta(DAY_MSGS_KEY, value)
+        elif is_flight(key, value):
+            self.upsert_flight(key, value)
+        else:
+            self.set_meta(SESSION_PREFIX + key, value)
+
+    def delete(self, key: str):
+        if key == DAY_MSGS_KEY:
+            self.delete_meta(DAY_MSGS_KEY)
+        elif len(key) == 6 and not key.endswith("_pending"):
+            self.delete_flight(key)
+        else:
+            self.delete_meta(SESSION_PREFIX + key)
+
+    def save_all(self, data: dict):
+        """Write every key of a user_data dict in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for key, value in data.items():
+                    if key == DAY_MSGS_KEY:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            (DAY_MSGS_KEY, codec.dumps(value)),
+                        )
+                    elif is_flight(key, value):
+                        created_at = value.get("created_at") or datetime.utcnow().isoformat() + "Z"
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO flights (code, data, created_at, version) VALUES (?, ?, ?, ?)",
+                            (key, codec.dumps(value), created_at, value.get("version", 0)),
+                        )
+                    else:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                            (SESSION_PREFIX + key, codec.dumps(value)),
+                        )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def import_json(self, json_path: str) -> int:
+        """One-shot import of a legacy user_data.json. Returns the flight count."""
+        data = codec.load_file(json_path)
+        self.save_all(data)
+        self.set_meta(IMPORT_MARKER, {
+            "path": os.path.abspath(json_path),
+            "at": datetime.utcnow().isoformat() + "Z",
+        })
+        return sum(1 for k, v in data.items() if is_flight(k, v))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChangeFeed:
+    """
+    Follows writes committed to a FlightStore by other processes.
+
+    poll() is cheap when nothing changed (one PRAGMA); otherwise it returns
+    {key: stored value, or None if deleted} for every key written since the
+    last poll, or {"*": full load()} if the change log was pruned past us.
+    Runs on the I/O executor.
+    """
+
+    def __init__(self, store: FlightStore):
+        self.store    = store
+        self.cursor   = store.last_change()
+        self._version = store.data_version()
+        self.stats    = {"polls": 0, "batches": 0, "keys": 0, "full_reloads": 0}
+
+    def poll(self):
+        self.stats["polls"] += 1
+        version = self.store.data_version()
+        if version == self._version and not self.store.refused:
+            return None
+        self._version = version
+        # Our own refused writes lost to a newer row: re-read them too.
+        changed = {code: 0 for code in self.store.refused}
+        self.store.refused.clear()
+        while True:
+            rows, oldest = self.store.changes_since(self.cursor)
+            if oldest is not None and oldest > self.cursor + 1 and self.cursor:
+                self.cursor = self.store.last_change()
+                self.stats["full_reloads"] += 1
+                return {"*": self.store.load()}
+            for seq, key, deleted in rows:
+                changed[key] = deleted
+                self.cursor = seq
+            if len(rows) < 1000:
+                break
+        if not changed:
+            return None
+        self.stats["batches"] += 1
+        self.stats["keys"] += len(changed)
+        return {key: None if deleted else self.store.get(key) for key, deleted in changed.items()}
+
+
+class SaveScheduler:
+    """Coalesces save requests: keys are marked dirty and written at most once per window."""
+
+    def __init__(self, store, source: dict, window: float = 1.0, lock: asyncio.Lock = None,
+                 executor=None, serialize=copy.deepcopy, on_error=None):
+        self.store     = store
+        self.source    = source
+        self.serialize = serialize   # in-memory value -> detached, storable value
+        self.window   = window
+        self.lock     = lock or asyncio.Lock()
+        self.executor = executor
+        self.on_error = on_error     # (message) -> None, when a write fails and is retried
+        self.stats   = {"requested": 0, "written": 0, "flushes": 0, "coalesced": 0, "failures": 0}
+        self._dirty  = {}     # key -> True (save) / False (delete)
+        self._writing = set() # keys of the batch currently being written
+        self._timer  = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def dirty(self, key: str) -> bool:
+        """True while a local change to `key` is not yet on disk (queued or being written)."""
+        return key in self._dirty or key in self._writing
+
+    def mark(self, key: str, deleted: bool = False):
+        """Record that `key` changed; the write happens on the next flush."""
+        self.stats["requested"] += 1
+        if key in self._dirty:
+            self.stats["coalesced"] += 1
+        self._dirty[key] = not deleted
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        asyncio.get_running_loop().create_task(self._flush_from_timer())
+
+    async def _flush_from_timer(self):
+        try:
+            await self.flush()
+        except Exception:
+            pass    # already reported by flush(); the batch is queued for the next window
+
+    def _requeue(self, batch: list, error: Exception):
+        """A write failed: put its keys back (unless marked again meanwhile) and retry next window."""
+        for key, value in batch:
+            self._dirty.setdefault(key, value is not None)
+        self.stats["written"] -= len(batch)
+        self.stats["failures"] += 1
+        if self.on_error:
+            self.on_error(f"❌ Flight store write failed, retrying {len(batch)} key(s): {error}")
+
+    def _take(self) -> list:
+        """Detach the dirty set as (key, value-or-None) pairs safe to hand to another thread."""
+        dirty, self._dirty = self._dirty, {}
+        batch = []
+        for key, keep in dirty.items():
+            if keep and key in self.source:
+                batch.append((key, self.serialize(self.source[key])))
+            else:
+                batch.append((key, None))
+        if batch:
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+        return batch
+
+    def _write(self, batch: list):
+        for key, value in batch:
+            if value is None:
+                self.store.delete(key)
+            else:
+                self.store.save(key, value)
+
+    async def flush(self) -> int:
+        """Write every dirty key now. Use on durability-critical paths."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self.lock:
+            batch = self._take()
+            if batch:
+                self._writing = {key for key, _ in batch}
+                try:
+                    await asyncio.get_running_loop().run_in_executor(self.executor, self._write, batch)
+                except Exception as e:
+                    self._requeue(batch, e)
+                    self._schedule()
+                    raise
+                finally:
+                    self._writing = set()
+            return len(batch)
+
+    def close(self):
+        """Synchronous final flush for shutdown, after the event loop has stopped."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._write(self._take())
+
+
+class FlightTransactions:
+    """
+    Per-flight locks around read-modify-write of a FlightRecord.
+
+        async with flights.transaction(code, desc="Set gates", user=user) as entry:
+            if not entry:
+                ...  # no such flight
+            entry.gate_dep = "A1"
+
+    Edits to different flights run concurrently; edits to the same flight queue
+    on its lock, so an await inside one edit can never interleave with another.
+    On a clean exit with changes the record's version is bumped and `commit`
+    is awaited; on an exception every field is rolled back. When other
+    processes share the store, `refresh` re-reads the flight under the lock
+    so the edit starts from the latest committed version, and `commit` is
+    expected to write through a compare-and-set. If `commit` raises
+    (WriteConflict, or any error from the write) the edit is rolled back,
+    the stored version re-read, and the error re-raised to the caller (the
+    API answers 409 to WriteConflict).
+    """
+
+    def __init__(self, source: dict, commit, refresh=None):
+        self.source  = source
+        self.commit  = commit    # async (code, desc, user), e.g. save_user_data
+        self.refresh = refresh   # async (code) or None
+        self._locks  = {}        # code -> [asyncio.Lock, holders + waiters]
+        self.stats   = {"commits": 0, "rollbacks": 0, "noops": 0, "contended": 0, "conflicts": 0,
+                        "commit_errors": 0}
+
+    def locked(self, code: str) -> bool:
+        slot = self._locks.get(code)
+        return bool(slot and slot[0].locked())
+
+    @asynccontextmanager
+    async def transaction(self, code: str, desc: str = None, user=None):
+        slot = self._locks.setdefault(code, [asyncio.Lock(), 0])
+        if slot[0].locked():
+            self.stats["contended"] += 1
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                if self.refresh:
+                    await self.refresh(code)
+                entry = self.source.get(code)
+                if not hasattr(entry, "snapshot"):
+                    yield None
+                    return
+                before = entry.snapshot()
+                try:
+                    yield entry
+                except BaseException:
+                    entry.restore(before)
+                    self.stats["rollbacks"] += 1
+                    raise
+                if self.source.get(code) is not entry:
+                    return    # deleted inside the transaction
+                if entry.snapshot() == before:
+                    self.stats["noops"] += 1
+                    return
+                entry.reparse()
+                entry.version += 1
+                try:
+                    await self.commit(code, desc, user)
+                except Exception as e:
+                    # Not written (lost the compare-and-set, database locked, I/O error): drop the
+                    # edit and its version bump, or every later commit would expect the wrong version.
+                    entry.restore(before)
+                    entry.version -= 1
+                    self.stats["conflicts" if isinstance(e, WriteConflict) else "commit_errors"] += 1
+                    if self.refresh:
+                        try:
+                            await self.refresh(code)
+                        except Exception:
+                            pass    # the commit error is the one to report
+                    raise
+                self.stats["commits"] += 1
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._locks.pop(code, None)
+
+    def snapshot(self) -> dict:
+        return dict(self.stats, held=sum(1 for lock, _ in self._locks.values() if lock.locked()))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("usage: python store.py import <user_data.json> <flights.db>\n"
+              "       python store.py export <flights.db> <out.json>")
+        sys.exit(2)
+    if sys.argv[1] == "import":
+        store = FlightStore(sys.argv[3])
+        n = store.import_json(sys.argv[2])
+        print(f"✅ Imported {n} flights into {sys.argv[3]}")
+    else:
+        store = FlightStore(sys.argv[2])
+        data = store.load()
+        with open(sys.argv[3], "w", encoding="utf-8") as f:
+            f.write(codec.pretty(data) + "\n")
+        print(f"✅ Exported {sum(1 for k, v in data.items() if is_flight(k, v))} flights to {sys.argv[3]}")
+    store.close()
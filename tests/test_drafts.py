@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+from drafts import DraftStore
+
+
+class DraftStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher  = mock.patch("drafts.time.monotonic", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.drafts = DraftStore(ttl=60, max_entries=2)
+
+    def test_draft_expires_after_ttl_of_inactivity(self):
+        self.drafts.put(1, {"flight_number": "AC101"})
+        self.now += 59
+        self.assertEqual(self.drafts.get(1), {"flight_number": "AC101"})   # touching extends the TTL
+        self.now += 59
+        self.assertIsNotNone(self.drafts.get(1))
+        self.now += 61
+        self.assertIsNone(self.drafts.get(1))
+        self.assertEqual(self.drafts.stats()["expired"], 1)
+
+    def test_least_recently_used_draft_is_evicted(self):
+        self.drafts.put(1, {})
+        self.drafts.put(2, {})
+        self.drafts.get(1)
+        self.drafts.put(3, {})
+        self.assertIsNone(self.drafts.get(2))
+        self.assertIsNotNone(self.drafts.get(1))
+        self.assertEqual(self.drafts.stats()["evicted"], 1)
+
+    def test_update_and_pop(self):
+        self.drafts.put(1, {"dep_code": "YYZ"})
+        self.assertEqual(self.drafts.update(1, {"arr_code": "YVR"}), {"dep_code": "YYZ", "arr_code": "YVR"})
+        self.assertIsNone(self.drafts.update(2, {"arr_code": "YVR"}))
+        self.assertEqual(self.drafts.pop(1), {"dep_code": "YYZ", "arr_code": "YVR"})
+        self.assertIsNone(self.drafts.pop(1))
+        self.assertEqual(self.drafts.stats()["completed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from journal import JournalStore
+
+FLIGHT = {"flight_number": "AC101", "status": "Scheduled", "gate": {"dep": "N/A"}}
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.dir  = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "user_data.json")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def open(self) -> JournalStore:
+        return JournalStore(self.path, fsync_interval=60)
+
+    def test_torn_tail_is_truncated_and_later_appends_survive(self):
+        store = self.open()
+        store.save("ABC123", FLIGHT)
+        store.close()
+        with open(store.journal_path, "ab") as f:
+            f.write(b'{"op":"set","k":"ABC123","p":["gate","dep"],"v":"A')   # crash mid-write
+
+        store = self.open()
+        self.assertEqual(store.stats["replayed"], 1)
+        with open(store.journal_path, "rb") as f:
+            self.assertTrue(f.read().endswith(b"}\n"))
+        store.save("ABC123", dict(FLIGHT, status="Boarding"))
+        store.close()
+
+        store = self.open()
+        self.assertEqual(store.load()["ABC123"]["status"], "Boarding")
+        self.assertEqual(store.stats["replayed"], 2)
+        store.close()
+
+    def test_complete_record_missing_newline_is_kept(self):
+        store = self.open()
+        store.save("ABC123", FLIGHT)
+        store.close()
+        with open(store.journal_path, "rb+") as f:
+            f.truncate(os.path.getsize(store.journal_path) - 1)   # drop the trailing "\n"
+
+        store = self.open()
+        store.delete("ABC123")
+        store.close()
+
+        store = self.open()
+        self.assertNotIn("ABC123", store.load())
+        self.assertEqual(store.stats["replayed"], 2)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
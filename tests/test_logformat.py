@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+
+import codec
+import logformat
+from logsegments import LogSegments
+
+LEGACY_EMBED = """{
+  "content": "",
+  "embeds": [
+    {
+      "description": "**Log**",
+      "fields": [
+        {"name": "Username", "value": "<@767865431712333874>"},
+        {"name": "Action Performed", "value": "```Submitted FlightDetailsModal1```"}
+      ]
+    }
+  ]
+}
+"""
+DASHBOARD_LINE = '{"time": "12:00:00", "user": "deivid", "action": "Dashboard login", "level": "info"}\n'
+
+
+def record(action: str, **fields) -> str:
+    return codec.dumps(logformat.make_record(action, **fields)) + "\n"
+
+
+class LogConversionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir  = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "utilities.log")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, text: str, path: str = None):
+        with open(path or self.path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def read(self, path: str = None) -> str:
+        with open(path or self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_torn_tail_is_not_a_legacy_log(self):
+        good = record("Pressed component: close", error_code="V9PNY80")
+        self.write(good + '{"ts": "2026-02-18T23:39:43.510Z", "act')
+        self.assertTrue(logformat.is_jsonl(self.path))
+        self.assertGreater(logformat.repair_tail(self.path), 0)
+        self.assertEqual(self.read(), good)
+        self.assertEqual(logformat.repair_tail(self.path), 0)
+
+    def test_complete_last_record_is_terminated(self):
+        good = record("Started flight ABC123")
+        self.write(good.rstrip("\n"))
+        self.assertEqual(logformat.repair_tail(self.path), 0)
+        self.assertEqual(self.read(), good)
+
+    def test_legacy_log_starting_with_a_dashboard_line(self):
+        self.write(DASHBOARD_LINE + LEGACY_EMBED)
+        self.assertFalse(logformat.is_jsonl(self.path))
+
+    def test_conversion_keeps_records_and_never_replaces_a_backup(self):
+        kept = record("Crashed", level="error", error_code="V9PNY80", traceback="Traceback ...\nValueError: x\n")
+        self.write("old backup", self.path + ".legacy")
+        self.write(kept + LEGACY_EMBED)
+
+        count, backup = logformat.convert_legacy(self.path)
+
+        self.assertEqual(count, 2)
+        self.assertEqual(backup, self.path + ".legacy.1")
+        self.assertEqual(self.read(self.path + ".legacy"), "old backup")
+        lines = self.read().splitlines(keepends=True)
+        self.assertEqual(lines[0], kept)
+        self.assertIn("FlightDetailsModal1", logformat.parse_line(lines[1])["action"])
+
+    def test_converted_log_is_not_converted_again(self):
+        self.write(DASHBOARD_LINE + LEGACY_EMBED)
+        logformat.convert_legacy(self.path)
+        self.assertTrue(logformat.is_jsonl(self.path))
+
+
+class ReadPageTest(unittest.TestCase):
+    """Paging newest first across the in-memory ring, the active file and rotated segments."""
+
+    def setUp(self):
+        self.dir      = tempfile.TemporaryDirectory()
+        self.path     = os.path.join(self.dir.name, "utilities.log")
+        self.segments = LogSegments(os.path.join(self.dir.name, "logs"), line_ts=logformat.line_ts)
+        self.written  = 0
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def append(self, n: int):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for _ in range(n):
+                i = self.written
+                self.written += 1
+                f.write(codec.dumps({"ts": f"2026-02-18T00:{i // 60:02d}:{i % 60:02d}.000Z", "time": "—",
+                                     "level": "error" if i % 3 == 0 else "info", "source": "bot",
+                                     "user": "deivid", "action": f"event {i}"}) + "\n")
+
+    def pages(self, query=None, limit: int = 7, cursor: str = None, between=None) -> list:
+        query, actions = query or logformat.LogQuery(), []
+        while True:
+            entries, cursor = logformat.read_page(self.path, self.segments, query, limit, cursor=cursor)
+            actions += [e["action"] for e in entries]
+            if cursor is None:
+                return actions
+            if between:
+                between()
+
+    def expected(self, keep=lambda i: True) -> list:
+        return [f"event {i}" for i in reversed(range(self.written)) if keep(i)]
+
+    def test_pages_cover_active_file_and_segments_once(self):
+        self.append(10)
+        self.segments.add(self.path)
+        self.append(10)
+        self.segments.add(self.path)
+        self.append(10)
+        self.assertEqual(self.pages(), self.expected())
+
+    def test_filtered_pages(self):
+        self.append(12)
+        self.segments.add(self.path)
+        self.append(12)
+        query = logformat.LogQuery(level="error")
+        self.assertEqual(self.pages(query, limit=2), self.expected(lambda i: i % 3 == 0))
+
+    def test_rotation_between_pages_loses_nothing(self):
+        self.append(20)
+
+        def rotate_once():
+            if not self.segments.segments:
+                self.segments.add(self.path)
+                self.append(5)      # newer than the first page: not part of this read
+        actions = self.pages(between=rotate_once)
+        self.assertEqual(actions, [f"event {i}" for i in reversed(range(20))])
+
+    def test_ring_cursor_continues_on_disk(self):
+        self.append(10)
+        self.segments.add(self.path)
+        self.append(10)
+        ring = logformat.RecentEntries(size=8)
+        with open(self.path, "rb") as f:
+            ring.seed([logformat.parse_line(line) for line in reversed(f.readlines())])
+        entries, cursor = ring.page(logformat.LogQuery(), 5)
+        self.assertIsNotNone(cursor)
+        actions = [e["action"] for e in entries] + self.pages(cursor=cursor)
+        self.assertEqual(actions, self.expected())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from models import FlightRecord
+from store import ChangeFeed, FlightStore, FlightTransactions, SaveScheduler, WriteConflict, DAY_MSGS_KEY
+
+CODE   = "ABC123"
+FLIGHT = {"flight_number": "AC101", "status": "Scheduled", "version": 0}
+
+
+class Process:
+    """One process's view of a shared flights.db, committing like utilities._commit_shared."""
+
+    def __init__(self, path: str):
+        self.store  = FlightStore(path)
+        self.data   = {CODE: FlightRecord.from_dict(CODE, self.store.get(CODE))}
+        self.fail   = []     # exceptions the next commits raise before writing
+        self.flights = FlightTransactions(self.data, commit=self.commit, refresh=self.refresh)
+
+    async def commit(self, code, desc=None, user=None):
+        if self.fail:
+            raise self.fail.pop(0)
+        entry = self.data[code]
+        if not self.store.compare_and_set_flight(code, entry.to_dict(), entry.version - 1):
+            raise WriteConflict(code)
+
+    async def refresh(self, code):
+        stored, current = self.store.get(code), self.data.get(code)
+        if stored and not (current.version > stored["version"] or current.to_dict() == stored):
+            self.data[code] = FlightRecord.from_dict(code, stored)
+
+    async def set_status(self, status: str):
+        async with self.flights.transaction(CODE) as entry:
+            entry.status = status
+
+
+class TransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.data    = {CODE: FlightRecord.from_dict(CODE, dict(FLIGHT))}
+        self.commits = []
+
+        async def commit(code, desc=None, user=None):
+            self.commits.append((code, desc, self.data[code].version))
+
+        self.flights = FlightTransactions(self.data, commit=commit)
+
+    def run_edit(self, edit, desc="edit"):
+        async def go():
+            async with self.flights.transaction(CODE, desc) as entry:
+                edit(entry)
+        asyncio.run(go())
+
+    def test_change_bumps_version_and_commits(self):
+        self.run_edit(lambda e: setattr(e, "gate_dep", "A1"), desc="Set gates")
+        self.assertEqual(self.data[CODE].version, 1)
+        self.assertEqual(self.commits, [(CODE, "Set gates", 1)])
+
+    def test_no_change_is_a_noop(self):
+        self.run_edit(lambda e: setattr(e, "status", "Scheduled"))
+        self.assertEqual((self.data[CODE].version, self.commits), (0, []))
+        self.assertEqual(self.flights.stats["noops"], 1)
+
+    def test_exception_rolls_back_every_field(self):
+        def edit(entry):
+            entry.status   = "Boarding"
+            entry.gate_dep = "B2"
+            raise ValueError("bad gate")
+        with self.assertRaises(ValueError):
+            self.run_edit(edit)
+        entry = self.data[CODE]
+        self.assertEqual((entry.status, entry.gate_dep, entry.version), ("Scheduled", "N/A", 0))
+        self.assertEqual((self.commits, self.flights.stats["rollbacks"]), ([], 1))
+
+    def test_same_flight_edits_do_not_interleave(self):
+        order = []
+
+        async def edit(tag):
+            async with self.flights.transaction(CODE) as entry:
+                order.append(f"{tag} start")
+                await asyncio.sleep(0.01)
+                entry.alerts = tag
+                order.append(f"{tag} end")
+
+        async def go():
+            await asyncio.gather(edit("a"), edit("b"))
+        asyncio.run(go())
+        self.assertEqual(order, ["a start", "a end", "b start", "b end"])
+        self.assertEqual(self.data[CODE].version, 2)
+
+    def test_missing_flight_yields_none(self):
+        async def go():
+            async with self.flights.transaction("ZZZ999") as entry:
+                return entry
+        self.assertIsNone(asyncio.run(go()))
+
+
+class FlakyStore:
+    def __init__(self):
+        self.failing = True
+        self.saved   = {}
+
+    def save(self, key, value):
+        if self.failing:
+            raise sqlite3.OperationalError("database is locked")
+        self.saved[key] = value
+
+    def delete(self, key):
+        if self.failing:
+            raise sqlite3.OperationalError("database is locked")
+        self.saved.pop(key, None)
+
+
+class SaveSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.store  = FlakyStore()
+        self.source = {"A": 1, "B": 2}
+        self.errors = []
+        self.saves  = SaveScheduler(self.store, self.source, window=0.01, on_error=self.errors.append)
+
+    def test_failed_flush_requeues_and_reports(self):
+        async def go():
+            self.saves.mark("A")
+            self.saves.mark("B")
+            with self.assertRaises(sqlite3.OperationalError):
+                await self.saves.flush()
+            self.assertEqual(self.saves.pending, 2)
+            self.store.failing = False
+            self.assertEqual(await self.saves.flush(), 2)
+        asyncio.run(go())
+        self.assertEqual(self.store.saved, {"A": 1, "B": 2})
+        self.assertEqual(len(self.errors), 1)
+        self.assertEqual(self.saves.stats["failures"], 1)
+
+    def test_newer_mark_wins_over_requeued_batch(self):
+        async def go():
+            self.saves.mark("A")
+            write = asyncio.ensure_future(self.saves.flush())
+            await asyncio.sleep(0)                # batch taken, write failing in the executor
+            self.source.pop("A")
+            self.saves.mark("A", deleted=True)
+            with self.assertRaises(sqlite3.OperationalError):
+                await write
+            self.store.failing = False
+            self.store.saved["A"] = "stale"
+            await self.saves.flush()
+        asyncio.run(go())
+        self.assertNotIn("A", self.store.saved)
+
+    def test_timer_flush_retries_without_unretrieved_exception(self):
+        async def go():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: self.errors.append(ctx))
+            self.saves.mark("A")
+            await asyncio.sleep(0.05)             # first timer flush fails and reschedules
+            self.store.failing = False
+            await asyncio.sleep(0.05)
+        asyncio.run(go())
+        self.assertEqual(self.store.saved, {"A": 1})
+        self.assertEqual(self.saves.pending, 0)
+        self.assertTrue(all(isinstance(e, str) for e in self.errors))
+
+
+class SharedCommitTest(unittest.TestCase):
+    def setUp(self):
+        self.dir  = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "flights.db")
+        seed = FlightStore(self.path)
+        seed.upsert_flight(CODE, dict(FLIGHT))
+        seed.close()
+        self.bot, self.api = Process(self.path), Process(self.path)
+
+    def tearDown(self):
+        self.bot.store.close()
+        self.api.store.close()
+        self.dir.cleanup()
+
+    def stored(self) -> dict:
+        return self.bot.store.get(CODE)
+
+    def test_failed_commit_rolls_back_edit_and_version(self):
+        self.bot.fail.append(sqlite3.OperationalError("database is locked"))
+        with self.assertRaises(sqlite3.OperationalError):
+            asyncio.run(self.bot.set_status("Boarding"))
+        entry = self.bot.data[CODE]
+        self.assertEqual((entry.status, entry.version), ("Scheduled", 0))
+        self.assertEqual(self.bot.flights.stats["commit_errors"], 1)
+
+        # The next edit still expects the stored version, so it is not refused.
+        asyncio.run(self.bot.set_status("Delayed"))
+        self.assertEqual((self.stored()["status"], self.stored()["version"]), ("Delayed", 1))
+
+    def test_stale_edit_conflicts_and_adopts_stored_row(self):
+        asyncio.run(self.api.set_status("Boarding"))
+        self.bot.flights.refresh = None     # as if the bot read the row before the API's write
+        with self.assertRaises(WriteConflict):
+            asyncio.run(self.bot.set_status("Delayed"))
+        self.assertEqual((self.stored()["status"], self.stored()["version"]), ("Boarding", 1))
+        self.assertEqual(self.bot.data[CODE].version, 0)
+
+        self.bot.flights.refresh = self.bot.refresh
+        asyncio.run(self.bot.set_status("Delayed"))
+        self.assertEqual((self.stored()["status"], self.stored()["version"]), ("Delayed", 2))
+
+    def test_compare_and_set_refuses_a_deleted_row(self):
+        self.api.store.delete_flight(CODE)
+        entry = dict(FLIGHT, version=1)
+        self.assertFalse(self.bot.store.compare_and_set_flight(CODE, entry, 0))
+        self.assertIsNone(self.stored())
+
+
+    def test_change_feed_sees_other_process_writes(self):
+        feed = ChangeFeed(self.bot.store)
+        self.assertIsNone(feed.poll())
+        asyncio.run(self.api.set_status("Boarding"))
+        self.api.store.set_meta(DAY_MSGS_KEY, {"18022026": "123"})
+        changes = feed.poll()
+        self.assertEqual(changes[CODE]["status"], "Boarding")
+        self.assertEqual(changes[DAY_MSGS_KEY], {"18022026": "123"})
+        self.assertIsNone(feed.poll())
+
+        self.api.store.delete_flight(CODE)
+        self.assertEqual(feed.poll(), {CODE: None})
+
+
+if __name__ == "__main__":
+    unittest.main()
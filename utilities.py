@@ -1,20 +1,38 @@
 # utilities.py — Air Canada PTFS Operations Bot
 
-import json
+import copy
 import random
 import string
 import asyncio
 import traceback
 from typing import Optional
 from pathlib import Path
+from contextlib import AsyncExitStack
 import discord
 from discord import TextStyle
 from discord.ext import commands
 from discord.ui import Modal, TextInput, Button, View, Select
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import sys
 from discord import AllowedMentions
+from store import FlightStore, SaveScheduler, FlightTransactions, ChangeFeed, WriteConflict, DAY_MSGS_KEY, BOT_METRICS_KEY, IMPORT_MARKER, is_flight
+from journal import JournalStore
+from iopool import io_executor, run_io, LoopLagMonitor
+from drafts import DraftStore
+from models import FlightRecord, Aircraft, parse_ddmmyyyy
+from indexes import FlightIndex, StatusCounters, STATUS_POS
+from archive import FlightArchive
+import codec
+from logsink import LogSink
+import logformat
+from logsegments import LogSegments
+from embedqueue import EmbedQueue
+from logpolicy import LogPolicy, ALWAYS as LOG_ALWAYS
+from errorindex import ErrorIndex
+from rendercache import RenderCache, Rendered, SentPayloads, record_digest
+from messagehandles import MessageHandles
+from discordsync import SyncQueue
 
 # Load .env if present (simple key=value parser, no dependency needed)
 _env_path = Path(__file__).parent / ".env"
@@ -39,6 +57,16 @@ except ImportError:
 # Config / Files / Globals  (read from environment / .env)
 # -----------------------
 DATA_FILE        = os.environ.get("DATA_FILE",        "user_data.json")
+DB_FILE          = os.environ.get("DB_FILE",          "flights.db")
+STORE_BACKEND    = os.environ.get("STORE_BACKEND",    "sqlite")   # "sqlite" or "journal"
+JOURNAL_COMPACT_BYTES = int(os.environ.get("JOURNAL_COMPACT_BYTES", str(1 << 20)))
+SAVE_WINDOW      = float(os.environ.get("SAVE_WINDOW", "1.0"))   # seconds between coalesced writes
+DRAFT_TTL        = float(os.environ.get("DRAFT_TTL",   "900"))   # idle seconds before a modal draft expires
+DRAFT_MAX        = int(os.environ.get("DRAFT_MAX",     "1000"))
+ARCHIVE_DIR      = os.environ.get("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "7"))        # Ended flights older than this go cold
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", "21600"))      # seconds between archive runs
+COUNTER_CHECK_INTERVAL = float(os.environ.get("COUNTER_CHECK_INTERVAL", "600"))  # stats counter consistency check
 LOG_CHANNEL_ID   = int(os.environ.get("LOG_CHANNEL_ID",   "1289388932970184756"))
 PUBLIC_CHANNEL_ID= int(os.environ.get("PUBLIC_CHANNEL_ID","1289381713239080960"))
 ANNOUNCE_CHANNEL_ID=int(os.environ.get("ANNOUNCE_CHANNEL_ID","1289388913827385364"))
@@ -48,8 +76,29 @@ ADMIN_CHANNEL_ID = int(os.environ.get("ADMIN_CHANNEL_ID", "1473780252378529957")
 FONT_LIGHT       = os.environ.get("FONT_LIGHT",  "OpenSans-Light.ttf")
 FONT_REGULAR     = os.environ.get("FONT_REGULAR","OpenSans-Regular.ttf")
 LOG_FILE         = os.environ.get("LOG_FILE",    "utilities.log")
+LOG_QUEUE_MAX    = int(os.environ.get("LOG_QUEUE_MAX",    "10000"))   # lines buffered before new ones are dropped
+LOG_BATCH_LINES  = int(os.environ.get("LOG_BATCH_LINES",  "256"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "0.5"))  # max seconds a line waits in the buffer
+LOG_DIR          = os.environ.get("LOG_DIR",          "logs")      # rotated, gzip-compressed log segments
+LOG_ROTATE_BYTES = int(os.environ.get("LOG_ROTATE_BYTES", str(8 << 20)))
+LOG_ROTATE_SECONDS = float(os.environ.get("LOG_ROTATE_SECONDS", "86400"))
+LOG_RETAIN_SEGMENTS = int(os.environ.get("LOG_RETAIN_SEGMENTS", "30"))    # 0 = keep all
+LOG_RETAIN_DAYS  = float(os.environ.get("LOG_RETAIN_DAYS",  "0"))         # 0 = no age limit
+LOG_RING_SIZE    = int(os.environ.get("LOG_RING_SIZE",    "2000"))        # recent entries /api/logs serves from memory
+LOG_SCAN_LIMIT   = int(os.environ.get("LOG_SCAN_LIMIT",   "200000"))      # lines one filtered /api/logs page may read
+LOG_EMBED_QUEUE_MAX = int(os.environ.get("LOG_EMBED_QUEUE_MAX", "1000"))  # log-channel embeds waiting before new ones are dropped
+LOG_EMBED_LINGER = float(os.environ.get("LOG_EMBED_LINGER", "1.0"))       # seconds a log-channel batch waits to fill up
+LOG_POLICY       = os.environ.get("LOG_POLICY", "Pressed component:=file;Pressed ConfirmView=file")  # see logpolicy.py
+ERROR_INDEX_FILE = os.environ.get("ERROR_INDEX_FILE", os.path.join(LOG_DIR, "errors.db"))   # ref code → error record
+ERROR_TRACEBACKS_KEPT = int(os.environ.get("ERROR_TRACEBACKS_KEPT", "5"))  # full tracebacks logged per exception fingerprint
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "512"))      # cached embed/view renders (see rendercache.py)
+DISCORD_SYNC_WINDOW = float(os.environ.get("DISCORD_SYNC_WINDOW", "0.75"))  # seconds flight/day edits are collected before syncing
 TOKEN            = os.environ.get("TOKEN",       "")
 DASHBOARD_PORT   = int(os.environ.get("DASHBOARD_PORT", "8080"))
+API_WORKERS      = int(os.environ.get("API_WORKERS",    "0"))     # >0: serve the dashboard from N uvicorn workers (api.py)
+STORE_POLL_INTERVAL = float(os.environ.get("STORE_POLL_INTERVAL", "0.5"))  # seconds between checks for other processes' writes
+METRICS_PUBLISH_INTERVAL = float(os.environ.get("METRICS_PUBLISH_INTERVAL", "10"))  # bot → flights.db, for /api/metrics on API workers
+PROCESS_ROLE     = os.environ.get("AIC_ROLE", "bot")   # "api" inside api.py worker processes
 
 # -----------------------
 # Bot Setup
@@ -61,7 +110,23 @@ allowed_mentions = discord.AllowedMentions(roles=True, users=True, everyone=True
 # -----------------------
 # Internal concurrency primitives
 # -----------------------
-data_lock = asyncio.Lock()
+loop_lag  = LoopLagMonitor()
+if PROCESS_ROLE == "bot" and not logformat.is_jsonl(LOG_FILE):
+    # One-time migration of the old mixed-format log (see logformat.py).
+    converted, legacy_backup = logformat.convert_legacy(LOG_FILE)
+    print(f"✅ Converted {converted} legacy log entries in {LOG_FILE} to JSONL (original kept as {legacy_backup})")
+elif PROCESS_ROLE == "bot" and logformat.repair_tail(LOG_FILE):
+    print(f"⚠️  Cut a torn last line (crash mid-write) off {LOG_FILE}")
+log_segments = LogSegments(LOG_DIR, retain=LOG_RETAIN_SEGMENTS, retain_days=LOG_RETAIN_DAYS,
+                           line_ts=logformat.line_ts)
+log_sink  = LogSink(LOG_FILE, max_queue=LOG_QUEUE_MAX, batch_lines=LOG_BATCH_LINES,
+                    flush_interval=LOG_FLUSH_INTERVAL, encode=logformat.encode, render=logformat.render,
+                    # Only the bot rotates; API workers just follow the rename.
+                    segments=log_segments if PROCESS_ROLE == "bot" else None,
+                    max_bytes=LOG_ROTATE_BYTES, max_age=LOG_ROTATE_SECONDS)
+# API workers only see their own writes, so they always read the shared file instead.
+recent_logs = logformat.RecentEntries(LOG_RING_SIZE) if PROCESS_ROLE == "bot" else None
+error_index = ErrorIndex(ERROR_INDEX_FILE, keep_tracebacks=ERROR_TRACEBACKS_KEPT)
 
 # -----------------------
 # Utilities
@@ -70,70 +135,365 @@ def generate_ref_code(length: int = 7) -> str:
     alphabet = string.ascii_uppercase + string.digits
     return "".join(random.choice(alphabet) for _ in range(length))
 
-def safe_console_print(obj: str):
+def write_log(action: str, user: str = "system", level: Optional[str] = None, source: str = "system", **fields):
+    """Queue one JSONL record (see logformat.py) for the background log writer; never blocks."""
+    tb = fields.get("traceback")
+    if tb:
+        fields["fingerprint"], keep = error_index.note(tb)
+        if not keep:    # a repeat: errors.db already holds this fingerprint's tracebacks
+            fields["traceback"] = None
+            fields["tb_summary"] = logformat.tb_summary(tb)
+    record = logformat.make_record(action, user=user, level=level, source=source, **fields)
+    log_sink.write(record)
+    if recent_logs is not None:
+        recent_logs.push(logformat.to_entry(record))
+    if tb or record.get("error_code"):
+        try:
+            io_executor.submit(error_index.index, record, tb)
+        except RuntimeError:        # executor already shut down
+            error_index.index(record, tb)
+
+def read_log_entries(limit: int) -> list:
+    """Newest `limit` entries from disk: the active file read backwards, then rotated segments."""
+    entries = logformat.tail_entries(LOG_FILE, limit)
+    for segment in log_segments.newest_first():
+        if len(entries) >= limit:
+            break
+        for line in reversed(log_segments.read_lines(segment)):
+            entry = logformat.entry_for_line(line)
+            if entry:
+                entries.append(entry)
+                if len(entries) >= limit:
+                    break
+    return entries
+
+try:
+    log_policy = LogPolicy.parse(LOG_POLICY)
+except ValueError as e:
+    log_policy = LogPolicy()
+    write_log(f"⚠️ {e}; logging everything", level="warn")
+
+if recent_logs is not None:
+    # Prime the ring from disk before anything new is logged, so a restart keeps the Logs tab warm.
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            print(obj)
-            f.write(obj + "\n")
-    except Exception:
-        print(obj)
+        recent_logs.seed(read_log_entries(LOG_RING_SIZE))
+    except Exception as e:
+        write_log(f"⚠️ Could not prime recent log entries: {e}", level="warn")
+
+def safe_console_print(obj: str):
+    """Free-text status line; the level is inferred from its ✅/❌/⚠️ prefix."""
+    write_log(str(obj))
 
 def log_to_file(action: str, user: str = "system", level: str = "info"):
-    """Write a structured JSON log entry for the dashboard logs viewer."""
-    entry = json.dumps({
-        "time": datetime.utcnow().strftime("%H:%M:%S"),
-        "user": user,
-        "action": action,
-        "level": level
-    }, ensure_ascii=False)
-    safe_console_print(entry)
+    """Write a structured log entry for the dashboard logs viewer."""
+    if level != "error" and not log_policy.decide(action, channel=False)[0]:
+        return
+    write_log(action, user=user, level=level, source="dashboard")
 
 def generate_code(length=6):
     alphabet = string.ascii_uppercase + string.digits
     return "".join(random.choice(alphabet) for _ in range(length))
 
 # -----------------------
-# JSON load/save
+# Flight store load/save  (SQLite rows, or snapshot + journal — see store.py / journal.py)
 # -----------------------
 user_data = {}
+if STORE_BACKEND == "journal":
+    flight_store = JournalStore(DATA_FILE, compact_bytes=JOURNAL_COMPACT_BYTES)
+else:
+    flight_store = FlightStore(DB_FILE)
+# Other processes write to flights.db too (SQLite backend only — the journal is single-process).
+SHARED_STORE = isinstance(flight_store, FlightStore) and (API_WORKERS > 0 or PROCESS_ROLE == "api")
+change_feed = None
+
+def _to_storage(value):
+    """Detached on-disk form of a user_data value (FlightRecord → nested dict)."""
+    return value.to_dict() if isinstance(value, FlightRecord) else copy.deepcopy(value)
+
+save_scheduler = SaveScheduler(flight_store, user_data, window=SAVE_WINDOW,
+                               executor=io_executor, serialize=_to_storage, on_error=safe_console_print)
+drafts = DraftStore(ttl=DRAFT_TTL, max_entries=DRAFT_MAX)
+flight_index = FlightIndex()
+status_counters = StatusCounters()
+flight_archive = FlightArchive(ARCHIVE_DIR)
+
+def _load_store() -> dict:
+    if flight_store.get_meta(IMPORT_MARKER) is None and os.path.exists(DATA_FILE):
+        n = flight_store.import_json(DATA_FILE)
+        safe_console_print(f"✅ Imported {n} flights from {DATA_FILE} into {DB_FILE}")
+    global change_feed
+    if SHARED_STORE:
+        change_feed = ChangeFeed(flight_store)   # cursor taken before the load, so nothing is missed
+    loaded = flight_store.load()
+    # Modal drafts and "<uid>_pending" leftovers used to be persisted; they now live in `drafts`.
+    for key in [k for k, v in loaded.items() if k != DAY_MSGS_KEY and not is_flight(k, v)]:
+        flight_store.delete(key)
+        del loaded[key]
+    return {k: v if k == DAY_MSGS_KEY else FlightRecord.from_dict(k, v) for k, v in loaded.items()}
 
 async def load_user_data():
-    global user_data
     try:
-        if os.path.exists(DATA_FILE):
-            async with data_lock:
-                with open(DATA_FILE, "r", encoding="utf-8") as f:
-                    user_data = json.load(f)
-        else:
-            user_data = {}
+        async with save_scheduler.lock:
+            loaded = await run_io(_load_store)
+        user_data.clear()
+        user_data.update(loaded)
+        flight_index.rebuild(get_real_flights())
+        status_counters.rebuild(get_real_flights())
         return True
     except Exception as e:
-        safe_console_print(f"❌ Error loading data file: {e}")
-        user_data = {}
+        safe_console_print(f"❌ Error loading flight store: {e}")
+        user_data.clear()
         return False
 
-asyncio.get_event_loop().run_until_complete(load_user_data())
+if PROCESS_ROLE == "bot":
+    asyncio.get_event_loop().run_until_complete(load_user_data())   # API workers load on startup
+
+def track_flight(code: str):
+    """Refresh the secondary index and status counters after a flight is created or changed."""
+    entry = user_data[code]
+    old = flight_index.reindex(code, entry)
+    status_counters.move(old[STATUS_POS] if old else None, str(entry.status))
 
-async def save_user_data(user_trigger_desc: Optional[str] = None, user=None):
+def untrack_flight(code: str):
+    old = flight_index.remove(code)
+    if old:
+        status_counters.move(old[STATUS_POS], None)
+
+async def save_user_data(key: Optional[str] = None, user_trigger_desc: Optional[str] = None, user=None, flush: bool = False):
+    """
+    Mark one user_data key (flight code, "_day_msgs" or session key) as changed.
+    Writes are coalesced by save_scheduler; pass flush=True where the change must
+    be on disk before returning. key=None writes everything immediately.
+    """
     try:
-        async with data_lock:
-            if os.path.exists(DATA_FILE):
-                try:
-                    bak_name = DATA_FILE + ".bak"
-                    with open(DATA_FILE, "r", encoding="utf-8") as original:
-                        with open(bak_name, "w", encoding="utf-8") as bak:
-                            bak.write(original.read())
-                except Exception as e:
-                    safe_console_print(f"❌ Could not create backup: {e}")
-            with open(DATA_FILE, "w", encoding="utf-8") as f:
-                json.dump(user_data, f, indent=4, ensure_ascii=False)
+        if key is None:
+            flight_index.rebuild(get_real_flights())
+            status_counters.rebuild(get_real_flights())
+            await save_scheduler.flush()
+            async with save_scheduler.lock:
+                await run_io(flight_store.save_all, {k: _to_storage(v) for k, v in user_data.items()})
+        else:
+            if isinstance(user_data.get(key), FlightRecord):
+                track_flight(key)
+            save_scheduler.mark(key)
+            if flush:
+                await save_scheduler.flush()
         if user_trigger_desc and user:
-            await log_action(user, f"Saved user_data.json: {user_trigger_desc}")
+            await log_action(user, f"Saved flight store: {user_trigger_desc}")
         return True
     except Exception as e:
         safe_console_print(f"❌ Error saving user data: {e}")
         return False
 
+async def delete_user_data(key: str, user_trigger_desc: Optional[str] = None, user=None):
+    """Remove one user_data key from memory and from the flight store."""
+    try:
+        user_data.pop(key, None)
+        untrack_flight(key)
+        save_scheduler.mark(key, deleted=True)
+        await save_scheduler.flush()
+        if user_trigger_desc and user:
+            await log_action(user, f"Deleted from flight store: {user_trigger_desc}")
+        return True
+    except Exception as e:
+        safe_console_print(f"❌ Error deleting user data: {e}")
+        return False
+
+def _adopt_stored(key: str, value) -> Optional[str]:
+    """
+    Replace the in-memory copy of `key` with what another process stored (value
+    None = deleted there). Returns the affected dep_date for flights, else None.
+    A local copy with a newer version or an unflushed write is kept.
+    """
+    current = user_data.get(key)
+    if key == DAY_MSGS_KEY:
+        if value is not None and not save_scheduler.dirty(key):
+            user_data[DAY_MSGS_KEY] = value
+        return None
+    if value is None or not is_flight(key, value):
+        if not isinstance(current, FlightRecord) or save_scheduler.dirty(key):
+            return None
+        user_data.pop(key, None)
+        untrack_flight(key)
+        return current.dep_date
+    if isinstance(current, FlightRecord):
+        if current.version > value.get("version", 0) or current.to_dict() == value:
+            return None
+    user_data[key] = FlightRecord.from_dict(key, value)
+    track_flight(key)
+    return user_data[key].dep_date
+
+async def _refresh_flight(code: str):
+    _adopt_stored(code, await run_io(flight_store.get, code))
+
+async def _commit_shared(code: str, user_trigger_desc: Optional[str] = None, user=None):
+    """
+    Transaction commit when other processes share the store: write the new
+    version before the transaction returns, and only over the version the edit
+    started from. Raises WriteConflict if another process got there first.
+    """
+    entry = user_data[code]
+    track_flight(code)
+    async with save_scheduler.lock:
+        written = await run_io(flight_store.compare_and_set_flight, code, _to_storage(entry), entry.version - 1)
+    if not written:
+        raise WriteConflict(code)
+    if user_trigger_desc and user:
+        await log_action(user, f"Saved flight store: {user_trigger_desc}")
+
+# Edits to an existing flight go through `async with flights.transaction(code, desc, user) as entry:`
+# — per-flight lock, rollback on error, version bump + save_user_data on commit
+# (a compare-and-set write through _commit_shared when processes share the store).
+flights = FlightTransactions(user_data, commit=_commit_shared if SHARED_STORE else save_user_data,
+                             refresh=_refresh_flight if SHARED_STORE else None)
+
+# -----------------------
+# Cross-process sync  (bot + API workers sharing flights.db — see store.ChangeFeed)
+# -----------------------
+_deferred_changes = {}
+
+def apply_store_changes(changes: dict) -> dict:
+    """Fold writes made by other processes into user_data. Returns {code: dep_date} of changed flights."""
+    if "*" in changes:
+        full = changes.pop("*")
+        changes.update({k: full.get(k) for k in set(full) | set(user_data)})
+    pending = dict(_deferred_changes)
+    pending.update(changes)
+    _deferred_changes.clear()
+    touched = {}
+    for key, value in pending.items():
+        if flights.locked(key):
+            _deferred_changes[key] = value   # an edit holds this flight; fold it in next poll
+            continue
+        dep_date = _adopt_stored(key, value)
+        if dep_date is not None:
+            touched[key] = dep_date
+    return touched
+
+async def sync_discord_for(touched: dict):
+    """Bot process only: bring embeds and day boards in line with flights changed by API workers."""
+    for guild in bot.guilds:
+        for code in touched:
+            entry = user_data.get(code)
+            if entry is None:
+                continue
+            try:
+                if not entry.admin_message_id:   # created by an API worker
+                    await post_admin_panel(guild, code, f"Auto-posted admin panel for {code}")
+            except Exception as e:
+                safe_console_print(f"❌ Store sync — admin panel error for {code}: {e}")
+            queue_discord_sync(code)
+        break
+    for date_raw in set(touched.values()):
+        queue_discord_sync(date_raw=date_raw)
+
+async def store_sync_loop():
+    while True:
+        await asyncio.sleep(STORE_POLL_INTERVAL)
+        try:
+            changes = await run_io(change_feed.poll) if change_feed else None
+            touched = apply_store_changes(changes) if changes or _deferred_changes else {}
+            if touched and PROCESS_ROLE == "bot" and bot.is_ready():
+                await sync_discord_for(touched)
+        except Exception as e:
+            safe_console_print(f"❌ Store sync failed: {e}")
+
+def process_metrics() -> dict:
+    """Internal counters of this process: the bot, or one API worker (each has its own)."""
+    return {
+        "process": {"role": PROCESS_ROLE, "pid": os.getpid()},
+        "saves": dict(save_scheduler.stats, pending=save_scheduler.pending),
+        "loop_lag": loop_lag.snapshot(),
+        "drafts": drafts.stats(),
+        "transactions": flights.snapshot(),
+        "log_writer": log_sink.stats(),
+        "log_segments": log_segments.stats(),
+        "log_ring": recent_logs.snapshot() if recent_logs is not None else None,
+        "log_embeds": log_embeds.snapshot(),
+        "log_policy": log_policy.stats(),
+        "error_index": error_index.stats(),
+        "render": {"cache": render_cache.snapshot(), "messages": sent_payloads.snapshot()},
+        "message_handles": message_handles.snapshot(),
+        "discord_sync": discord_sync.snapshot(),
+        "store_sync": dict(change_feed.stats, deferred=len(_deferred_changes),
+                           conflicts=flight_store.conflicts, role=PROCESS_ROLE) if change_feed else None,
+        "archive": flight_archive.stats(),
+        "stats_counters": status_counters.checks,
+    }
+
+async def metrics_publish_loop():
+    """Bot only: drafts, Discord sync, log embeds and renders live here, so API workers read them from the store."""
+    while True:
+        try:
+            snapshot = dict(process_metrics(), published_at=datetime.utcnow().isoformat() + "Z")
+            await run_io(flight_store.set_meta, BOT_METRICS_KEY, snapshot)
+        except Exception as e:
+            safe_console_print(f"❌ Publishing metrics failed: {e}")
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL)
+
+# -----------------------
+# Cold archive  (Ended flights → compressed segments — see archive.py)
+# -----------------------
+async def archive_ended_flights(older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Move Ended flights that departed more than N days ago out of the live store."""
+    cutoff = datetime.utcnow().date() - timedelta(days=older_than_days)
+    codes = [c for c in flight_index.lookup("status", "Ended")
+             if user_data[c].dep_day and user_data[c].dep_day < cutoff and not flights.locked(c)]
+    codes.sort(key=lambda c: user_data[c].dep_day)
+    archived = 0
+    async with AsyncExitStack() as held:
+        # Each flight's lock is held from the re-check below until its delete, so an edit
+        # cannot start while the archive is written and then be deleted with the flight.
+        ended = []
+        for c in codes:
+            entry = await held.enter_async_context(flights.transaction(c))
+            if entry and entry.status == "Ended" and entry.dep_day and entry.dep_day < cutoff:
+                ended.append(entry)
+        if ended:
+            archived_at = datetime.utcnow().isoformat() + "Z"
+            # Archive first: a crash before the deletes below leaves a duplicate, never a loss.
+            await run_io(flight_archive.append, [dict(e.to_dict(), archived_at=archived_at) for e in ended])
+        for entry in ended:
+            if SHARED_STORE and not await run_io(flight_store.delete_flight_if, entry.code, entry.version):
+                log_to_file(f"Archived {entry.code} but kept it live: edited by another process meanwhile", level="warn")
+                continue
+            user_data.pop(entry.code, None)
+            untrack_flight(entry.code)
+            if not SHARED_STORE:
+                save_scheduler.mark(entry.code, deleted=True)
+            archived += 1
+
+    # Day-board message IDs for past dates that no longer have any live flight
+    day_msgs = user_data.get(DAY_MSGS_KEY, {})
+    stale = [d for d in day_msgs
+             if (parse_ddmmyyyy(d) or cutoff) < cutoff and not flight_index.lookup("dep_date", d)]
+    for d in stale:
+        del day_msgs[d]
+    if stale:
+        save_scheduler.mark(DAY_MSGS_KEY)
+    await save_scheduler.flush()
+    if archived or stale:
+        log_to_file(f"Archived {archived} ended flights, pruned {len(stale)} day boards", level="info")
+    return archived
+
+async def counters_check_loop():
+    """Periodically recount statuses from scratch and flag drift in the live counters."""
+    while True:
+        await asyncio.sleep(COUNTER_CHECK_INTERVAL)
+        drift = status_counters.verify(get_real_flights())
+        if drift:
+            log_to_file(f"Status counter drift corrected: {drift}", level="warn")
+
+async def archive_loop():
+    while True:
+        try:
+            await archive_ended_flights()
+            if isinstance(flight_store, FlightStore):
+                await run_io(flight_store.prune_changes)
+        except Exception as e:
+            safe_console_print(f"❌ Archive run failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
 # -----------------------
 # Logging
 # -----------------------
@@ -164,41 +524,41 @@ def build_log_embed_object(username_mention: str, action_text: str, error_code:
         })
     return embed_obj
 
+async def _send_log_embeds(embeds: list):
+    for g in bot.guilds:
+        ch = g.get_channel(LOG_CHANNEL_ID)
+        if ch:
+            await ch.send(embeds=embeds)
+            return
+    raise RuntimeError(f"log channel {LOG_CHANNEL_ID} not found")
+
+# Log-channel copies of log_action embeds, sent in batches by a background task.
+log_embeds = EmbedQueue(_send_log_embeds, max_queue=LOG_EMBED_QUEUE_MAX, linger=LOG_EMBED_LINGER,
+                        size=len, on_error=safe_console_print)
+
 async def log_action(user: discord.abc.User, action_text: str, error_code: Optional[str] = None, tb_text: Optional[str] = None):
+    """Write the action to the log and queue its embed for the log channel; never waits on Discord."""
+    to_file, to_channel = LOG_ALWAYS if error_code or tb_text else log_policy.decide(action_text)
+    if not to_file:
+        return
     username_mention = f"<@{user.id}>" if hasattr(user, "id") else str(user)
     username_str = getattr(user, 'display_name', None) or getattr(user, 'name', None) or str(user)
     embed_obj = build_log_embed_object(username_mention, action_text, error_code)
-    # Write structured log for dashboard
-    level = "error" if error_code or tb_text else "info"
-    log_to_file(action_text + (f" [err:{error_code}]" if error_code else ""), user=username_str, level=level)
+    # One record per action: embed payload, ref code and traceback included
+    write_log(action_text, user=username_str, level="error" if error_code or tb_text else "info", source="bot",
+              user_id=str(user.id) if hasattr(user, "id") else None,
+              error_code=error_code, traceback=tb_text, embed=embed_obj)
+    if not to_channel:
+        return
     try:
-        log_ch = None
-        for g in bot.guilds:
-            ch = g.get_channel(LOG_CHANNEL_ID)
-            if ch:
-                log_ch = ch
-                break
-        if log_ch:
-            e = discord.Embed(description=embed_obj["embeds"][0]["description"], color=embed_obj["embeds"][0]["color"])
-            e.set_image(url=embed_obj["embeds"][0]["image"]["url"])
-            for fld in embed_obj["embeds"][0]["fields"]:
-                e.add_field(name=fld["name"], value=fld["value"], inline=False)
-            try:
-                await log_ch.send(embed=e)
-            except Exception as send_exc:
-                safe_console_print(f"❌ Could not send log embed: {send_exc}")
+        e = discord.Embed(description=embed_obj["embeds"][0]["description"], color=embed_obj["embeds"][0]["color"])
+        e.set_image(url=embed_obj["embeds"][0]["image"]["url"])
+        for fld in embed_obj["embeds"][0]["fields"]:
+            e.add_field(name=fld["name"], value=fld["value"], inline=False)
+        log_embeds.put(e)
     except Exception as e:
         safe_console_print(f"❌ Unexpected error in log_action: {e}")
 
-    try:
-        pretty = json.dumps(embed_obj, ensure_ascii=False, indent=2)
-        safe_console_print(pretty)
-        if tb_text:
-            safe_console_print("Traceback:")
-            safe_console_print(tb_text)
-    except Exception as e:
-        safe_console_print(f"❌ Error writing log: {e}")
-
 async def handle_exception_and_report(interaction: Optional[discord.Interaction], user: discord.abc.User, action_desc: str, exc: Exception):
     err_code = generate_ref_code(7)
     tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
@@ -219,26 +579,33 @@ async def handle_exception_and_report(interaction: Optional[discord.Interaction]
     try:
         await log_action(user, f"{action_desc} (FAILED)", error_code=err_code, tb_text=tb)
     except Exception as e:
-        safe_console_print(f"❌ Failed to log error {err_code}: {e}")
-        safe_console_print(tb)
-    safe_console_print(f"❌ [{err_code}]")
-    safe_console_print("Traceback:")
-    safe_console_print(tb)
+        write_log(f"❌ Failed to log error {err_code}: {e}", level="error", error_code=err_code, traceback=tb)
+
+async def report_edit_failure(interaction: discord.Interaction, action_desc: str, exc: Exception):
+    """A flight transaction did not commit: ask for a retry on a write conflict, report anything else with a ref code."""
+    if not isinstance(exc, WriteConflict):
+        await handle_exception_and_report(interaction, interaction.user, action_desc, exc)
+        return
+    try:
+        await log_action(interaction.user, f"{action_desc}: {exc}")
+    except Exception:
+        pass
+    notice = "⚠️ This flight was just changed elsewhere and your edit was not saved. Please try again."
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(notice, ephemeral=True)
+        else:
+            await interaction.response.send_message(notice, ephemeral=True)
+    except Exception:
+        pass
 
 # -----------------------
 # ─── NEW: Day-Grouped Public Embed ────────────────────────────────────────────
 # -----------------------
 
-AIRCRAFT_FULL_NAMES = {
-    "B77W": "Boeing 777-300ER", "B77L": "Boeing 777-200LR", "A333": "Airbus A330-300",
-    "B788": "Boeing 787-8", "B789": "Boeing 787-9", "A321": "Airbus A321-200",
-    "B737": "Boeing 737 MAX-8", "A223": "Airbus A220-300", "A320": "Airbus A320-200",
-    "A319": "Airbus A319-100", "CR9": "CRJ-900", "E75": "Embraer 175",
-    "DH4J": "De Havilland Dash 8-400"
-}
-
 def aircraft_full_name(code: str) -> str:
-    return AIRCRAFT_FULL_NAMES.get(code.upper(), code)
+    aircraft = Aircraft.parse(code)
+    return aircraft.full_name if aircraft else code
 
 def format_date_ordinal(date_raw: str) -> str:
     try:
@@ -250,27 +617,24 @@ def format_date_ordinal(date_raw: str) -> str:
         return date_raw
 
 def get_real_flights():
-    """Return only real flight entries (skip session/pending keys)."""
-    return {
-        code: entry for code, entry in user_data.items()
-        if isinstance(entry, dict)
-        and "flight_number" in entry
-        and not code.endswith("_pending")
-        and len(code) == 6
-    }
+    """Return only real flight entries (user_data holds flights plus the _day_msgs map)."""
+    return {code: entry for code, entry in user_data.items() if code != DAY_MSGS_KEY}
+
+def find_flight(code: str) -> Optional[FlightRecord]:
+    entry = user_data.get(code)
+    return entry if isinstance(entry, FlightRecord) else None
+
+def flights_on_date(date_raw: str) -> list:
+    """(code, entry) pairs departing on a DDMMYYYY date, sorted by dep_time (via flight_index)."""
+    day = [(code, user_data[code]) for code in flight_index.lookup("dep_date", date_raw)]
+    day.sort(key=lambda x: x[1].dep_minutes or 0)
+    return day
 
-def group_flights_by_date(flights: dict) -> dict:
-    """Group flight entries by dep_date string (DDMMYYYY)."""
-    grouped = {}
-    for code, entry in flights.items():
-        date_raw = entry.get("dep_date", "unknown")
-        if date_raw not in grouped:
-            grouped[date_raw] = []
-        grouped[date_raw].append((code, entry))
-    # Sort each day's list by dep_time
-    for date_raw in grouped:
-        grouped[date_raw].sort(key=lambda x: x[1].get("dep_time", "00:00"))
-    return grouped
+def query_flights(date: str = None, status: str = None, host: str = None, airport: str = None) -> dict:
+    """Flights matching all given filters, in creation order, without scanning user_data."""
+    codes = flight_index.query(dep_date=date, status=status, host_user_id=host, airport=airport)
+    ordered = sorted(codes, key=lambda c: user_data[c].created_at or "")
+    return {code: user_data[code] for code in ordered}
 
 def format_date_display(date_raw: str) -> str:
     try:
@@ -297,17 +661,12 @@ def build_day_embed(date_raw: str, flights_on_day: list) -> discord.Embed:
         color=13047318,
     )
     for code, entry in flights_on_day:
-        flight_number    = entry.get("flight_number", "???")
-        dep_code         = entry.get("dep_code", "???")
-        arr_code         = entry.get("arr_code", "???")
-        dep_time         = entry.get("dep_time", "?")
-        aircraft_display = aircraft_full_name(entry.get("aircraft", "N/A"))
         embed.add_field(
-            name=f"<:AIC_Takeoff:1419416267302899824> {flight_number}",
+            name=f"<:AIC_Takeoff:1419416267302899824> {entry.flight_number}",
             value=(
-                f"-# <:AIC_Route:1439504509926903838> Route: {dep_code} to {arr_code}\n"
-                f"-# <:AIC_Clock:1419417053109944444> Departure time: {dep_time} UTC\n"
-                f"-# <:AIC_Plane:1473800759173976325> Aircraft: {aircraft_display}\n\n"
+                f"-# <:AIC_Route:1439504509926903838> Route: {entry.dep_code} to {entry.arr_code}\n"
+                f"-# <:AIC_Clock:1419417053109944444> Departure time: {entry.dep_time} UTC\n"
+                f"-# <:AIC_Plane:1473800759173976325> Aircraft: {entry.aircraft_display}\n\n"
             ),
             inline=True
         )
@@ -326,12 +685,10 @@ class FlightSelectMenu(Select):
     def __init__(self, flights_on_day: list):
         options = []
         for code, entry in flights_on_day[:25]:
-            flight_number = entry.get("flight_number", code)
-            dep_time      = entry.get("dep_time", "")
             options.append(discord.SelectOption(
-                label=flight_number,
+                label=entry.flight_number,
                 value=code,
-                description=f"Departure: {dep_time} UTC",
+                description=f"Departure: {entry.dep_time} UTC",
                 emoji="<:AC_Dot:1439504671927570432>"
             ))
         super().__init__(
@@ -344,63 +701,45 @@ class FlightSelectMenu(Select):
 
     async def callback(self, interaction: discord.Interaction):
         code  = self.values[0]
-        entry = user_data.get(code)
+        entry = find_flight(code)
         if not entry:
             await interaction.response.send_message("⚠️ Flight not found.", ephemeral=True)
             return
-        embed = build_detail_embed(entry)
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await interaction.response.send_message(embed=rendered_detail(entry).embed, ephemeral=True)
 
 
-def build_detail_embed(entry: dict) -> discord.Embed:
+def build_detail_embed(entry: FlightRecord) -> discord.Embed:
     """Full detail embed shown ephemerally when a user selects a flight."""
-    dep_airport  = entry.get("dep_airport", "N/A")
-    dep_code     = entry.get("dep_code", "N/A")
-    dep_time     = entry.get("dep_time", "N/A")
-    terminal     = entry.get("terminal", "N/A")
-    dep_gate     = entry.get("gate", {}).get("dep", "N/A")
-    arr_airport  = entry.get("arr_airport", "N/A")
-    arr_code     = entry.get("arr_code", "N/A")
-    arr_time     = entry.get("arr_time", "N/A")
-    arr_gate     = entry.get("gate", {}).get("arr", "N/A")
-    dep_date_raw = entry.get("dep_date", "N/A")
-    try:
-        dt     = datetime.strptime(dep_date_raw, "%d%m%Y")
+    dt = entry.dep_day
+    if dt:
         day    = dt.day
         suffix = "th" if 11 <= day <= 13 else {1:"st",2:"nd",3:"rd"}.get(day % 10, "th")
         dep_date_display = f"{day}{suffix} {dt.strftime('%B %Y')}"
-    except Exception:
-        dep_date_display = dep_date_raw
-    aircraft_display = aircraft_full_name(entry.get("aircraft", "N/A"))
-    meal         = entry.get("meal_service", "N/A")
-    status       = entry.get("status", "N/A")
-    host         = entry.get("host_user_id") or entry.get("host", "Unknown")
-    alerts       = entry.get("alerts", "N/A")
-    server_link  = entry.get("server", {}).get("link", "N/A")
-    flight_number = entry.get("flight_number", "Unknown")
+    else:
+        dep_date_display = entry.dep_date
 
     embed = discord.Embed(
-        description=f"# <:AIC_Takeoff:1419416267302899824> {flight_number}",
+        description=f"# <:AIC_Takeoff:1419416267302899824> {entry.flight_number}",
         color=13047318
     )
     embed.add_field(
         name="<:AIC_Takeoff:1419416267302899824> Departure",
         value=(
-            f"> -# <:AIC_Location:1473809150206017596> {dep_airport}\n"
-            f"> -# <:AIC_Airport:1419416394122006528> {dep_code}\n"
-            f"> -# <:AIC_Clock:1419417053109944444> {dep_time}\n"
-            f"> -# <:AIC_Airport:1419416394122006528> Terminal {terminal}\n"
-            f"> -# <:AIC_BoardingPass:1419417172035240068> Gate {dep_gate}"
+            f"> -# <:AIC_Location:1473809150206017596> {entry.dep_airport}\n"
+            f"> -# <:AIC_Airport:1419416394122006528> {entry.dep_code}\n"
+            f"> -# <:AIC_Clock:1419417053109944444> {entry.dep_time}\n"
+            f"> -# <:AIC_Airport:1419416394122006528> Terminal {entry.terminal}\n"
+            f"> -# <:AIC_BoardingPass:1419417172035240068> Gate {entry.gate_dep}"
         ),
         inline=True
     )
     embed.add_field(
         name="<:AIC_Landing:1419416286546362388> Arrival",
         value=(
-            f"> -# <:AIC_Location:1473809150206017596> {arr_airport}\n"
-            f"> -# <:AIC_Airport:1419416394122006528> {arr_code}\n"
-            f"> -# <:AIC_Clock:1419417053109944444> {arr_time}\n"
-            f"> -# <:AIC_BoardingPass:1419417172035240068> Gate {arr_gate}"
+            f"> -# <:AIC_Location:1473809150206017596> {entry.arr_airport}\n"
+            f"> -# <:AIC_Airport:1419416394122006528> {entry.arr_code}\n"
+            f"> -# <:AIC_Clock:1419417053109944444> {entry.arr_time}\n"
+            f"> -# <:AIC_BoardingPass:1419417172035240068> Gate {entry.gate_arr}"
         ),
         inline=True
     )
@@ -408,12 +747,12 @@ def build_detail_embed(entry: dict) -> discord.Embed:
         name="<:AIC_Information:1440775211082453002> Flight Information",
         value=(
             f"> -# <:AIC_Calendar:1419416309174636666> {dep_date_display}\n"
-            f"> -# <:AIC_Seat:1419416588964335706> Aircraft: {aircraft_display}\n"
-            f"> -# <:AIC_MealService:1419416320948306112> {meal}\n"
-            f"> -# <:AIC_Status:1419416335271596242> Flight Status: {status}\n"
-            f"> -# <:AIC_2:1419416360353796247> Host: <@{host}>\n"
-            f"> -# <:AIC_Warning:1419416746514841743> Alerts: {alerts}\n\n"
-            f"> -# <:AIC_Link:1417212068028874865> Server Link: {server_link}"
+            f"> -# <:AIC_Seat:1419416588964335706> Aircraft: {entry.aircraft_display}\n"
+            f"> -# <:AIC_MealService:1419416320948306112> {entry.meal_service}\n"
+            f"> -# <:AIC_Status:1419416335271596242> Flight Status: {entry.status}\n"
+            f"> -# <:AIC_2:1419416360353796247> Host: <@{entry.host}>\n"
+            f"> -# <:AIC_Warning:1419416746514841743> Alerts: {entry.alerts}\n\n"
+            f"> -# <:AIC_Link:1417212068028874865> Server Link: {entry.server_link}"
         ),
         inline=False
     )
@@ -430,27 +769,22 @@ async def post_or_update_day_schedule(guild: discord.Guild, date_raw: str):
     if not public_ch:
         return
 
-    real_flights = get_real_flights()
-    grouped = group_flights_by_date(real_flights)
-    flights_on_day = grouped.get(date_raw, [])
+    flights_on_day = flights_on_date(date_raw)
 
     if not flights_on_day:
         return
 
-    embed = build_day_embed(date_raw, flights_on_day)
-    view = DayScheduleView(flights_on_day)
+    rendered = rendered_day(date_raw, flights_on_day)
 
     # Storage for day message IDs
-    if "_day_msgs" not in user_data:
-        user_data["_day_msgs"] = {}
+    if DAY_MSGS_KEY not in user_data:
+        user_data[DAY_MSGS_KEY] = {}
 
-    existing_msg_id = user_data["_day_msgs"].get(date_raw)
+    existing_msg_id = user_data[DAY_MSGS_KEY].get(date_raw)
 
     if existing_msg_id:
         try:
-            msg = await fetch_message_with_retries(public_ch, int(existing_msg_id))
-            if msg:
-                await msg.edit(embed=embed, view=view)
+            if await edit_rendered(public_ch, existing_msg_id, rendered) is not None:
                 return
         except Exception:
             pass
@@ -458,12 +792,12 @@ async def post_or_update_day_schedule(guild: discord.Guild, date_raw: str):
     # Post new message
     msg = await public_ch.send(
         content=f"<@&{INTEREST_ROLE}>",
-        embed=embed,
-        view=view,
-        allowed_mentions=allowed_mentions
+        allowed_mentions=allowed_mentions,
+        **rendered.edit_kwargs()
     )
-    user_data["_day_msgs"][date_raw] = str(msg.id)
-    await save_user_data()
+    sent_payloads.sent(msg.id, rendered.digest, edit=False)
+    user_data[DAY_MSGS_KEY][date_raw] = str(msg.id)
+    await save_user_data(DAY_MSGS_KEY)
 
 
 # -----------------------
@@ -476,7 +810,12 @@ def create_api():
 
     from auth import router as auth_router, require_auth, get_session
 
-    app = FastAPI(title="AIC PTFS Dashboard API")
+    class CodecJSONResponse(JSONResponse):
+        """JSON responses encoded by codec.py (orjson when installed)."""
+        def render(self, content) -> bytes:
+            return codec.dumpb(content)
+
+    app = FastAPI(title="AIC PTFS Dashboard API", default_response_class=CodecJSONResponse)
 
     app.add_middleware(
         CORSMiddleware,
@@ -484,45 +823,73 @@ def create_api():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
     # Mount auth routes (/auth/login, /auth/callback, /auth/logout, /auth/me)
     app.include_router(auth_router)
 
-    def serialize_entry(code: str, entry: dict) -> dict:
+    @app.exception_handler(WriteConflict)
+    async def write_conflict(request: Request, exc: WriteConflict):
+        # Another process committed this flight first; the client should reload and retry.
+        return CodecJSONResponse(status_code=409, content={"detail": str(exc), "code": exc.code})
+
+    @app.on_event("startup")
+    async def worker_startup():
+        # api.py workers have no bot: load the shared store here and follow other processes' writes.
+        if PROCESS_ROLE == "api":
+            await load_user_data()
+            start_background_tasks()
+
+    @app.on_event("shutdown")
+    async def worker_shutdown():
+        # Mirror the bot's exit path: coalesced writes and queued log lines must not die with the worker.
+        if PROCESS_ROLE == "api":
+            for task in _background_tasks:
+                task.cancel()
+            try:
+                await save_scheduler.flush()
+            except Exception:
+                pass    # reported by the scheduler
+            await run_io(flight_store.close)
+            log_sink.close()
+            error_index.close()
+
+    def require_bot():
+        """Endpoints that post to Discord need the bot's gateway connection."""
+        if not bot.is_ready():
+            raise HTTPException(status_code=503, detail="Discord actions are only available from the bot process")
+
+    def serialize_entry(code: str, entry: FlightRecord) -> dict:
         """Convert a flight entry to a safe JSON-serializable dict for the API."""
-        dep_date_raw = entry.get("dep_date", "")
-        try:
-            dt = datetime.strptime(dep_date_raw, "%d%m%Y")
-            dep_date_display = dt.strftime("%Y-%m-%d")
-        except Exception:
-            dep_date_display = dep_date_raw
+        dep_date_raw = entry.dep_date
+        dep_date_display = entry.dep_day.strftime("%Y-%m-%d") if entry.dep_day else dep_date_raw
 
         return {
             "code": code,
-            "flight_number": entry.get("flight_number", ""),
-            "dep_city": entry.get("dep_city", ""),
-            "arr_city": entry.get("arr_city", ""),
-            "dep_code": entry.get("dep_code", ""),
-            "arr_code": entry.get("arr_code", ""),
-            "dep_airport": entry.get("dep_airport", ""),
-            "arr_airport": entry.get("arr_airport", ""),
-            "dep_time": entry.get("dep_time", ""),
-            "arr_time": entry.get("arr_time", ""),
+            "flight_number": entry.flight_number,
+            "dep_city": entry.dep_city,
+            "arr_city": entry.arr_city,
+            "dep_code": entry.dep_code,
+            "arr_code": entry.arr_code,
+            "dep_airport": entry.dep_airport,
+            "arr_airport": entry.arr_airport,
+            "dep_time": entry.dep_time,
+            "arr_time": entry.arr_time,
             "dep_date": dep_date_display,
             "dep_date_raw": dep_date_raw,
-            "duration": entry.get("duration", ""),
-            "terminal": entry.get("terminal", ""),
-            "aircraft": entry.get("aircraft", ""),
-            "meal_service": entry.get("meal_service", "N/A"),
-            "status": entry.get("status", "N/A"),
-            "gate_dep": entry.get("gate", {}).get("dep", "N/A"),
-            "gate_arr": entry.get("gate", {}).get("arr", "N/A"),
-            "alerts": entry.get("alerts", "N/A"),
-            "server_link": entry.get("server", {}).get("link", "N/A"),
-            "event_link": entry.get("event", {}).get("link", "N/A"),
-            "host_user_id": entry.get("host_user_id", ""),
-            "created_at": entry.get("created_at", ""),
+            "duration": entry.duration,
+            "terminal": entry.terminal,
+            "aircraft": entry.aircraft,
+            "meal_service": entry.meal_service,
+            "status": entry.status,
+            "gate_dep": entry.gate_dep,
+            "gate_arr": entry.gate_arr,
+            "alerts": entry.alerts,
+            "server_link": entry.server_link,
+            "event_link": entry.event_link,
+            "host_user_id": entry.host_user_id or "",
+            "created_at": entry.created_at or "",
         }
 
     from fastapi.responses import RedirectResponse as _Redirect
@@ -552,16 +919,27 @@ def create_api():
         return FileResponse(_file("dashboard.html"), media_type="text/html")
 
     @app.get("/api/flights")
-    async def get_flights(request: Request, _session=None):
+    async def get_flights(request: Request, date: str = None, status: str = None,
+                          host: str = None, airport: str = None):
+        """All flights, or only those matching the optional date/status/host/airport filters."""
         require_auth(request)
-        real = get_real_flights()
-        return [serialize_entry(code, entry) for code, entry in real.items()]
+        if not (date or status or host or airport):
+            real = get_real_flights()
+        else:
+            if date:
+                # Accept YYYY-MM-DD from the web form as well as stored DDMMYYYY
+                try:
+                    date = datetime.strptime(date, "%Y-%m-%d").strftime("%d%m%Y")
+                except ValueError:
+                    pass
+            real = query_flights(date=date, status=status, host=host, airport=airport)
+        return CodecJSONResponse([serialize_entry(code, entry) for code, entry in real.items()])
 
     @app.get("/api/flights/{code}")
     async def get_flight(code: str, request: Request):
         require_auth(request)
-        entry = user_data.get(code.upper())
-        if not entry or "flight_number" not in entry:
+        entry = find_flight(code.upper())
+        if not entry:
             raise HTTPException(status_code=404, detail="Flight not found")
         return serialize_entry(code.upper(), entry)
 
@@ -569,49 +947,31 @@ def create_api():
     async def update_flight(code: str, request: Request):
         require_auth(request)
         code = code.upper()
-        entry = user_data.get(code)
-        if not entry or "flight_number" not in entry:
+        if not find_flight(code):
             raise HTTPException(status_code=404, detail="Flight not found")
 
         body = await request.json()
 
         # Allowed fields to update via API
-        field_map = {
-            "status": lambda v: entry.update({"status": v}),
-            "alerts": lambda v: entry.update({"alerts": v}),
-            "meal_service": lambda v: entry.update({"meal_service": v}),
-            "gate_dep": lambda v: entry.setdefault("gate", {}).update({"dep": v}),
-            "gate_arr": lambda v: entry.setdefault("gate", {}).update({"arr": v}),
-            "server_link": lambda v: entry.setdefault("server", {}).update({"link": v}),
-            "event_link": lambda v: entry.setdefault("event", {}).update({"link": v}),
-        }
+        ALLOWED_FIELDS = ("status", "alerts", "meal_service", "gate_dep", "gate_arr", "server_link", "event_link")
 
         # Valid statuses (including Ended)
         VALID_STATUSES = {"On–Time", "Delayed", "Cancelled", "Rescheduled", "N/A", "Ended"}
         if "status" in body and body["status"] not in VALID_STATUSES:
             raise HTTPException(status_code=422, detail=f"Invalid status: {body['status']}")
 
-        updated = []
-        for field, updater in field_map.items():
-            if field in body:
-                updater(body[field])
-                updated.append(field)
+        updated = [field for field in ALLOWED_FIELDS if field in body]
+        async with flights.transaction(code, f"API update {code}: {updated}") as entry:
+            if not entry:
+                raise HTTPException(status_code=404, detail="Flight not found")
+            for field in updated:
+                setattr(entry, field, body[field])
 
         if updated:
-            await save_user_data(user_trigger_desc=f"API update {code}: {updated}")
             session = get_session(request)
             session_username = session.get("username", "Dashboard") if isinstance(session, dict) else "Dashboard"
             log_to_file(f"Updated flight {code}: {', '.join(updated)}", user=session_username, level="ok")
-            # Refresh Discord embeds
-            for g in bot.guilds:
-                try:
-                    await update_embeds_for_code(bot, code)
-                    dep_date = entry.get("dep_date")
-                    if dep_date:
-                        await post_or_update_day_schedule(g, dep_date)
-                    break
-                except Exception:
-                    pass
+            queue_discord_sync(code, entry.dep_date)
 
         return serialize_entry(code, entry)
 
@@ -639,38 +999,33 @@ def create_api():
         except Exception:
             dep_date_stored = dep_date_raw
 
-        entry = {
-            "code": code,
-            "flight_number": body["flight_number"].strip(),
-            "dep_city":      body["dep_city"].strip(),
-            "arr_city":      body["arr_city"].strip(),
-            "dep_code":      body["dep_code"].strip().upper(),
-            "arr_code":      body["arr_code"].strip().upper(),
-            "dep_airport":   body["dep_airport"].strip(),
-            "arr_airport":   body["arr_airport"].strip(),
-            "dep_time":      body["dep_time"].strip(),
-            "arr_time":      body["arr_time"].strip(),
-            "dep_date":      dep_date_stored,
-            "duration":      body["duration"].strip(),
-            "terminal":      body["terminal"].strip(),
-            "aircraft":      body["aircraft"].strip().upper(),
-            "host_user_id":  body.get("host_user_id", "").strip(),
-            "gate":          {"dep": "N/A", "arr": "N/A"},
-            "meal_service":  body.get("meal_service", "N/A"),
-            "status":        body.get("status", "N/A"),
-            "alerts":        "N/A",
-            "server":        {"link": "N/A"},
-            "event":         {"link": body.get("event_link", "N/A") or "N/A"},
-            "public_message_id":  None,
-            "admin_message_id":   None,
-            "created_at":    datetime.utcnow().isoformat() + "Z",
-        }
+        entry = FlightRecord(
+            code,
+            flight_number = body["flight_number"].strip(),
+            dep_city      = body["dep_city"].strip(),
+            arr_city      = body["arr_city"].strip(),
+            dep_code      = body["dep_code"].strip().upper(),
+            arr_code      = body["arr_code"].strip().upper(),
+            dep_airport   = body["dep_airport"].strip(),
+            arr_airport   = body["arr_airport"].strip(),
+            dep_time      = body["dep_time"].strip(),
+            arr_time      = body["arr_time"].strip(),
+            dep_date      = dep_date_stored,
+            duration      = body["duration"].strip(),
+            terminal      = body["terminal"].strip(),
+            aircraft      = body["aircraft"].strip().upper(),
+            host_user_id  = body.get("host_user_id", "").strip(),
+            meal_service  = body.get("meal_service", "N/A"),
+            status        = body.get("status", "N/A"),
+            event_link    = body.get("event_link", "N/A") or "N/A",
+            created_at    = datetime.utcnow().isoformat() + "Z",
+        )
 
         user_data[code] = entry
-        await save_user_data(user_trigger_desc=f"Dashboard created flight {code}")
+        await save_user_data(code, user_trigger_desc=f"Dashboard created flight {code}", flush=True)
         session = get_session(request)
         session_username = session.get("username", "Dashboard") if isinstance(session, dict) else "Dashboard"
-        log_to_file(f"Created flight {code} ({entry['flight_number']}) {entry['dep_code']}→{entry['arr_code']}", user=session_username, level="ok")
+        log_to_file(f"Created flight {code} ({entry.flight_number}) {entry.dep_code}→{entry.arr_code}", user=session_username, level="ok")
 
         for g in bot.guilds:
             try:
@@ -678,13 +1033,7 @@ def create_api():
             except Exception:
                 pass
             try:
-                admin_ch = g.get_channel(ADMIN_CHANNEL_ID)
-                if admin_ch:
-                    admin_embed = build_embeds_from_entry(entry, admin_view=True)
-                    admin_view  = make_admin_view(code)
-                    admin_msg   = await admin_ch.send(embed=admin_embed, view=admin_view)
-                    entry["admin_message_id"] = str(admin_msg.id)
-                    await save_user_data(user_trigger_desc=f"Dashboard auto-posted admin panel for {code}")
+                await post_admin_panel(g, code, f"Dashboard auto-posted admin panel for {code}")
             except Exception as e:
                 safe_console_print(f"Dashboard: could not post admin panel for {code}: {e}")
             break
@@ -694,21 +1043,20 @@ def create_api():
     @app.post("/api/flights/{code}/remind")
     async def send_reminder_api(code: str, request: Request):
         require_auth(request)
+        require_bot()
         code = code.upper()
-        entry = user_data.get(code)
-        if not entry or "flight_number" not in entry:
+        entry = find_flight(code)
+        if not entry:
             raise HTTPException(status_code=404, detail="Flight not found")
         body = await request.json()
         timestamp_text = (body.get("timestamp") or "").strip()
         if not timestamp_text:
             raise HTTPException(status_code=422, detail="Missing 'timestamp' field")
-        flight_number = entry.get("flight_number", "Unknown")
-        event_link    = entry.get("event", {}).get("link", "N/A")
         msg_text = (
-            f"# {flight_number} OPENS IN {timestamp_text}\n"
+            f"# {entry.flight_number} OPENS IN {timestamp_text}\n"
             f"<@&{INTEREST_ROLE}>\n\n"
             f"Please select \"interested\" if attending!\n\n"
-            f"Event link: {event_link}"
+            f"Event link: {entry.event_link}"
         )
         for g in bot.guilds:
             try:
@@ -723,38 +1071,34 @@ def create_api():
     @app.post("/api/flights/{code}/start")
     async def start_flight_api(code: str, request: Request):
         require_auth(request)
+        require_bot()
         code = code.upper()
-        entry = user_data.get(code)
-        if not entry or "flight_number" not in entry:
+        if not find_flight(code):
             raise HTTPException(status_code=404, detail="Flight not found")
         body = await request.json()
         server_link    = (body.get("server_link") or "").strip()
         spawn_location = (body.get("spawn_location") or "").strip()
         if not server_link:
             raise HTTPException(status_code=422, detail="Missing 'server_link' field")
-        entry["server"]["link"] = server_link
-        await save_user_data(user_trigger_desc=f"Dashboard start flight {code}")
-        for g in bot.guilds:
-            try:
-                await update_embeds_for_code(bot, code)
-                await post_or_update_day_schedule(g, entry.get("dep_date", ""))
-            except Exception as e:
-                safe_console_print(f"Dashboard start — embed update error: {e}")
+        async with flights.transaction(code, f"Dashboard start flight {code}") as entry:
+            if not entry:
+                raise HTTPException(status_code=404, detail="Flight not found")
+            entry.server_link = server_link
+        queue_discord_sync(code, entry.dep_date)
         for g in bot.guilds:
             try:
                 channel = g.get_channel(ANNOUNCE_CHANNEL_ID)
                 if channel:
-                    flight_number = entry.get("flight_number", "Unknown")
-                    arr_city      = entry.get("arr_city", "Unknown")
                     announce_text = (
-                        f"# {flight_number} to {arr_city} has begun check-in.\n"
+                        f"# {entry.flight_number} to {entry.arr_city} has begun check-in.\n"
                         f"<@&{INTEREST_ROLE}>\n\n"
                         f"Please head to check-in at **{spawn_location or 'the airport'}**\n\n"
                         f"> <:AIC_Link:1417212068028874865> {server_link}"
                     )
                     msg = await channel.send(announce_text)
-                    entry["announce_message_id"] = str(msg.id)
-                    await save_user_data(user_trigger_desc=f"Dashboard announce start flight {code}")
+                    async with flights.transaction(code, f"Dashboard announce start flight {code}") as txn_entry:
+                        if txn_entry:
+                            txn_entry.announce_message_id = str(msg.id)
             except Exception as e:
                 safe_console_print(f"Dashboard start — announce error: {e}")
             break
@@ -764,11 +1108,11 @@ def create_api():
     async def delete_flight(code: str, request: Request):
         require_auth(request)
         code = code.upper()
-        if code not in user_data or "flight_number" not in user_data.get(code, {}):
-            raise HTTPException(status_code=404, detail="Flight not found")
-        flight_name = user_data[code].get("flight_number", code)
-        del user_data[code]
-        await save_user_data(user_trigger_desc=f"Dashboard deleted flight {code}")
+        async with flights.transaction(code) as entry:
+            if not entry:
+                raise HTTPException(status_code=404, detail="Flight not found")
+            flight_name = entry.flight_number
+            await delete_user_data(code, user_trigger_desc=f"Dashboard deleted flight {code}")
         session = get_session(request)
         session_username = session.get("username", "Dashboard") if isinstance(session, dict) else "Dashboard"
         log_to_file(f"Deleted flight {code} ({flight_name})", user=session_username, level="warn")
@@ -778,57 +1122,41 @@ def create_api():
     async def refresh_embed(code: str, request: Request):
         """Refresh the Discord embed for a flight without any changes."""
         session = require_auth(request)
+        require_bot()
         code = code.upper()
-        entry = user_data.get(code)
-        if not entry or "flight_number" not in entry:
+        entry = find_flight(code)
+        if not entry:
             raise HTTPException(status_code=404, detail="Flight not found")
-        for g in bot.guilds:
-            try:
-                await update_embeds_for_code(bot, code)
-                dep_date = entry.get("dep_date")
-                if dep_date:
-                    await post_or_update_day_schedule(g, dep_date)
-                break
-            except Exception as e:
-                safe_console_print(f"Dashboard refresh embed error: {e}")
+        queue_discord_sync(code, entry.dep_date)
         # Log the action
         session_username = session.get("username", "Dashboard User") if isinstance(session, dict) else "Dashboard User"
-        safe_console_print(json.dumps({
-            "time": datetime.utcnow().strftime("%H:%M:%S"),
-            "user": session_username,
-            "action": f"Refreshed Discord embed for {code}",
-            "level": "ok"
-        }))
+        log_to_file(f"Refreshed Discord embed for {code}", user=session_username, level="ok")
         return {"refreshed": code}
 
     @app.post("/api/flights/{code}/close")
     async def close_flight_api(code: str, request: Request):
         """Close flight gates (set server link to Gate Closed)."""
         session = require_auth(request)
+        require_bot()
         code = code.upper()
-        entry = user_data.get(code)
-        if not entry or "flight_number" not in entry:
-            raise HTTPException(status_code=404, detail="Flight not found")
-        entry["server"]["link"] = "<:AIC_Locked:1409728733589405777> Gate Closed"
-        await save_user_data(user_trigger_desc=f"Dashboard close flight {code}")
+        async with flights.transaction(code, f"Dashboard close flight {code}") as entry:
+            if not entry:
+                raise HTTPException(status_code=404, detail="Flight not found")
+            entry.server_link = "<:AIC_Locked:1409728733589405777> Gate Closed"
+        queue_discord_sync(code, entry.dep_date)
         for g in bot.guilds:
             try:
-                await update_embeds_for_code(bot, code)
-                await post_or_update_day_schedule(g, entry.get("dep_date", ""))
                 # Update announce message if present
                 announce_ch = g.get_channel(ANNOUNCE_CHANNEL_ID)
-                if announce_ch and entry.get("announce_message_id"):
+                if announce_ch and entry.announce_message_id:
                     try:
-                        announce_msg = await fetch_message_with_retries(announce_ch, int(entry["announce_message_id"]))
-                        if announce_msg:
-                            flight_number = entry.get("flight_number", "Unknown")
-                            arr_city = entry.get("arr_city", "Unknown")
-                            await announce_msg.edit(
-                                content=(
-                                    f"# {flight_number} to {arr_city} has closed boarding.\n"
-                                    f"<@&{INTEREST_ROLE}> \n\n<:AIC_Locked:1409728733589405777> Gate Closed"
-                                )
+                        await message_handles.edit(
+                            announce_ch, entry.announce_message_id,
+                            content=(
+                                f"# {entry.flight_number} to {entry.arr_city} has closed boarding.\n"
+                                f"<@&{INTEREST_ROLE}> \n\n<:AIC_Locked:1409728733589405777> Gate Closed"
                             )
+                        )
                     except Exception as e:
                         safe_console_print(f"Dashboard close — announce edit error: {e}")
                 break
@@ -837,196 +1165,56 @@ def create_api():
         return {"closed": code}
 
     @app.get("/api/logs")
-    async def get_logs(request: Request, limit: int = 300):
-        """Return parsed log entries from the log file, newest first."""
+    async def get_logs(request: Request, limit: int = 300, level: Optional[str] = None,
+                       user: Optional[str] = None, source: Optional[str] = None,
+                       flight: Optional[str] = None, since: Optional[str] = None,
+                       until: Optional[str] = None, q: Optional[str] = None,
+                       cursor: Optional[str] = None):
+        """
+        Parsed log entries, newest first, filtered server-side (see logformat.LogQuery).
+        The body stays a plain list; when older matches may exist, the X-Next-Cursor
+        response header holds an opaque cursor to pass back for the next page.
+        """
         require_auth(request)
-        import re as _re
-
-        def _extract_json_at(s, start):
-            depth, in_str, esc = 0, False, False
-            for i in range(start, len(s)):
-                c = s[i]
-                if esc:
-                    esc = False
-                    continue
-                if c == '\\' and in_str:
-                    esc = True
-                    continue
-                if c == '"':
-                    in_str = not in_str
-                if not in_str:
-                    if c == '{':
-                        depth += 1
-                    elif c == '}':
-                        depth -= 1
-                        if depth == 0:
-                            return s[start:i+1], i+1
-            return None, start
-
-        entries = []
+        limit = max(1, min(limit, 5000))
         try:
-            if not os.path.exists(LOG_FILE):
-                return [{"time": "—", "user": "system", "action": "Log file not found.", "level": "warn", "traceback": None}]
-
-            with open(LOG_FILE, "r", encoding="utf-8", errors="replace") as f:
-                content = f.read().replace('\r\n', '\n')
-
-            # --- Pass 1: extract Discord embed JSON objects and raw chunks between them ---
-            segments = []   # list of (kind, data)
-            pos = 0
-            while pos < len(content):
-                m = _re.search(r'\{', content[pos:])
-                if not m:
-                    tail = content[pos:].strip()
-                    if tail:
-                        segments.append(('raw', tail))
-                    break
-                raw_before = content[pos: pos + m.start()].strip()
-                if raw_before:
-                    segments.append(('raw', raw_before))
-                obj_start = pos + m.start()
-                obj_str, end = _extract_json_at(content, obj_start)
-                if obj_str:
-                    try:
-                        obj = json.loads(obj_str)
-                        segments.append(('json', obj))
-                    except Exception:
-                        segments.append(('raw', obj_str))
-                    pos = end
-                else:
-                    pos = obj_start + 1
-
-            # --- Pass 2: convert segments into clean log entries ---
-            # Collect tracebacks so we can attach them to the preceding error entry
-            pending_tb = None
-
-            for kind, data in segments:
-                if kind == 'json':
-                    # Check if it's one of our structured dashboard logs (has "action" key directly)
-                    if isinstance(data, dict) and 'action' in data and 'user' in data:
-                        level = data.get('level', 'info')
-                        entries.append({
-                            "time": data.get('time', '—'),
-                            "user": data.get('user', 'system'),
-                            "action": data['action'],
-                            "level": level,
-                            "traceback": None,
-                            "source": "dashboard"
-                        })
-                    # Discord embed format
-                    elif isinstance(data, dict) and 'embeds' in data and data['embeds']:
-                        embed = data['embeds'][0]
-                        fields_raw = embed.get('fields', [])
-                        fields = {f['name']: f['value'] for f in fields_raw}
-
-                        user_raw = fields.get('Username', 'system')
-                        uid_match = _re.search(r'<@(\d+)>', user_raw)
-                        uid = uid_match.group(1) if uid_match else user_raw
-
-                        action = fields.get('Action Performed', '')
-                        # Strip markdown code fences
-                        action = _re.sub(r'^```\w*\n?|```$', '', action.strip()).strip()
-
-                        error_code = fields.get('Error Code', None)
-                        level = 'error' if error_code or 'FAILED' in action else 'info'
-
-                        entry = {
-                            "time": "—",
-                            "user": uid,
-                            "action": action,
-                            "level": level,
-                            "error_code": error_code,
-                            "traceback": None,
-                            "source": "bot"
-                        }
-                        entries.append(entry)
-                    pending_tb = None
-
-                elif kind == 'raw':
-                    text = data.strip()
-                    if not text:
-                        continue
-
-                    # Split into sub-blocks by blank lines
-                    blocks = [b.strip() for b in _re.split(r'\n\s*\n', text) if b.strip()]
-                    for block in blocks:
-                        lines = block.split('\n')
-
-                        # Identify block type
-                        is_tb = any('Traceback' in l or 'File "' in l or 'Error:' in l for l in lines)
-                        is_ref = _re.match(r'❌\s*\[', lines[0]) if lines else False
-
-                        if is_ref:
-                            # Error ref code line like "❌ [ABCDEFG]"
-                            ref_match = _re.search(r'\[([A-Z0-9]{5,10})\]', lines[0])
-                            ref = ref_match.group(1) if ref_match else '?'
-                            # If we have a pending traceback, attach it to previous error entry
-                            if entries:
-                                entries[-1]['error_code'] = entries[-1].get('error_code') or ref
-                            continue
-
-                        if is_tb:
-                            # Extract the key error line (last non-empty line of traceback)
-                            error_line = ''
-                            for l in reversed(lines):
-                                l = l.strip()
-                                if l and not l.startswith('File ') and not l.startswith('Traceback') and not l.startswith('During'):
-                                    error_line = l
-                                    break
-                            # Attach traceback to last entry if it was an error
-                            tb_text = '\n'.join(lines)
-                            if entries and entries[-1]['level'] == 'error':
-                                entries[-1]['traceback'] = tb_text
-                                if error_line and not entries[-1].get('tb_summary'):
-                                    entries[-1]['tb_summary'] = error_line
-                            else:
-                                entries.append({
-                                    "time": "—",
-                                    "user": "system",
-                                    "action": error_line or "Unhandled exception",
-                                    "level": "error",
-                                    "traceback": tb_text,
-                                    "source": "bot"
-                                })
-                            continue
-
-                        # Plain raw lines — status messages, etc.
-                        joined = ' '.join(l.strip() for l in lines if l.strip())
-                        if not joined:
-                            continue
-                        level = 'info'
-                        if '❌' in joined or 'Error' in joined or 'FAILED' in joined:
-                            level = 'error'
-                        elif '✅' in joined:
-                            level = 'ok'
-                        elif '⚠' in joined:
-                            level = 'warn'
-                        entries.append({
-                            "time": "—",
-                            "user": "system",
-                            "action": joined[:400],
-                            "level": level,
-                            "traceback": None,
-                            "source": "system"
-                        })
-
-        except Exception as e:
-            import traceback as _tb
-            entries = [{"time": "—", "user": "system", "action": f"Log parser error: {e}", "level": "error", "traceback": _tb.format_exc()}]
+            query = logformat.LogQuery(level=level, user=user, source=source, flight=flight,
+                                       since=since, until=until, q=q)
+            if cursor:
+                logformat.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+        def _respond(entries, next_cursor):
+            headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+            return CodecJSONResponse(entries, headers=headers)
+
+        # Common case: the recent entries are already parsed in memory.
+        if recent_logs is not None and not cursor:
+            cached = recent_logs.page(query, limit)
+            if cached is not None:
+                return _respond(*cached)
+
+        def _read_page():
+            try:
+                entries, next_cursor = logformat.read_page(LOG_FILE, log_segments, query, limit,
+                                                           cursor=cursor, max_scan=LOG_SCAN_LIMIT)
+                if not entries and not query.active and not cursor:
+                    entries = [{"time": "—", "user": "system", "action": "Log file not found.", "level": "warn", "traceback": None}]
+            except Exception as e:
+                import traceback as _tb
+                entries = [{"time": "—", "user": "system", "action": f"Log parser error: {e}", "level": "error", "traceback": _tb.format_exc()}]
+                next_cursor = None
+            return entries, next_cursor
 
-        # Reverse so newest entries come first, then limit
-        entries.reverse()
-        return entries[:limit]
+        return _respond(*await run_io(_read_page))
 
     @app.get("/api/stats")
     async def get_stats(request: Request):
+        """Constant-time: reads the live status_counters instead of scanning flights."""
         require_auth(request)
-        real = get_real_flights()
-        total = len(real)
-        statuses = {}
-        for entry in real.values():
-            s = entry.get("status", "N/A")
-            statuses[s] = statuses.get(s, 0) + 1
+        total = status_counters.total
+        statuses = dict(status_counters.counts)
         ended = statuses.get("Ended", 0)
         active_total = total - ended
         return {
@@ -1038,6 +1226,53 @@ def create_api():
             "statuses": statuses
         }
 
+    @app.get("/api/errors")
+    async def get_errors(request: Request, limit: int = 100, fingerprint: Optional[str] = None):
+        """Exceptions aggregated by fingerprint, most recently seen first; ?fingerprint= adds its stored tracebacks."""
+        require_auth(request)
+        if fingerprint:
+            aggregate = await run_io(error_index.aggregate, fingerprint)
+            if aggregate is None:
+                raise HTTPException(status_code=404, detail="Unknown fingerprint")
+            return aggregate
+        return await run_io(error_index.summary, max(1, min(limit, 1000)))
+
+    @app.get("/api/errors/{ref}")
+    async def get_error(request: Request, ref: str):
+        """The log record behind an error reference code (traceback, user, action, time)."""
+        require_auth(request)
+        entry = await run_io(error_index.get, ref)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Unknown error reference")
+        return entry
+
+    @app.get("/api/archive")
+    async def get_archive(request: Request, page: int = 1, per_page: int = 50):
+        """Archived (cold) flights, most recently archived first."""
+        require_auth(request)
+        result = await run_io(flight_archive.page, page, per_page)
+        result["items"] = [
+            dict(serialize_entry(e.get("code", ""), FlightRecord.from_dict(e.get("code", ""), e)),
+                 archived_at=e.get("archived_at"))
+            for e in result["items"]
+        ]
+        return result
+
+    @app.get("/api/metrics")
+    async def get_metrics(request: Request):
+        """
+        Internal counters for the storage and logging pipelines, of the process
+        serving the request (see "process"). On an API worker, "bot" holds the
+        bot's counters as last published to the shared store.
+        """
+        require_auth(request)
+        metrics = process_metrics()
+        if PROCESS_ROLE == "bot":
+            metrics["bot"] = None     # the top-level counters are the bot's own
+        else:
+            metrics["bot"] = await run_io(flight_store.get_meta, BOT_METRICS_KEY) if SHARED_STORE else None
+        return metrics
+
     @app.post("/api/announce")
     async def post_announcement(request: Request):
         """Send a free-form message to the announcement channel."""
@@ -1087,7 +1322,8 @@ class ConfirmView(View):
 
         if self.is_last_step:
             try:
-                entry = user_data.get(str(self.user_id))
+                # The draft is only dropped once the flight is on disk, so a failed save can be retried.
+                entry = drafts.get(self.user_id)
                 if entry is None:
                     await interaction.followup.send("⚠️ No data found for your session.", ephemeral=True)
                     return
@@ -1096,24 +1332,20 @@ class ConfirmView(View):
                 while code in user_data:
                     code = generate_code()
 
-                flight_entry = {
-                    "code": code,
-                    "host_user_id": self.user_id,
+                flight_entry = FlightRecord(
+                    code,
+                    host_user_id=self.user_id,
                     **entry,
-                    "gate": {"dep": "N/A", "arr": "N/A"},
-                    "meal_service": "N/A",
-                    "status": "N/A",
-                    "alerts": "N/A",
-                    "server": {"link": "N/A"},
-                    "event": {"link": "N/A"},
-                    "public_message_id": None,
-                    "admin_message_id": None,
-                    "created_at": datetime.utcnow().isoformat() + "Z"
-                }
+                    created_at=datetime.utcnow().isoformat() + "Z"
+                )
 
                 user_data[code] = flight_entry
-                user_data[str(self.user_id) + "_pending"] = entry
-                await save_user_data(user_trigger_desc=f"Finalize flight {code}", user=interaction.user)
+                if not await save_user_data(code, user_trigger_desc=f"Finalize flight {code}", user=interaction.user, flush=True):
+                    user_data.pop(code, None)
+                    untrack_flight(code)
+                    await interaction.followup.send("❌ Could not save your flight. Your answers are kept — press Yes to try again.", ephemeral=True)
+                    return
+                drafts.pop(self.user_id)
 
                 from PIL import Image, ImageDraw, ImageFont
                 filepath = None
@@ -1170,17 +1402,13 @@ class FlightDetailsModal1(Modal, title="Flight Details (1/3)"):
             pass
 
         uid = interaction.user.id
-        user_data[str(uid)] = {
+        drafts.put(uid, {
             "flight_number": self.flight_number.value.strip(),
             "dep_city": self.dep_city.value.strip(),
             "dep_date": self.dep_date.value.strip(),
             "terminal": self.terminal.value.strip(),
             "aircraft": self.aircraft.value.strip(),
-        }
-        try:
-            await save_user_data(user_trigger_desc="Step 1 modal submitted", user=interaction.user)
-        except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data after FlightDetailsModal1", e)
+        })
 
         summary = (
             f"**Step 1 Summary:**\n"
@@ -1214,21 +1442,15 @@ class FlightDetailsModal2(Modal, title="Flight Details (2/3)"):
             pass
 
         uid = interaction.user.id
-        session_key = str(uid)
-        if session_key not in user_data:
-            await interaction.response.send_message("⚠️ Missing Step 1 data. Please start again.", ephemeral=True)
-            return
-
-        user_data[session_key].update({
+        draft = drafts.update(uid, {
             "arr_city": self.arr_city.value.strip(),
             "dep_airport": self.dep_airport.value.strip(),
             "duration": self.duration.value.strip(),
             "dep_time": self.dep_time.value.strip()
         })
-        try:
-            await save_user_data(user_trigger_desc="Step 2 modal submitted", user=interaction.user)
-        except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data after FlightDetailsModal2", e)
+        if draft is None:
+            await interaction.response.send_message("⚠️ Missing Step 1 data. Please start again.", ephemeral=True)
+            return
 
         summary = (
             f"**Step 2 Summary:**\n"
@@ -1261,21 +1483,15 @@ class FlightDetailsModal3(Modal, title="Flight Details (3/3)"):
             pass
 
         uid = interaction.user.id
-        session_key = str(uid)
-        if session_key not in user_data:
-            await interaction.response.send_message("⚠️ Missing Step 1/2 data. Please start again.", ephemeral=True)
-            return
-
-        user_data[session_key].update({
+        draft = drafts.update(uid, {
             "dep_code": self.dep_code.value.strip(),
             "arr_code": self.arr_code.value.strip(),
             "arr_airport": self.arr_airport.value.strip(),
             "arr_time": self.arr_time.value.strip()
         })
-        try:
-            await save_user_data(user_trigger_desc="Step 3 modal submitted", user=interaction.user)
-        except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data after FlightDetailsModal3", e)
+        if draft is None:
+            await interaction.response.send_message("⚠️ Missing Step 1/2 data. Please start again.", ephemeral=True)
+            return
 
         summary = (
             f"**Step 3 Summary:**\n"
@@ -1395,21 +1611,18 @@ class SetGatesModal(Modal, title="Set Gates (1-2 chars each)"):
         except Exception:
             pass
         code = self.code
-        entry = user_data.get(code)
-        if not entry:
-            await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
-            return
-        entry["gate"]["dep"] = self.dep_gate.value.strip() or "N/A"
-        entry["gate"]["arr"] = self.arr_gate.value.strip() or "N/A"
         try:
-            await save_user_data(user_trigger_desc=f"Set gates for {code}", user=interaction.user)
+            async with flights.transaction(code, f"Set gates for {code}", interaction.user) as entry:
+                if not entry:
+                    await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+                    return
+                entry.gate_dep = self.dep_gate.value.strip() or "N/A"
+                entry.gate_arr = self.arr_gate.value.strip() or "N/A"
         except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data in SetGatesModal", e)
+            await report_edit_failure(interaction, "SetGatesModal", e)
+            return
+        queue_discord_sync(code, entry.dep_date)
         try:
-            await update_embeds_for_code(interaction.client, code)
-            dep_date = entry.get("dep_date")
-            if dep_date and interaction.guild:
-                await post_or_update_day_schedule(interaction.guild, dep_date)
             await interaction.followup.send("Gates updated.", ephemeral=True)
         except Exception as e:
             await handle_exception_and_report(interaction, interaction.user, "updating embeds after SetGatesModal", e)
@@ -1430,19 +1643,17 @@ class SetAlertsModal(Modal, title="Set Alerts (free text)"):
         except Exception:
             pass
         code = self.code
-        entry = user_data.get(code)
-        if not entry:
-            await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
-            return
-        entry["alerts"] = self.alert_text.value.strip() or "N/A"
         try:
-            await save_user_data(user_trigger_desc=f"Set alerts for {code}", user=interaction.user)
+            async with flights.transaction(code, f"Set alerts for {code}", interaction.user) as entry:
+                if not entry:
+                    await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+                    return
+                entry.alerts = self.alert_text.value.strip() or "N/A"
         except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data in SetAlertsModal", e)
+            await report_edit_failure(interaction, "SetAlertsModal", e)
+            return
+        queue_discord_sync(code, entry.dep_date)
         try:
-            await update_embeds_for_code(interaction.client, code)
-            if interaction.guild:
-                await post_or_update_day_schedule(interaction.guild, entry.get("dep_date", ""))
             await interaction.followup.send("Alerts updated.", ephemeral=True)
         except Exception as e:
             await handle_exception_and_report(interaction, interaction.user, "updating embeds after SetAlertsModal", e)
@@ -1463,7 +1674,7 @@ class SendReminderModal(Modal, title="Send Reminder (timestamp)"):
         except Exception:
             pass
         code = self.code
-        entry = user_data.get(code)
+        entry = find_flight(code)
         if not entry:
             await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
             return
@@ -1473,13 +1684,11 @@ class SendReminderModal(Modal, title="Send Reminder (timestamp)"):
             await interaction.followup.send("\u26a0\ufe0f Announcement channel not found.", ephemeral=True)
             return
         timestamp_text = self.timestamp.value.strip()
-        flight_number = entry.get("flight_number", "Unknown")
-        event_link = entry.get("event", {}).get("link", "N/A")
         announce_msg = (
-            f"# {flight_number} OPENS IN {timestamp_text}\n"
+            f"# {entry.flight_number} OPENS IN {timestamp_text}\n"
             f"<@&{INTEREST_ROLE}>\n\n"
             f'Please select "interested" if attending!\n\n'
-            f"Event link: {event_link}"
+            f"Event link: {entry.event_link}"
         )
         try:
             await channel.send(announce_msg)
@@ -1505,41 +1714,34 @@ class StartFlightModal(Modal, title="Start Flight (server link + spawn location)
             await log_action(interaction.user, f"StartFlightModal submitted for {code}")
         except Exception:
             pass
-        entry = user_data.get(code)
-        if not entry:
-            await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
-            return
-        entry["server"]["link"] = self.server_link.value.strip() or "N/A"
-        spawn_location = self.spawn_location.value.strip()
         try:
-            await save_user_data(user_trigger_desc=f"Start flight {code}", user=interaction.user)
-        except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "save_user_data in StartFlightModal", e)
-        try:
-            await update_embeds_for_code(interaction.client, code)
-            if interaction.guild:
-                await post_or_update_day_schedule(interaction.guild, entry.get("dep_date", ""))
+            async with flights.transaction(code, f"Start flight {code}", interaction.user) as entry:
+                if not entry:
+                    await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+                    return
+                entry.server_link = self.server_link.value.strip() or "N/A"
         except Exception as e:
-            await handle_exception_and_report(interaction, interaction.user, "update_embeds_for_code in StartFlightModal", e)
+            await report_edit_failure(interaction, "StartFlightModal", e)
+            return
+        spawn_location = self.spawn_location.value.strip()
+        queue_discord_sync(code, entry.dep_date)
         guild = interaction.guild
         channel = guild.get_channel(ANNOUNCE_CHANNEL_ID)
         if channel:
-            flight_number = entry.get("flight_number", "Unknown")
-            arr_city      = entry.get("arr_city", "Unknown")
-            server_link   = entry["server"]["link"]
             announce_text = (
-                f"# {flight_number} to {arr_city} has begun check-in.\n"
+                f"# {entry.flight_number} to {entry.arr_city} has begun check-in.\n"
                 f"<@&{INTEREST_ROLE}>\n\n"
                 f"Please head to check-in at **{spawn_location}**\n\n"
-                f"> <:AIC_Link:1417212068028874865> {server_link}"
+                f"> <:AIC_Link:1417212068028874865> {entry.server_link}"
             )
             try:
                 msg = await channel.send(announce_text)
-                entry["announce_message_id"] = str(msg.id)
-                await save_user_data(user_trigger_desc=f"Announce start flight {code}", user=interaction.user)
+                async with flights.transaction(code, f"Announce start flight {code}", interaction.user) as txn_entry:
+                    if txn_entry:
+                        txn_entry.announce_message_id = str(msg.id)
                 await log_action(interaction.user, f"StartFlight: announced check-in for {code}")
             except Exception as e:
-                await handle_exception_and_report(interaction, interaction.user, "posting start flight announce", e)
+                await report_edit_failure(interaction, "posting start flight announce", e)
         try:
             await interaction.followup.send("Flight started and server link set.", ephemeral=True)
         except Exception as e:
@@ -1559,21 +1761,17 @@ class MealServiceSelect(Select):
 
     async def callback(self, interaction: discord.Interaction):
         code  = self.code
-        entry = user_data.get(code)
-        if not entry:
-            await interaction.response.send_message("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+        try:
+            async with flights.transaction(code, f"Set meal service for {code} to {self.values[0]}", interaction.user) as entry:
+                if not entry:
+                    await interaction.response.send_message("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+                    return
+                entry.meal_service = self.values[0]
+        except Exception as e:
+            await report_edit_failure(interaction, "meal service callback", e)
             return
-        entry["meal_service"] = self.values[0]
+        queue_discord_sync(code)
         try:
-            await save_user_data(user_trigger_desc=f"Set meal service for {code} to {self.values[0]}", user=interaction.user)
-            admin_ch = interaction.client.get_channel(ADMIN_CHANNEL_ID)
-            if admin_ch and entry.get("admin_message_id"):
-                admin_msg = await fetch_message_with_retries(admin_ch, int(entry["admin_message_id"]))
-                if admin_msg:
-                    await admin_msg.edit(
-                        embed=build_embeds_from_entry(entry, admin_view=True),
-                        view=make_admin_view(code)
-                    )
             await interaction.response.send_message(f"Meal service set to {self.values[0]}.", ephemeral=True)
         except Exception as e:
             await handle_exception_and_report(interaction, interaction.user, "meal service callback", e)
@@ -1593,24 +1791,22 @@ class StatusSelect(Select):
 
     async def callback(self, interaction: discord.Interaction):
         code  = self.code
-        entry = user_data.get(code)
+        entry = find_flight(code)
         if not entry:
             await interaction.response.send_message("\u26a0\ufe0f Flight code not found.", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
-        entry["status"] = self.values[0]
         try:
-            await save_user_data(user_trigger_desc=f"Set status for {code} to {self.values[0]}", user=interaction.user)
-            admin_ch = interaction.client.get_channel(ADMIN_CHANNEL_ID)
-            if admin_ch and entry.get("admin_message_id"):
-                admin_msg = await fetch_message_with_retries(admin_ch, int(entry["admin_message_id"]))
-                if admin_msg:
-                    await admin_msg.edit(
-                        embed=build_embeds_from_entry(entry, admin_view=True),
-                        view=make_admin_view(code)
-                    )
-            if interaction.guild:
-                await post_or_update_day_schedule(interaction.guild, entry.get("dep_date", ""))
+            async with flights.transaction(code, f"Set status for {code} to {self.values[0]}", interaction.user) as entry:
+                if not entry:
+                    await interaction.followup.send("\u26a0\ufe0f Flight code not found.", ephemeral=True)
+                    return
+                entry.status = self.values[0]
+        except Exception as e:
+            await report_edit_failure(interaction, "status select callback", e)
+            return
+        queue_discord_sync(code, entry.dep_date)
+        try:
             await interaction.followup.send(f"Status set to {self.values[0]}.", ephemeral=True)
         except Exception as e:
             await handle_exception_and_report(interaction, interaction.user, "status select callback", e)
@@ -1618,66 +1814,46 @@ class StatusSelect(Select):
 
 def make_admin_view(code: str):
     v     = View(timeout=None)
-    entry = user_data.get(code)
+    entry = find_flight(code)
     v.add_item(Button(label="Set Departure & Arrival Gate", style=discord.ButtonStyle.primary,   custom_id=f"set_gates:{code}",    row=0))
     v.add_item(Button(label="Set Alerts",                   style=discord.ButtonStyle.success,   custom_id=f"set_alerts:{code}",   row=1))
     v.add_item(Button(label="Send Reminder",                style=discord.ButtonStyle.danger,    custom_id=f"send_reminder:{code}",row=1))
     v.add_item(Button(label="Flight Not Started",           style=discord.ButtonStyle.secondary, custom_id=f"not_started:{code}",  row=2))
     v.add_item(Button(label="Start Flight",                 style=discord.ButtonStyle.success,   custom_id=f"start_flight:{code}", row=2))
     v.add_item(Button(label="Close Flight",                 style=discord.ButtonStyle.danger,    custom_id=f"close_flight:{code}", row=2))
-    meal_select     = MealServiceSelect(code, default=entry.get("meal_service") if entry else None)
+    meal_select     = MealServiceSelect(code, default=entry.meal_service if entry else None)
     meal_select.row = 3
     v.add_item(meal_select)
-    status_select     = StatusSelect(code, default=entry.get("status") if entry else None)
+    status_select     = StatusSelect(code, default=entry.status if entry else None)
     status_select.row = 4
     v.add_item(status_select)
     return v
 
 
-def build_embeds_from_entry(entry: dict, admin_view: bool = False) -> discord.Embed:
-    dep_airport   = entry.get("dep_airport", "N/A")
-    dep_code_val  = entry.get("dep_code", "N/A")
-    dep_time      = entry.get("dep_time", "N/A")
-    terminal      = entry.get("terminal", "N/A")
-    dep_gate      = entry.get("gate", {}).get("dep", "N/A")
-    arr_airport   = entry.get("arr_airport", "N/A")
-    arr_code_val  = entry.get("arr_code", "N/A")
-    arr_time      = entry.get("arr_time", "N/A")
-    arr_gate      = entry.get("gate", {}).get("arr", "N/A")
-    dep_date_raw  = entry.get("dep_date", "N/A")
-    try:
-        dt = datetime.strptime(dep_date_raw, "%d%m%Y")
-        dep_date_display = dt.strftime("%a, %d %b %Y")
-    except Exception:
-        dep_date_display = dep_date_raw
-    aircraft      = entry.get("aircraft", "N/A")
-    meal          = entry.get("meal_service", "N/A")
-    status        = entry.get("status", "N/A")
-    host          = entry.get("host_user_id") or entry.get("host", "Unknown")
-    alerts        = entry.get("alerts", "N/A")
-    server_link   = entry.get("server", {}).get("link", "N/A")
-    event_link    = entry.get("event",  {}).get("link", "N/A")
-    flight_number = entry.get("flight_number", "Unknown")
+def build_embeds_from_entry(entry: FlightRecord, admin_view: bool = False) -> discord.Embed:
+    dep_date_display = entry.dep_day.strftime("%a, %d %b %Y") if entry.dep_day else entry.dep_date
+    flight_number    = entry.flight_number
+    event_link       = entry.event_link
 
     embed = discord.Embed(
         title=flight_number,
         description=f"# [{flight_number}]({event_link})" if event_link != "N/A" else flight_number,
         color=13047318
     )
-    dep_value  = (f">>> <:AIC_Takeoff:1409728645093785620> {dep_airport} **{dep_code_val}**\n"
-                  f"<:AIC_Clock:1416206442482110555> {dep_time}\n"
-                  f"<:AIC_Airport:1409728649845800992> Terminal {terminal}\n"
-                  f"<:AIC_BoardingPass:1409728642799505460> Gate {dep_gate}\n")
-    arr_value  = (f">>> <:AIC_Landing:1409728647371165736> {arr_airport} **{arr_code_val}**\n"
-                  f"<:AIC_Clock:1416206442482110555> {arr_time}\n"
-                  f"<:AIC_BoardingPass:1409728642799505460> Gate {arr_gate}\n    ** ** ")
+    dep_value  = (f">>> <:AIC_Takeoff:1409728645093785620> {entry.dep_airport} **{entry.dep_code}**\n"
+                  f"<:AIC_Clock:1416206442482110555> {entry.dep_time}\n"
+                  f"<:AIC_Airport:1409728649845800992> Terminal {entry.terminal}\n"
+                  f"<:AIC_BoardingPass:1409728642799505460> Gate {entry.gate_dep}\n")
+    arr_value  = (f">>> <:AIC_Landing:1409728647371165736> {entry.arr_airport} **{entry.arr_code}**\n"
+                  f"<:AIC_Clock:1416206442482110555> {entry.arr_time}\n"
+                  f"<:AIC_BoardingPass:1409728642799505460> Gate {entry.gate_arr}\n    ** ** ")
     info_value = (f">  <:AIC_Calendar:1419198165923528794> {dep_date_display}\n"
-                  f"> <:AIC_Seat:1409728800073187422> {aircraft}\n"
-                  f"> <:AIC_MealService:1419199319436693666> {meal}\n"
-                  f"> <:AIC_Status:1419199743145545779> **Status**: {status}\n"
-                  f"> <:AIC_Crown:1409728805177655367> Host: <@{host}>\n"
-                  f"> <:AIC_Warning:1416198985558917240> Alerts: {alerts}\n\n"
-                  f"> <:AIC_Link:1409728713716928572> Server Link: **{server_link}**")
+                  f"> <:AIC_Seat:1409728800073187422> {entry.aircraft}\n"
+                  f"> <:AIC_MealService:1419199319436693666> {entry.meal_service}\n"
+                  f"> <:AIC_Status:1419199743145545779> **Status**: {entry.status}\n"
+                  f"> <:AIC_Crown:1409728805177655367> Host: <@{entry.host}>\n"
+                  f"> <:AIC_Warning:1416198985558917240> Alerts: {entry.alerts}\n\n"
+                  f"> <:AIC_Link:1409728713716928572> Server Link: **{entry.server_link}**")
     embed.add_field(name="Departure",          value=dep_value,  inline=True)
     embed.add_field(name="Arrival",            value=arr_value,  inline=True)
     embed.add_field(name="Flight Information", value=info_value, inline=False)
@@ -1688,44 +1864,96 @@ def build_embeds_from_entry(entry: dict, admin_view: bool = False) -> discord.Em
     return embed
 
 
-async def fetch_message_with_retries(channel, message_id: int, attempts: int = 3, delay: float = 0.5):
-    for i in range(attempts):
-        try:
-            return await channel.fetch_message(message_id)
-        except Exception:
-            await asyncio.sleep(delay * (i + 1))
-    return None
+# ── Render cache (see rendercache.py) ─────────────────────────────────────────
+render_cache    = RenderCache(RENDER_CACHE_SIZE)
+sent_payloads   = SentPayloads()
+message_handles = MessageHandles()
 
+def _flight_key(entry: FlightRecord) -> tuple:
+    # Keyed by content, not by version: two processes can each hold a different
+    # edit with the same version number until one of them loses its commit.
+    return (entry.code, record_digest(entry.to_dict()))
+
+def rendered_flight(entry: FlightRecord, admin_view: bool = False) -> Rendered:
+    """Public embed, or admin embed plus its control view, cached per flight content."""
+    return render_cache.get(("flight", admin_view, *_flight_key(entry)), lambda: Rendered(
+        build_embeds_from_entry(entry, admin_view=admin_view),
+        make_admin_view(entry.code) if admin_view else None,
+    ))
+
+def rendered_detail(entry: FlightRecord) -> Rendered:
+    return render_cache.get(("detail", *_flight_key(entry)), lambda: Rendered(build_detail_embed(entry)))
+
+def rendered_day(date_raw: str, flights_on_day: list) -> Rendered:
+    """Day board embed and select menu, cached until a flight on that day changes, appears or goes."""
+    key = ("day", date_raw, tuple(_flight_key(entry) for _, entry in flights_on_day))
+    return render_cache.get(key, lambda: Rendered(build_day_embed(date_raw, flights_on_day),
+                                                  DayScheduleView(flights_on_day)))
+
+async def edit_rendered(channel, message_id, rendered: Rendered):
+    """
+    Edit a bot message to show `rendered`, by ID and without fetching it first.
+    Returns True if an edit was sent, False if the message already shows
+    exactly this payload, None if the message no longer exists.
+    """
+    if sent_payloads.unchanged(message_id, rendered.digest):
+        return False
+    if await message_handles.edit(channel, message_id, **rendered.edit_kwargs()) is None:
+        sent_payloads.forget(message_id)
+        return None
+    sent_payloads.sent(message_id, rendered.digest)
+    return True
+
+
+async def post_admin_panel(guild: discord.Guild, code: str, desc: str):
+    """Post the admin control panel for a flight and remember its message ID."""
+    entry = find_flight(code)
+    admin_ch = guild.get_channel(ADMIN_CHANNEL_ID)
+    if not entry or not admin_ch:
+        return
+    rendered  = rendered_flight(entry, admin_view=True)
+    admin_msg = await admin_ch.send(**rendered.edit_kwargs())
+    sent_payloads.sent(admin_msg.id, rendered.digest, edit=False)
+    async with flights.transaction(code, desc) as txn_entry:
+        if txn_entry:
+            txn_entry.admin_message_id = str(admin_msg.id)
 
 async def update_embeds_for_code(client: commands.Bot, code: str):
-    entry = user_data.get(code)
+    entry = find_flight(code)
     if not entry:
         return
     try:
         for g in client.guilds:
             pub_ch = g.get_channel(PUBLIC_CHANNEL_ID)
-            if pub_ch and entry.get("public_message_id"):
+            if pub_ch and entry.public_message_id:
                 try:
-                    msg = await fetch_message_with_retries(pub_ch, int(entry["public_message_id"]))
-                    if msg:
-                        await msg.edit(embed=build_embeds_from_entry(entry, admin_view=False))
+                    await edit_rendered(pub_ch, entry.public_message_id, rendered_flight(entry))
                 except Exception:
                     pass
             adm_ch = g.get_channel(ADMIN_CHANNEL_ID)
-            if adm_ch and entry.get("admin_message_id"):
+            if adm_ch and entry.admin_message_id:
                 try:
-                    adm_msg = await fetch_message_with_retries(adm_ch, int(entry["admin_message_id"]))
-                    if adm_msg:
-                        await adm_msg.edit(
-                            embed=build_embeds_from_entry(entry, admin_view=True),
-                            view=make_admin_view(code)
-                        )
+                    await edit_rendered(adm_ch, entry.admin_message_id, rendered_flight(entry, admin_view=True))
                 except Exception:
                     pass
             break
     except Exception as e:
         safe_console_print(f"Error updating embeds: {e}")
 
+async def _sync_day_board(date_raw: str):
+    for guild in bot.guilds:
+        await post_or_update_day_schedule(guild, date_raw)
+        break
+
+# Flight edits mark their code and dep_date dirty; one task applies them to Discord (see discordsync.py).
+discord_sync = SyncQueue(lambda code: update_embeds_for_code(bot, code), _sync_day_board,
+                         window=DISCORD_SYNC_WINDOW, on_error=safe_console_print)
+
+def queue_discord_sync(code: Optional[str] = None, date_raw: Optional[str] = None):
+    """Schedule the embed and/or day-board update for a change. Bot process only: API workers reach it through the store."""
+    if PROCESS_ROLE == "bot":
+        discord_sync.mark(code, date_raw)
+
 
 # -----------------------
 # Component interactions handler
@@ -1748,12 +1976,11 @@ async def on_interaction(interaction: discord.Interaction):
 
         # Handle detail button (public)
         if action == "detail":
-            entry = user_data.get(code)
+            entry = find_flight(code)
             if not entry:
                 await interaction.response.send_message("⚠️ Flight not found.", ephemeral=True)
                 return
-            embed = build_detail_embed(entry)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await interaction.response.send_message(embed=rendered_detail(entry).embed, ephemeral=True)
             return
 
         if action == "set_gates":
@@ -1766,15 +1993,22 @@ async def on_interaction(interaction: discord.Interaction):
             await interaction.response.send_modal(SendReminderModal(code))
             return
         if action == "not_started":
-            entry = user_data.get(code)
+            entry = find_flight(code)
             if not entry:
                 await interaction.followup.send("⚠️ Flight code not found.", ephemeral=True)
                 return
             await interaction.response.defer(ephemeral=True)
-            entry["server"]["link"] = "Flight Not Started"
             try:
-                await save_user_data(user_trigger_desc=f"Set Server Link 'Flight Not Started' for {code}", user=interaction.user)
-                await update_embeds_for_code(interaction.client, code)
+                async with flights.transaction(code, f"Set Server Link 'Flight Not Started' for {code}", interaction.user) as entry:
+                    if not entry:
+                        await interaction.followup.send("⚠️ Flight code not found.", ephemeral=True)
+                        return
+                    entry.server_link = "Flight Not Started"
+            except Exception as e:
+                await report_edit_failure(interaction, "not_started button handler", e)
+                return
+            queue_discord_sync(code)
+            try:
                 await interaction.followup.send("Server Link set to 'Flight Not Started'.", ephemeral=True)
             except Exception as e:
                 await handle_exception_and_report(interaction, interaction.user, "not_started button handler", e)
@@ -1783,32 +2017,31 @@ async def on_interaction(interaction: discord.Interaction):
             await interaction.response.send_modal(StartFlightModal(code))
             return
         if action == "close_flight":
-            entry = user_data.get(code)
+            entry = find_flight(code)
             if not entry:
                 await interaction.followup.send("⚠️ Flight code not found.", ephemeral=True)
                 return
             await interaction.response.defer(ephemeral=True)
-            entry["server"]["link"] = "<:AIC_Locked:1409728733589405777> Gate Closed"
             try:
-                await save_user_data(user_trigger_desc=f"Close flight {code}", user=interaction.user)
-                await update_embeds_for_code(interaction.client, code)
-                if interaction.guild:
-                    await post_or_update_day_schedule(interaction.guild, entry.get("dep_date", ""))
+                async with flights.transaction(code, f"Close flight {code}", interaction.user) as entry:
+                    if not entry:
+                        await interaction.followup.send("⚠️ Flight code not found.", ephemeral=True)
+                        return
+                    entry.server_link = "<:AIC_Locked:1409728733589405777> Gate Closed"
             except Exception as e:
-                await handle_exception_and_report(interaction, interaction.user, "close_flight save/update", e)
+                await report_edit_failure(interaction, "close_flight button handler", e)
+                return
+            queue_discord_sync(code, entry.dep_date)
             announce_ch = interaction.client.get_channel(ANNOUNCE_CHANNEL_ID)
-            if announce_ch and entry.get("announce_message_id"):
+            if announce_ch and entry.announce_message_id:
                 try:
-                    announce_msg = await fetch_message_with_retries(announce_ch, int(entry["announce_message_id"]))
-                    if announce_msg:
-                        flight_number = entry.get("flight_number", "Unknown")
-                        arr_city = entry.get("arr_city", "Unknown")
-                        await announce_msg.edit(
-                            content=(
-                                f"# {flight_number} to {arr_city} has closed boarding.\n"
-                                f"<@&{INTEREST_ROLE}> \n\n<:AIC_Locked:1409728733589405777> Gate Closed"
-                            )
+                    await message_handles.edit(
+                        announce_ch, entry.announce_message_id,
+                        content=(
+                            f"# {entry.flight_number} to {entry.arr_city} has closed boarding.\n"
+                            f"<@&{INTEREST_ROLE}> \n\n<:AIC_Locked:1409728733589405777> Gate Closed"
                         )
+                    )
                 except Exception as e:
                     safe_console_print(f"Error editing announce message for close_flight: {e}")
             try:
@@ -1817,14 +2050,44 @@ async def on_interaction(interaction: discord.Interaction):
                 await handle_exception_and_report(interaction, interaction.user, "send confirmation after close_flight", e)
             return
 
-    except Exception as e:
-        safe_console_print("on_interaction error:")
-        safe_console_print(traceback.format_exc())
+    except Exception:
+        write_log("❌ on_interaction error", level="error", source="bot", traceback=traceback.format_exc())
 
 
 # -----------------------
 # Bot Start
 # -----------------------
+_background_tasks = []
+
+def start_background_tasks():
+    """Start the long-running maintenance tasks once (on_ready fires again on reconnect)."""
+    if _background_tasks:
+        return
+    loop_lag.start()
+    if PROCESS_ROLE == "bot":
+        _background_tasks.append(asyncio.create_task(archive_loop()))
+        log_embeds.start()
+        discord_sync.start()
+    _background_tasks.append(asyncio.create_task(counters_check_loop()))
+    if SHARED_STORE:
+        _background_tasks.append(asyncio.create_task(store_sync_loop()))
+        if PROCESS_ROLE == "bot":
+            _background_tasks.append(asyncio.create_task(metrics_publish_loop()))
+
+api_process = None
+
+async def start_api_workers():
+    """Serve the dashboard from API_WORKERS separate processes (see api.py) instead of in-process."""
+    global api_process
+    if api_process is not None and api_process.returncode is None:
+        return
+    api_process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "api:app",
+        "--host", "localhost", "--port", str(DASHBOARD_PORT),
+        "--workers", str(API_WORKERS), "--log-level", "warning",
+        cwd=str(Path(__file__).parent),
+    )
+
 @bot.event
 async def on_ready():
     try:
@@ -1832,8 +2095,12 @@ async def on_ready():
     except Exception as e:
         safe_console_print(f"Warning: could not sync commands: {e}")
     print(f"✅ Logged in as {bot.user}")
+    start_background_tasks()
 
-    if WEB_ENABLED:
+    if WEB_ENABLED and API_WORKERS > 0:
+        await start_api_workers()
+        print(f"✅ Dashboard API running on http://0.0.0.0:{DASHBOARD_PORT} ({API_WORKERS} workers)")
+    elif WEB_ENABLED:
         api = create_api()
         config = uvicorn.Config(api, host="localhost", port=DASHBOARD_PORT, log_level="warning")
         server = uvicorn.Server(config)
@@ -1843,4 +2110,12 @@ async def on_ready():
         print("⚠️  FastAPI/uvicorn not installed — dashboard API disabled. Run: pip install fastapi uvicorn")
 
 
-bot.run(TOKEN)
\ No newline at end of file
+if PROCESS_ROLE == "bot":
+    bot.run(TOKEN)
+    if api_process is not None and api_process.returncode is None:
+        api_process.terminate()
+    save_scheduler.close()
+    flight_store.close()
+    io_executor.shutdown(wait=True)
+    log_sink.close()
+    error_index.close()
\ No newline at end of file